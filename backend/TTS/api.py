@@ -1,12 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import List, Optional
 from gtts import gTTS
 from langdetect import detect, LangDetectException
-from googletrans import Translator
 import os
+import asyncio
 from io import BytesIO
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.middleware.cors import CORSMiddleware
+from pathlib import Path
+from audio_cache import AudioCache
+from translation import CachedTranslator, TranslationCache, create_backend
+from offline_tts import OfflineEnginePool, audio_format
 
 app = FastAPI()
 
@@ -20,14 +26,96 @@ app.add_middleware(
 
 DEFAULT_LANGUAGE = 'en'
 
+# Synthesis engines: "gtts" (online) or "pyttsx3" (offline, a pool of
+# OFFLINE_TTS_WORKERS engine processes). TTS_ENGINE is the default and
+# requests may pick one with `engine`. With TTS_OFFLINE_FALLBACK=1, a gTTS
+# request that fails or is still running after TTS_FALLBACK_AFTER_SECONDS is
+# also handed to the offline engine, and whichever finishes first is used.
+# The offline engine returns WAV or AIFF rather than MP3 (see the response's
+# `format`), so the fallback is off unless clients are ready for that.
+ENGINES = ("gtts", "pyttsx3")
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")
+if TTS_ENGINE not in ENGINES:
+    raise ValueError(f"TTS_ENGINE must be one of {ENGINES}, got '{TTS_ENGINE}'")
+OFFLINE_TTS_WORKERS = int(os.getenv("OFFLINE_TTS_WORKERS", "2"))
+TTS_OFFLINE_FALLBACK = os.getenv("TTS_OFFLINE_FALLBACK", "0") == "1"
+TTS_FALLBACK_AFTER_SECONDS = float(os.getenv("TTS_FALLBACK_AFTER_SECONDS", "5"))
+offline_pool = OfflineEnginePool(workers=OFFLINE_TTS_WORKERS)
+
+# /tts runs detect -> translate -> synthesize off the event loop. Each stage
+# has its own thread pool, whose size caps how many calls run at once, and a
+# timeout. A call that times out keeps its thread until it returns, and its
+# result still lands in the caches.
+TTS_DETECT_CONCURRENCY = int(os.getenv("TTS_DETECT_CONCURRENCY", "2"))
+TTS_TRANSLATE_CONCURRENCY = int(os.getenv("TTS_TRANSLATE_CONCURRENCY", "8"))
+TTS_SYNTHESIS_CONCURRENCY = int(os.getenv("TTS_SYNTHESIS_CONCURRENCY", "8"))
+TTS_DETECT_TIMEOUT_SECONDS = float(os.getenv("TTS_DETECT_TIMEOUT_SECONDS", "2"))
+TTS_TRANSLATE_TIMEOUT_SECONDS = float(os.getenv("TTS_TRANSLATE_TIMEOUT_SECONDS", "10"))
+TTS_SYNTHESIS_TIMEOUT_SECONDS = float(os.getenv("TTS_SYNTHESIS_TIMEOUT_SECONDS", "20"))
+stage_executors = {
+    "detect": ThreadPoolExecutor(max_workers=TTS_DETECT_CONCURRENCY, thread_name_prefix="tts-detect"),
+    "translate": ThreadPoolExecutor(max_workers=TTS_TRANSLATE_CONCURRENCY, thread_name_prefix="tts-translate"),
+    # The offline engines wait on their own processes, so they get their own threads
+    "gtts": ThreadPoolExecutor(max_workers=TTS_SYNTHESIS_CONCURRENCY, thread_name_prefix="tts-gtts"),
+    "pyttsx3": ThreadPoolExecutor(max_workers=OFFLINE_TTS_WORKERS, thread_name_prefix="tts-pyttsx3")
+}
+
+# Synthesized audio is cached by (text, language, speed, engine): up to
+# TTS_CACHE_MB per engine in memory and, unless TTS_CACHE_DIR is set empty,
+# up to TTS_CACHE_DISK_MB per engine on disk so repeated prompts survive
+# restarts (0: no limit)
+TTS_CACHE_MB = float(os.getenv("TTS_CACHE_MB", "64"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", str(Path(__file__).resolve().parent / "tts_cache"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "512"))
+audio_caches = {
+    "gtts": AudioCache(
+        max_bytes=TTS_CACHE_MB * 1024 * 1024,
+        disk_dir=TTS_CACHE_DIR or None,
+        max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024
+    ),
+    "pyttsx3": AudioCache(
+        max_bytes=TTS_CACHE_MB * 1024 * 1024,
+        disk_dir=Path(TTS_CACHE_DIR) / "pyttsx3" if TTS_CACHE_DIR else None,
+        max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024,
+        suffix=".wav"
+    )
+}
+
+# One long-lived translator for the whole app. TRANSLATION_BACKEND picks the
+# service ("googletrans", or "local" to pass text through offline), with up
+# to TRANSLATOR_POOL_SIZE pooled clients. Translations are cached by (text,
+# source, target): TRANSLATION_CACHE_SIZE entries in memory and, unless
+# TRANSLATION_CACHE_DIR is set empty, on disk.
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "googletrans")
+TRANSLATOR_POOL_SIZE = int(os.getenv("TRANSLATOR_POOL_SIZE", "4"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+TRANSLATION_CACHE_DIR = os.getenv("TRANSLATION_CACHE_DIR", str(Path(__file__).resolve().parent / "translation_cache"))
+translator = CachedTranslator(
+    create_backend(TRANSLATION_BACKEND, pool_size=TRANSLATOR_POOL_SIZE),
+    TranslationCache(max_entries=TRANSLATION_CACHE_SIZE, disk_dir=TRANSLATION_CACHE_DIR or None)
+)
+
 class TTSRequest(BaseModel):
     text: str
+    slow: bool = False
+    engine: Optional[str] = None
+
+class TranslateRequest(BaseModel):
+    texts: List[str]
+    dest: str = DEFAULT_LANGUAGE
+    src: str = 'auto'
 
 def translate_text(text, target_language=DEFAULT_LANGUAGE):
-    translator = Translator()
     try:
-        translation = translator.translate(text, dest=target_language)
-        return translation.text
+        return translator.translate(text, dest=target_language)
+    except Exception as e:
+        print(f"Translation error: {e}")
+        return None
+
+def translate_texts(texts, target_language=DEFAULT_LANGUAGE, source_language='auto'):
+    """Translations of many strings, in order, sent to the backend as one batch"""
+    try:
+        return translator.translate_many(texts, dest=target_language, src=source_language)
     except Exception as e:
         print(f"Translation error: {e}")
         return None
@@ -41,34 +129,136 @@ def detect_language(text):
         print(f"Language detection error: {e}")
         return DEFAULT_LANGUAGE
 
-def text_to_speech(text, lang=DEFAULT_LANGUAGE):
-    try:
-        tts = gTTS(text=text, lang=lang, slow=False)
-        audio_output = BytesIO()
-        tts.write_to_fp(audio_output)
-        audio_output.seek(0)
-        return audio_output.read()
-    except Exception as e:
-        print(f"TTS error: {e}")
-        raise HTTPException(status_code=500, detail="TTS generation failed")
+def synthesize(text, lang=DEFAULT_LANGUAGE, slow=False):
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    audio_output = BytesIO()
+    tts.write_to_fp(audio_output)
+    return audio_output.getvalue()
+
+def synthesize_offline(text, lang=DEFAULT_LANGUAGE, slow=False):
+    # pyttsx3 has no slow mode; `slow` only keeps its cache key apart
+    return offline_pool.synthesize(text, lang)
+
+SYNTHESIZERS = {"gtts": synthesize, "pyttsx3": synthesize_offline}
+
+def text_to_speech(text, lang=DEFAULT_LANGUAGE, slow=False, engine="gtts"):
+    """Audio bytes for `text` and the cache source ("memory", "disk", "miss" or "coalesced")"""
+    key = AudioCache.key(text, lang, slow, engine)
+    return audio_caches[engine].get_or_create(key, lambda: SYNTHESIZERS[engine](text, lang, slow))
+
+async def run_stage(stage, timeout, fn, *args):
+    """Run a blocking call on `stage`'s threads, giving up after `timeout` seconds"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(stage_executors[stage], fn, *args), timeout)
+
+def offline_fallback_enabled():
+    return TTS_OFFLINE_FALLBACK and offline_pool.available is not False
+
+async def speak(text, lang, slow, engine):
+    """
+    Synthesize on `engine`; returns (audio, cache source, engine used). A slow
+    or failing gTTS call is raced against the offline engine when fallback is on.
+    """
+    async def attempt(name):
+        audio, source = await run_stage(name, TTS_SYNTHESIS_TIMEOUT_SECONDS, text_to_speech, text, lang, slow, name)
+        return audio, source, name
+
+    primary = asyncio.ensure_future(attempt(engine))
+    if engine != "gtts" or not offline_fallback_enabled():
+        return await primary
+
+    await asyncio.wait({primary}, timeout=TTS_FALLBACK_AFTER_SECONDS)
+    if primary.done() and primary.exception() is None:
+        return primary.result()
+    print("gTTS is slow or failing, trying the offline engine")
+
+    pending = {primary, asyncio.ensure_future(attempt("pyttsx3"))}
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return task.result()
+            error = task.exception()
+    raise error
+
+@app.on_event("startup")
+async def start_offline_engine():
+    if TTS_ENGINE == "pyttsx3" or TTS_OFFLINE_FALLBACK:
+        await asyncio.to_thread(offline_pool.start)
+
+@app.on_event("shutdown")
+async def stop_offline_engine():
+    offline_pool.shutdown()
 
 @app.post("/tts")
 async def generate_tts(request: TTSRequest):
     text_to_speak = request.text
-    detected_language = detect_language(text_to_speak)
+    engine = request.engine or TTS_ENGINE
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine '{engine}', expected one of {list(ENGINES)}")
+    if engine == "pyttsx3" and offline_pool.available is False:
+        raise HTTPException(status_code=503, detail=f"Offline TTS engine unavailable: {offline_pool.error}")
+
+    try:
+        detected_language = await run_stage("detect", TTS_DETECT_TIMEOUT_SECONDS, detect_language, text_to_speak)
+    except asyncio.TimeoutError:
+        print(f"Language detection timed out, assuming {DEFAULT_LANGUAGE}")
+        detected_language = DEFAULT_LANGUAGE
 
     if detected_language != DEFAULT_LANGUAGE:
         print(f"Detected language: {detected_language}, translating to {DEFAULT_LANGUAGE}")
-        translated_text = translate_text(text_to_speak)
-        if translated_text:
-            audio_data = text_to_speech(translated_text, DEFAULT_LANGUAGE)
-            return {"audio": base64.b64encode(audio_data).decode('utf-8')}
-        else:
+        try:
+            translated_text = await run_stage("translate", TTS_TRANSLATE_TIMEOUT_SECONDS, translate_text, text_to_speak)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Translation timed out")
+        if not translated_text:
             raise HTTPException(status_code=500, detail="Translation failed")
+        text_to_speak = translated_text
     else:
         print(f"Text is in default language ({DEFAULT_LANGUAGE})")
-        audio_data = text_to_speech(text_to_speak, DEFAULT_LANGUAGE)
-        return {"audio": base64.b64encode(audio_data).decode('utf-8')}
+
+    try:
+        audio_data, cache_source, used_engine = await speak(text_to_speak, DEFAULT_LANGUAGE, request.slow, engine)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="TTS generation timed out")
+    except Exception as e:
+        print(f"TTS error: {e}")
+        raise HTTPException(status_code=500, detail="TTS generation failed")
+
+    return {
+        "audio": base64.b64encode(audio_data).decode('utf-8'),
+        "format": "mp3" if used_engine == "gtts" else audio_format(audio_data),
+        "engine": used_engine,
+        "cache": cache_source
+    }
+
+@app.get("/tts/cache")
+async def tts_cache_stats():
+    """Hit/miss counts and entry/byte totals of each engine's audio cache, and the offline engine's state"""
+    return {
+        "caches": {engine: cache.stats() for engine, cache in audio_caches.items()},
+        "offline_engine": offline_pool.stats()
+    }
+
+@app.post("/translate")
+async def translate_batch(request: TranslateRequest):
+    """Translate many strings in one call; cached ones are not sent again"""
+    try:
+        translations = await run_stage("translate", TTS_TRANSLATE_TIMEOUT_SECONDS, translate_texts,
+                                       request.texts, request.dest, request.src)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Translation timed out")
+    if translations is None:
+        raise HTTPException(status_code=500, detail="Translation failed")
+    return {"translations": translations}
+
+@app.get("/translate/cache")
+async def translation_cache_stats():
+    """Backend and hit/miss counts of the translation cache"""
+    return translator.stats()
 
 if __name__ == "__main__":
     import uvicorn
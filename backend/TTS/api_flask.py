@@ -1,21 +1,55 @@
 from flask import Flask, request, jsonify
 from gtts import gTTS
 from langdetect import detect, LangDetectException
-from googletrans import Translator
 import os
 import base64
 from io import BytesIO
 from flask_cors import CORS  # For handling Cross-Origin Requests
+from pathlib import Path
+from audio_cache import AudioCache
+from translation import CachedTranslator, TranslationCache, create_backend
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes (adjust as needed for security)
 DEFAULT_LANGUAGE = 'en'
 
+# Synthesized audio is cached by (text, language, speed, engine): up to
+# TTS_CACHE_MB in memory and, unless TTS_CACHE_DIR is set empty, up to
+# TTS_CACHE_DISK_MB on disk so repeated prompts survive restarts (0: no limit)
+TTS_CACHE_MB = float(os.getenv("TTS_CACHE_MB", "64"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", str(Path(__file__).resolve().parent / "tts_cache"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "512"))
+audio_cache = AudioCache(
+    max_bytes=TTS_CACHE_MB * 1024 * 1024,
+    disk_dir=TTS_CACHE_DIR or None,
+    max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024
+)
+
+# One long-lived translator for the whole app. TRANSLATION_BACKEND picks the
+# service ("googletrans", or "local" to pass text through offline), with up
+# to TRANSLATOR_POOL_SIZE pooled clients. Translations are cached by (text,
+# source, target): TRANSLATION_CACHE_SIZE entries in memory and, unless
+# TRANSLATION_CACHE_DIR is set empty, on disk.
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "googletrans")
+TRANSLATOR_POOL_SIZE = int(os.getenv("TRANSLATOR_POOL_SIZE", "4"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+TRANSLATION_CACHE_DIR = os.getenv("TRANSLATION_CACHE_DIR", str(Path(__file__).resolve().parent / "translation_cache"))
+translator = CachedTranslator(
+    create_backend(TRANSLATION_BACKEND, pool_size=TRANSLATOR_POOL_SIZE),
+    TranslationCache(max_entries=TRANSLATION_CACHE_SIZE, disk_dir=TRANSLATION_CACHE_DIR or None)
+)
+
 def translate_text(text, target_language=DEFAULT_LANGUAGE):
-    translator = Translator()
     try:
-        translation = translator.translate(text, dest=target_language)
-        return translation.text
+        return translator.translate(text, dest=target_language)
+    except Exception as e:
+        print(f"Translation error: {e}")
+        return None
+
+def translate_texts(texts, target_language=DEFAULT_LANGUAGE, source_language='auto'):
+    """Translations of many strings, in order, sent to the backend as one batch"""
+    try:
+        return translator.translate_many(texts, dest=target_language, src=source_language)
     except Exception as e:
         print(f"Translation error: {e}")
         return None
@@ -29,16 +63,21 @@ def detect_language(text):
         print(f"Language detection error: {e}")
         return DEFAULT_LANGUAGE
 
-def text_to_speech(text, lang=DEFAULT_LANGUAGE):
+def synthesize(text, lang=DEFAULT_LANGUAGE, slow=False):
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    audio_output = BytesIO()
+    tts.write_to_fp(audio_output)
+    return audio_output.getvalue()
+
+def text_to_speech(text, lang=DEFAULT_LANGUAGE, slow=False):
+    """MP3 bytes for `text` and the cache source ("memory", "disk", "miss" or
+    "coalesced"), or (None, None) when synthesis fails"""
     try:
-        tts = gTTS(text=text, lang=lang, slow=False)
-        audio_output = BytesIO()
-        tts.write_to_fp(audio_output)
-        audio_output.seek(0)
-        return audio_output.read()
+        key = AudioCache.key(text, lang, slow, "gtts")
+        return audio_cache.get_or_create(key, lambda: synthesize(text, lang, slow))
     except Exception as e:
         print(f"TTS error: {e}")
-        return None
+        return None, None
 
 @app.route('/tts', methods=['POST'])
 def tts_endpoint():
@@ -47,26 +86,52 @@ def tts_endpoint():
         return jsonify({'error': 'Missing "text" in request'}), 400
 
     text_to_speak = data['text']
+    slow = data.get('slow', False)
+    if not isinstance(slow, bool):
+        return jsonify({'error': '"slow" must be true or false'}), 400
     detected_language = detect_language(text_to_speak)
 
     if detected_language != DEFAULT_LANGUAGE:
         print(f"Detected language: {detected_language}, translating to {DEFAULT_LANGUAGE}")
         translated_text = translate_text(text_to_speak)
         if translated_text:
-            audio_data = text_to_speech(translated_text, DEFAULT_LANGUAGE)
+            audio_data, cache_source = text_to_speech(translated_text, DEFAULT_LANGUAGE, slow)
             if audio_data:
-                return jsonify({'audio': base64.b64encode(audio_data).decode('utf-8')}), 200
+                return jsonify({'audio': base64.b64encode(audio_data).decode('utf-8'), 'cache': cache_source}), 200
             else:
                 return jsonify({'error': 'TTS failed after translation'}), 500
         else:
             return jsonify({'error': 'Translation failed'}), 500
     else:
         print(f"Text is in default language ({DEFAULT_LANGUAGE})")
-        audio_data = text_to_speech(text_to_speak, DEFAULT_LANGUAGE)
+        audio_data, cache_source = text_to_speech(text_to_speak, DEFAULT_LANGUAGE, slow)
         if audio_data:
-            return jsonify({'audio': base64.b64encode(audio_data).decode('utf-8')}), 200
+            return jsonify({'audio': base64.b64encode(audio_data).decode('utf-8'), 'cache': cache_source}), 200
         else:
             return jsonify({'error': 'TTS failed'}), 500
 
+@app.route('/tts/cache', methods=['GET'])
+def tts_cache_stats():
+    # Hit/miss counts and entry/byte totals of the synthesized audio cache
+    return jsonify(audio_cache.stats()), 200
+
+@app.route('/translate', methods=['POST'])
+def translate_endpoint():
+    data = request.get_json()
+    if not data or not isinstance(data.get('texts'), list):
+        return jsonify({'error': 'Missing "texts" list in request'}), 400
+    if not all(isinstance(text, str) for text in data['texts']):
+        return jsonify({'error': '"texts" must contain only strings'}), 400
+
+    translations = translate_texts(data['texts'], data.get('dest', DEFAULT_LANGUAGE), data.get('src', 'auto'))
+    if translations is None:
+        return jsonify({'error': 'Translation failed'}), 500
+    return jsonify({'translations': translations}), 200
+
+@app.route('/translate/cache', methods=['GET'])
+def translation_cache_stats():
+    # Backend and hit/miss counts of the translation cache
+    return jsonify(translator.stats()), 200
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """Content-addressed cache of synthesized speech.
+
+    Entries live in an in-memory LRU holding at most `max_bytes` of audio
+    and, when `disk_dir` is given, in one file per key that survives
+    restarts; the disk tier drops its least recently used files once it
+    passes `max_disk_bytes` (0 for no limit). Concurrent misses for the same
+    key share a single synthesis. Safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir=None, max_disk_bytes: int = 0, suffix: str = ".mp3"):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.suffix = suffix
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Text as it is keyed: NFC, with runs of whitespace collapsed"""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def key(cls, text: str, lang: str, slow: bool = False, engine: str = "gtts") -> str:
+        payload = json.dumps([cls.normalize(text), lang, bool(slow), engine], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}{self.suffix}"
+
+    def _scan_disk(self):
+        files = []
+        for path in self.disk_dir.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str):
+        """Cached audio for `key` and the tier it came from ("memory" or
+        "disk"), or (None, None)"""
+        data, source = self._lookup(key)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+        return data, source
+
+    def _lookup(self, key: str):
+        # Like get(), without counting a miss
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key], "memory"
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+                with self._lock:
+                    self._remember(key, data)
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return data, "disk"
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Error reading cached audio %s: %s", key, e)
+        return None, None
+
+    def _remember(self, key: str, data: bytes):
+        # Called with the lock held
+        if len(data) > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            self._remember(key, data)
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so readers never see a partial file
+            temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning("Error writing cached audio %s: %s", key, e)
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            evict = []
+            while self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evict.append(old_key)
+        for old_key in evict:
+            try:
+                self._disk_path(old_key).unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Error removing cached audio %s: %s", old_key, e)
+
+    def get_or_create(self, key: str, create):
+        """
+        Cached audio for `key`, calling `create()` to synthesize it on a miss.
+        Returns (audio, source) where source is "memory", "disk", "miss" (this
+        call synthesized it) or "coalesced" (waited for another call's
+        synthesis). Errors from `create` reach every waiting caller and are
+        not cached.
+        """
+        for attempt in range(2):
+            data, source = self._lookup(key)
+            if data is not None:
+                return data, source
+
+            with self._lock:
+                # Another caller may have finished it since the lookup above
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return self._memory[key], "memory"
+                future = self._pending.get(key)
+                if future is None and key in self._disk and not attempt:
+                    continue  # only written to disk; read it back
+                owner = future is None
+                if owner:
+                    future = self._pending[key] = Future()
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+            break
+        if not owner:
+            return future.result(), "coalesced"
+
+        try:
+            data = create()
+            self.put(key, data)
+            future.set_result(data)
+            return data, "miss"
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_bytes,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes
+            }
@@ -0,0 +1,146 @@
+"""
+Offline speech synthesis with a pool of pyttsx3 engines.
+
+pyttsx3 engines are neither thread-safe nor cheap to start, so each one
+lives in its own worker process (spawned, not forked, so the workers never
+inherit the web server's threads) and is reused for every request that
+process handles.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Container formats pyttsx3 drivers write, by file signature
+_FORMATS = {b"RIFF": "wav", b"FORM": "aiff"}
+
+_engine = None
+_voices = {}
+_init_error = None
+
+
+def _init_engine(rate: int = None):
+    # An exception here would only break the pool with a generic error, so
+    # keep it for _ping and _synthesize to report
+    global _init_error
+    try:
+        _load_engine(rate)
+    except Exception as e:
+        _init_error = f"{type(e).__name__}: {e}"
+
+
+def _load_engine(rate: int = None):
+    global _engine
+    import pyttsx3
+    _engine = pyttsx3.init()
+    if rate:
+        _engine.setProperty("rate", rate)
+    for voice in _engine.getProperty("voices"):
+        for language in [voice.id, *(getattr(voice, "languages", None) or [])]:
+            if isinstance(language, bytes):
+                language = language.decode("utf-8", "ignore").lstrip("\x05")
+            code = str(language).lower().replace("_", "-").rsplit("/", 1)[-1].split("-")[0]
+            _voices.setdefault(code, voice.id)
+
+
+def _synthesize(text: str, lang: str) -> bytes:
+    """Runs in a pool process: speech for `text` as the driver's audio file bytes"""
+    if _init_error:
+        raise RuntimeError(_init_error)
+    if lang in _voices:
+        _engine.setProperty("voice", _voices[lang])
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        _engine.save_to_file(text, path)
+        _engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _ping() -> int:
+    if _init_error:
+        raise RuntimeError(_init_error)
+    return os.getpid()
+
+
+def audio_format(data: bytes) -> str:
+    """"wav" or "aiff" from the audio's signature, "wav" when unknown"""
+    return _FORMATS.get(data[:4], "wav")
+
+
+class OfflineEnginePool:
+    """
+    `workers` processes, each holding one pyttsx3 engine. The processes start
+    on first use; `start()` starts them ahead of time and reports whether an
+    engine could be created at all (pyttsx3 needs a platform driver, e.g.
+    eSpeak on Linux). Once that has failed the pool stays unavailable.
+    """
+
+    def __init__(self, workers: int = 2, rate: int = None):
+        self.workers = max(1, int(workers))
+        self.rate = rate
+        self._executor = None
+        self._lock = threading.Lock()
+        self.available = None
+        self.error = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_engine,
+                    initargs=(self.rate,)
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor = None):
+        """Shut down `executor` (the current one by default) if it is still in use"""
+        with self._lock:
+            if self._executor is None or (executor is not None and executor is not self._executor):
+                return
+            executor, self._executor = self._executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> bool:
+        """Start the worker processes; False when no engine can be created"""
+        if self.available is None:
+            try:
+                self._get_executor().submit(_ping).result()
+                self.available = True
+            except Exception as e:
+                self._fail(e)
+        return self.available
+
+    def _fail(self, error: Exception):
+        self.available = False
+        self.error = str(error) or "offline TTS engine failed to start"
+        logger.warning("Offline TTS engine unavailable: %s", self.error)
+        self._discard()
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        """Blocking synthesis on one of the pool's engines"""
+        if not self.start():
+            raise RuntimeError(f"Offline TTS engine unavailable: {self.error}")
+        executor = self._get_executor()
+        try:
+            return executor.submit(_synthesize, text, lang).result()
+        except BrokenProcessPool as e:
+            # A worker died; the next call starts a fresh pool
+            self._discard(executor)
+            raise RuntimeError(f"Offline TTS worker failed: {e}")
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "available": self.available, "error": self.error}
+
+    def shutdown(self):
+        self._discard()
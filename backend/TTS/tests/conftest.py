@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The TTS modules import each other by plain name, as when run from backend/TTS
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from audio_cache import AudioCache
+
+
+def test_key_ignores_whitespace_and_unicode_form():
+    assert AudioCache.key("hello   world ", "en") == AudioCache.key(" hello world", "en")
+    assert AudioCache.key("café", "fr") == AudioCache.key("café", "fr")
+
+
+def test_key_separates_language_speed_and_engine():
+    keys = {
+        AudioCache.key("hello", "en"),
+        AudioCache.key("hello", "ms"),
+        AudioCache.key("hello", "en", slow=True),
+        AudioCache.key("hello", "en", engine="pyttsx3")
+    }
+    assert len(keys) == 4
+
+
+def test_miss_then_memory_hit():
+    cache = AudioCache()
+    calls = []
+
+    def create():
+        calls.append(1)
+        return b"audio"
+
+    assert cache.get_or_create("k", create) == (b"audio", "miss")
+    assert cache.get_or_create("k", create) == (b"audio", "memory")
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["coalesced"]) == (1, 1, 0)
+
+
+def test_get_counts_a_miss():
+    cache = AudioCache()
+    assert cache.get("missing") == (None, None)
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    AudioCache(disk_dir=tmp_path).put("k", b"audio")
+
+    cache = AudioCache(disk_dir=tmp_path)
+    assert cache.stats()["disk_entries"] == 1
+    assert cache.get_or_create("k", lambda: pytest.fail("should not synthesize")) == (b"audio", "disk")
+    assert cache.get("k") == (b"audio", "memory")
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_memory_tier_stays_within_budget():
+    cache = AudioCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+    assert cache.get("a") == (None, None)
+    assert cache.get("c") == (b"12345", "memory")
+    assert cache.stats()["memory_bytes"] <= 10
+
+
+def test_disk_tier_drops_least_recently_used_files(tmp_path):
+    cache = AudioCache(max_bytes=0, disk_dir=tmp_path, max_disk_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"12345")
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2 and stats["disk_bytes"] == 10
+    assert cache.get("a") == (None, None)
+    assert cache.get("c") == (b"12345", "disk")
+
+
+@pytest.mark.parametrize("max_bytes", [0, 1024])
+def test_concurrent_misses_share_one_synthesis(tmp_path, max_bytes):
+    cache = AudioCache(max_bytes=max_bytes, disk_dir=tmp_path)
+    calls = []
+    sources = []
+
+    def create():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"audio"
+
+    def request():
+        sources.append(cache.get_or_create("k", create))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(data == b"audio" for data, _ in sources)
+    assert sorted(source for _, source in sources) == ["coalesced"] * 7 + ["miss"]
+    # Callers that waited on another's synthesis are not misses
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, 7)
+
+
+def test_errors_reach_waiters_and_are_not_cached():
+    cache = AudioCache()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("synthesis failed")
+
+    def request():
+        try:
+            cache.get_or_create("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=request)
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=request)
+    waiter.start()
+    owner.join()
+    waiter.join()
+
+    assert errors == ["synthesis failed"] * 2
+    assert cache.get_or_create("k", lambda: b"audio") == (b"audio", "miss")
@@ -0,0 +1,131 @@
+import pytest
+
+import translation
+from translation import CachedTranslator, GoogletransBackend, LocalBackend, TranslationCache, create_backend
+
+
+class FakeResult:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeClient:
+    """Upper-cases text the way a translation service might, padding the reply"""
+
+    def __init__(self, requests, merge_lines=False):
+        self.requests = requests
+        self.merge_lines = merge_lines
+
+    def translate(self, text, dest, src):
+        self.requests.append(text)
+        reply = text.upper()
+        if self.merge_lines:
+            reply = reply.replace("\n", " ")
+        return FakeResult(f" {reply} ")
+
+
+def googletrans_backend(requests, merge_lines=False):
+    backend = GoogletransBackend(pool_size=2)
+    backend._new_client = lambda: FakeClient(requests, merge_lines)
+    return backend
+
+
+def test_create_backend():
+    assert isinstance(create_backend("local", pool_size=4), LocalBackend)
+    with pytest.raises(ValueError):
+        create_backend("nope")
+
+
+def test_local_backend_uses_its_mapping():
+    backend = LocalBackend({("hello", "ms"): "helo", "thanks": "terima kasih"})
+    assert backend.translate_batch(["hello", "thanks", "other"], "ms") == ["helo", "terima kasih", "other"]
+
+
+def test_repeated_texts_are_translated_once():
+    backend = LocalBackend({"hello": "helo"})
+    translator = CachedTranslator(backend)
+    assert translator.translate_many(["hello", "hello", "  ", "bye"], "ms") == ["helo", "helo", "  ", "bye"]
+    assert backend.calls == 1
+    assert translator.stats()["misses"] == 3
+
+
+def test_cached_texts_skip_the_backend():
+    backend = LocalBackend({"hello": "helo"})
+    translator = CachedTranslator(backend)
+    translator.translate("hello", "ms")
+    assert translator.translate_many(["hello"], "ms") == ["helo"]
+    assert backend.calls == 1
+    assert translator.stats()["hits"] == 1
+
+
+def test_cache_is_keyed_on_languages():
+    backend = LocalBackend({("hello", "ms"): "helo", ("hello", "th"): "sawasdee"})
+    translator = CachedTranslator(backend)
+    assert translator.translate("hello", "ms") == "helo"
+    assert translator.translate("hello", "th") == "sawasdee"
+    assert backend.calls == 2
+
+
+def test_disk_cache_survives_a_new_translator(tmp_path):
+    CachedTranslator(LocalBackend({"hello": "helo"}), TranslationCache(disk_dir=tmp_path)).translate("hello", "ms")
+
+    backend = LocalBackend()
+    translator = CachedTranslator(backend, TranslationCache(disk_dir=tmp_path))
+    assert translator.translate("hello", "ms") == "helo"
+    assert backend.calls == 0
+    assert translator.stats()["disk_hits"] == 1
+
+
+def test_memory_cache_stays_within_its_size():
+    cache = TranslationCache(max_entries=2)
+    for text in ["a", "b", "c"]:
+        cache.put(text, text.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_googletrans_batch_is_one_request():
+    requests = []
+    backend = googletrans_backend(requests)
+    assert backend.translate_batch(["good morning", "thank you"], "ms") == ["GOOD MORNING", "THANK YOU"]
+    assert requests == ["good morning\nthank you"]
+
+
+def test_googletrans_single_and_batch_results_match():
+    requests = []
+    backend = googletrans_backend(requests)
+    assert backend.translate_batch(["hello"], "ms") == backend.translate_batch(["hello", "bye"], "ms")[:1]
+
+
+def test_googletrans_multiline_texts_go_alone():
+    requests = []
+    backend = googletrans_backend(requests)
+    assert backend.translate_batch(["a", "b\nc", "d"], "ms") == ["A", "B\nC", "D"]
+    assert sorted(requests) == ["a\nd", "b\nc"]
+
+
+def test_googletrans_uneven_reply_falls_back_to_one_request_per_text():
+    requests = []
+    backend = googletrans_backend(requests, merge_lines=True)
+    assert backend.translate_batch(["a", "b"], "ms") == ["A", "B"]
+    assert requests == ["a\nb", "a", "b"]
+
+
+def test_googletrans_batches_stay_under_the_size_limit(monkeypatch):
+    monkeypatch.setattr(translation, "MAX_BATCH_CHARS", 10)
+    requests = []
+    backend = googletrans_backend(requests)
+    assert backend.translate_batch(["aaaa", "bbbb", "cccc"], "ms") == ["AAAA", "BBBB", "CCCC"]
+    assert requests == ["aaaa\nbbbb", "cccc"]
+
+
+def test_split_batches_are_not_written_to_disk(tmp_path):
+    requests = []
+    cache = TranslationCache(disk_dir=tmp_path)
+    translator = CachedTranslator(googletrans_backend(requests), cache)
+    translator.translate_many(["a", "b"], "ms")
+    assert not list(tmp_path.glob("*/*.json"))
+
+    translator.translate("c", "ms")
+    assert len(list(tmp_path.glob("*/*.json"))) == 1
@@ -0,0 +1,271 @@
+"""
+Cached, pooled translation.
+
+`CachedTranslator` answers from a `TranslationCache` first and sends only
+the misses to a `TranslationBackend`, batching many strings into one
+request where the backend supports it. Backends are looked up by name in
+BACKENDS, so a local stand-in can replace the online service.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Google Translate rejects requests much over 5000 characters
+MAX_BATCH_CHARS = 4500
+
+
+class TranslationBackend:
+    """A translation service. Subclasses translate a list of strings in one go."""
+
+    name = "backend"
+    # False when a batch's results are split from one combined reply and so
+    # are less certain than translating each text alone
+    exact_batches = True
+
+    def translate_batch(self, texts: list, dest: str, src: str = "auto") -> list:
+        raise NotImplementedError
+
+
+class LocalBackend(TranslationBackend):
+    """Offline stand-in: looks texts up in `mapping` ({(text, dest): translation}
+    or {text: translation}) and returns anything else unchanged. Connection
+    options meant for online backends are ignored."""
+
+    name = "local"
+
+    def __init__(self, mapping: dict = None, **options):
+        self.mapping = dict(mapping or {})
+        self.calls = 0
+
+    def translate_batch(self, texts: list, dest: str, src: str = "auto") -> list:
+        self.calls += 1
+        return [self.mapping.get((text, dest), self.mapping.get(text, text)) for text in texts]
+
+
+class GoogletransBackend(TranslationBackend):
+    """
+    googletrans with a pool of long-lived clients, so requests reuse their
+    HTTP connections instead of opening new ones. A batch is sent as one
+    newline-joined request per MAX_BATCH_CHARS and split back apart; texts
+    that contain newlines, or a batch whose reply does not split evenly, go
+    one request per text. Either way results come back stripped of
+    surrounding whitespace.
+    """
+
+    name = "googletrans"
+    exact_batches = False
+
+    def __init__(self, pool_size: int = 4, timeout: float = 10.0, service_urls: list = None):
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.service_urls = service_urls
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_client(self):
+        from googletrans import Translator
+        kwargs = {"timeout": self.timeout}
+        if self.service_urls:
+            kwargs["service_urls"] = self.service_urls
+        return Translator(**kwargs)
+
+    @contextmanager
+    def client(self):
+        """Borrow a client, creating up to `pool_size` of them on demand"""
+        try:
+            translator = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    translator = self._new_client()
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                translator = self._idle.get()
+        try:
+            yield translator
+        finally:
+            self._idle.put(translator)
+
+    def _translate_one(self, text: str, dest: str, src: str) -> str:
+        with self.client() as translator:
+            return translator.translate(text, dest=dest, src=src).text.strip()
+
+    def translate_batch(self, texts: list, dest: str, src: str = "auto") -> list:
+        results = [None] * len(texts)
+        group, size = [], 0
+
+        def flush():
+            if not group:
+                return
+            joined = self._translate_one("\n".join(texts[i] for i in group), dest, src) if len(group) > 1 else None
+            parts = joined.split("\n") if joined is not None else []
+            if len(parts) == len(group):
+                for i, part in zip(group, parts):
+                    results[i] = part.strip()
+            else:
+                for i in group:
+                    results[i] = self._translate_one(texts[i], dest, src)
+            group.clear()
+
+        for i, text in enumerate(texts):
+            if "\n" in text or len(text) >= MAX_BATCH_CHARS:
+                results[i] = self._translate_one(text, dest, src)
+                continue
+            if size + len(text) + 1 > MAX_BATCH_CHARS:
+                flush()
+                size = 0
+            group.append(i)
+            size += len(text) + 1
+        flush()
+        return results
+
+
+BACKENDS = {
+    GoogletransBackend.name: GoogletransBackend,
+    LocalBackend.name: LocalBackend
+}
+
+
+def create_backend(name: str, **options) -> TranslationBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translation backend '{name}', expected one of {list(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+class TranslationCache:
+    """Translations in an in-memory LRU of `max_entries` items and, when
+    `disk_dir` is given, in one small JSON file per key that survives
+    restarts. Safe to use from several threads."""
+
+    def __init__(self, max_entries: int = 4096, disk_dir=None):
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, src: str, dest: str) -> str:
+        payload = json.dumps([text, src, dest], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    value = json.load(f)["value"]
+                with self._lock:
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Error reading cached translation %s: %s", key, e)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, key: str, value: str):
+        # Called with the lock held
+        if not self.max_entries:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value: str, persist: bool = True):
+        """Cache `value`; with persist=False it is kept in memory only"""
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_dir and persist:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write then rename so readers never see a partial file
+                temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"value": value}, f, ensure_ascii=False)
+                os.replace(temp_path, path)
+            except Exception as e:
+                logger.warning("Error writing cached translation %s: %s", key, e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self.disk_dir is not None
+            }
+
+
+class CachedTranslator:
+    """A long-lived translator: cache first, then one backend batch for the misses"""
+
+    def __init__(self, backend: TranslationBackend, cache: TranslationCache = None):
+        self.backend = backend
+        self.cache = cache or TranslationCache(disk_dir=None)
+
+    def translate(self, text: str, dest: str, src: str = "auto") -> str:
+        return self.translate_many([text], dest, src)[0]
+
+    def translate_many(self, texts: list, dest: str, src: str = "auto") -> list:
+        """Translations of `texts` in order; repeated and cached texts are sent once or not at all"""
+        results = [None] * len(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            if not text.strip():
+                results[i] = text
+                continue
+            cached = self.cache.get(TranslationCache.key(text, src, dest))
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+
+        if missing:
+            unique = list(missing)
+            # Results split from a combined reply only live as long as the process
+            persist = self.backend.exact_batches or len(unique) == 1
+            for text, translation in zip(unique, self.backend.translate_batch(unique, dest, src)):
+                self.cache.put(TranslationCache.key(text, src, dest), translation, persist=persist)
+                for i in missing[text]:
+                    results[i] = translation
+        return results
+
+    def stats(self) -> dict:
+        return {"backend": self.backend.name, **self.cache.stats()}
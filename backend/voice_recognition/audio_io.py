@@ -0,0 +1,229 @@
+"""
+Streaming audio in and out of ffmpeg without temp files.
+
+Uploads are fed to ffmpeg a chunk at a time while its output is read
+back, so neither the encoded upload nor the encoded response is ever held
+whole in memory, and both directions stop at a size cap.
+"""
+import asyncio
+import json
+import struct
+
+import numpy as np
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+OUTPUT_CHUNK_BYTES = 64 * 1024
+
+# Response formats for denoised audio: (media type, ffmpeg output args or
+# None for WAV, which is written directly)
+OUTPUT_FORMATS = {
+    "wav": ("audio/wav", None),
+    "flac": ("audio/flac", ["-c:a", "flac", "-f", "flac"]),
+    "opus": ("audio/ogg", ["-c:a", "libopus", "-b:a", "64k", "-f", "ogg"])
+}
+
+
+class UploadTooLargeError(Exception):
+    """An upload, or the audio decoded from it, is over its size cap"""
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of the paths in `limits`
+    ({path: bytes}). A declared Content-Length over the cap is refused before
+    anything is read; otherwise bytes are counted as they arrive, so chunked
+    uploads without a length are cut off too. Either way the client gets a
+    413, and `on_reject(path)` is called. `slack` leaves room for multipart
+    boundaries and form fields.
+    """
+
+    def __init__(self, app, limits: dict, on_reject=None, slack: int = 64 * 1024):
+        self.app = app
+        self.limits = limits
+        self.on_reject = on_reject
+        self.slack = slack
+
+    async def _reject(self, path: str, limit: int, send):
+        if self.on_reject is not None:
+            self.on_reject(path)
+        body = json.dumps({"error": f"Upload is larger than {limit / 1024 / 1024:.3g} MB"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit + self.slack:
+            await self._reject(scope["path"], limit, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + self.slack:
+                    # The app sees a client that went away and stops parsing
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                # Whatever the app answers to the cut-off body is replaced by the 413
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(scope["path"], limit, send)
+
+
+async def upload_chunks(upload, max_bytes: int = None, chunk_size: int = UPLOAD_CHUNK_BYTES):
+    """An UploadFile's bytes a chunk at a time, failing once it passes `max_bytes`"""
+    total = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise UploadTooLargeError(f"Upload is larger than {max_bytes / 1024 / 1024:.0f} MB")
+        yield chunk
+
+
+async def _single(data: bytes):
+    yield data
+
+
+async def ffmpeg_stream(args: list, chunks, read_size: int = OUTPUT_CHUNK_BYTES):
+    """
+    Run `ffmpeg -i pipe:0 ... pipe:1`-style `args`, writing `chunks` (bytes
+    or an async iterator of bytes) to its stdin while yielding its stdout.
+    An error from `chunks` kills ffmpeg and is raised once its output ends.
+    """
+    if isinstance(chunks, (bytes, bytearray)):
+        chunks = _single(bytes(chunks))
+    process = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-v', 'error', *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg stopped reading; its exit status says why
+            pass
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    errors = asyncio.create_task(process.stderr.read())
+    try:
+        while True:
+            data = await process.stdout.read(read_size)
+            if not data:
+                break
+            yield data
+        await feeder
+        stderr = await errors
+        if await process.wait() != 0:
+            raise Exception(f"FFmpeg failed: {stderr.decode(errors='replace').strip()}")
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        feeder.cancel()
+        errors.cancel()
+
+
+async def decode_stream(chunks, sample_rate: int, max_seconds: float = None) -> np.ndarray:
+    """Decode an encoded upload into a mono float32 buffer at `sample_rate`,
+    failing once the decoded audio passes `max_seconds`"""
+    limit = int(max_seconds * sample_rate) * 4 if max_seconds else None
+    buffer = bytearray()
+    async for data in ffmpeg_stream([
+        '-i', 'pipe:0',                # Read the upload from stdin
+        '-f', 'f32le',                 # Raw little-endian float32 samples
+        '-acodec', 'pcm_f32le',
+        '-ar', str(sample_rate),       # Resample once, to the target rate
+        '-ac', '1',                    # Convert to mono
+        'pipe:1'                       # Write samples to stdout
+    ], chunks):
+        buffer += data
+        if limit and len(buffer) > limit:
+            raise UploadTooLargeError(f"Audio is longer than {max_seconds:.0f} seconds")
+    # A bytearray is writable, so downstream stages may modify the samples in place
+    return np.frombuffer(buffer, dtype=np.float32)
+
+
+def wav_header(num_samples: int, sample_rate: int) -> bytes:
+    """44-byte header of a mono 16-bit PCM WAV file"""
+    data_size = num_samples * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", data_size
+    )
+
+
+def _pcm16_blocks(audio: np.ndarray, block_samples: int):
+    for start in range(0, len(audio), block_samples):
+        block = np.clip(audio[start:start + block_samples], -1.0, 1.0)
+        yield np.round(block * 32767).astype("<i2").tobytes()
+
+
+async def _float_blocks(audio: np.ndarray, block_samples: int):
+    for start in range(0, len(audio), block_samples):
+        yield audio[start:start + block_samples].astype("<f4", copy=False).tobytes()
+
+
+def encoded_size(audio: np.ndarray, output_format: str):
+    """Byte size of the encoded response when it is known up front (WAV), else None"""
+    return 44 + len(audio) * 2 if output_format == "wav" else None
+
+
+async def encode_stream(audio: np.ndarray, sample_rate: int, output_format: str = "wav"):
+    """Encoded bytes of a mono float32 buffer, a block at a time"""
+    block_samples = OUTPUT_CHUNK_BYTES // 2
+    if output_format == "wav":
+        yield wav_header(len(audio), sample_rate)
+        for block in _pcm16_blocks(audio, block_samples):
+            yield block
+        return
+
+    async for data in ffmpeg_stream([
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+        *OUTPUT_FORMATS[output_format][1],
+        'pipe:1'
+    ], _float_blocks(audio, block_samples)):
+        yield data
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects concurrent requests for a short window and runs them as one batch.
+
+    `process_batch` is a blocking callable that takes a list of items and returns
+    a list of results in the same order. It runs on `worker` (an InferenceWorker)
+    when given, otherwise in a plain thread, so the event loop stays free while
+    the batch is being processed.
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 8, max_wait_ms: float = 10.0, name: str = "batcher", worker=None):
+        self.process_batch = process_batch
+        self.worker = worker
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    async def submit(self, item, ticket: dict = None):
+        """Queue a single item and wait for its own result"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        if ticket is not None:
+            ticket["enqueued_at"] = time.perf_counter()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, ticket))
+        self._wakeup.set()
+        return await future
+
+    def shutdown(self):
+        """Stop the batching task and drop anything still queued; the next
+        submit() starts a new task"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            future.cancel()
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        # Keep gathering until the batch is full or the wait window closes
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        batch = []
+        while self._pending and len(batch) < self.max_batch_size:
+            item, future, ticket = self._pending.popleft()
+            # Callers that gave up while waiting don't take a batch slot
+            if not future.cancelled():
+                batch.append((item, future, ticket))
+        return batch
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            logger.debug("[%s] Running batch of %d", self.name, len(batch))
+            items = [item for item, _, _ in batch]
+            try:
+                if self.worker is not None:
+                    tickets = [ticket for _, _, ticket in batch if ticket is not None]
+                    results = await self.worker.run(self.process_batch, items, tickets=tickets)
+                else:
+                    results = await asyncio.to_thread(self.process_batch, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
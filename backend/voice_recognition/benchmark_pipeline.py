@@ -0,0 +1,295 @@
+"""
+Offline throughput benchmark for the whole /transcribe/ pipeline.
+
+    python benchmark_pipeline.py --concurrency 1,4,8 --output bench.json
+
+Nothing is downloaded. Every COUNTRY_MODELS handler type (pipeline,
+malaysian, thai) gets a tiny randomly initialised Whisper built locally, and
+the base model is a random openai-whisper of the same size. Synthetic clips
+of several lengths and noise levels are posted to the app in-process at each
+concurrency level, with the result cache off so every request does the full
+work. The report has latency percentiles, requests/sec and the per-stage
+timings the app returns, so runs can be compared across commits.
+
+Random weights never predict end-of-text, so every decode runs to its length
+limit: absolute numbers are a worst case, the change between commits is what
+matters.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+
+SAMPLE_RATE = 16000
+
+
+def build_standin_model(path: Path, d_model: int, layers: int, max_length: int, seed: int = 0) -> Path:
+    """A randomly initialised Whisper checkpoint whose byte-level tokenizer
+    carries Whisper's special tokens, enough for any handler type to load it"""
+    from transformers import (GenerationConfig, WhisperConfig, WhisperFeatureExtractor,
+                              WhisperForConditionalGeneration, WhisperProcessor, WhisperTokenizer)
+    from transformers.models.whisper.tokenization_whisper import LANGUAGES, bytes_to_unicode
+
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "vocab.json").write_text(json.dumps({c: i for i, c in enumerate(bytes_to_unicode().values())}))
+    (path / "merges.txt").write_text("#version: 0.2\n")
+    tokenizer = WhisperTokenizer(
+        str(path / "vocab.json"), str(path / "merges.txt"),
+        bos_token="<|endoftext|>", eos_token="<|endoftext|>", unk_token="<|endoftext|>", pad_token="<|endoftext|>"
+    )
+    specials = (["<|startoftranscript|>"] + [f"<|{language}|>" for language in LANGUAGES]
+                + ["<|translate|>", "<|transcribe|>", "<|startoflm|>", "<|startofprev|>",
+                   "<|nocaptions|>", "<|notimestamps|>"])
+    tokenizer.add_special_tokens({"additional_special_tokens": specials})
+    ids = {token: tokenizer.convert_tokens_to_ids(token) for token in ["<|endoftext|>"] + specials}
+    WhisperProcessor(WhisperFeatureExtractor(), tokenizer).save_pretrained(path)
+
+    eos = ids["<|endoftext|>"]
+    config = WhisperConfig(
+        vocab_size=len(tokenizer), d_model=d_model, encoder_layers=layers, decoder_layers=layers,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=2 * d_model, decoder_ffn_dim=2 * d_model,
+        decoder_start_token_id=ids["<|startoftranscript|>"], eos_token_id=eos, pad_token_id=eos, bos_token_id=eos,
+        suppress_tokens=[], begin_suppress_tokens=[]
+    )
+    torch.manual_seed(seed)
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config = GenerationConfig(
+        decoder_start_token_id=config.decoder_start_token_id, eos_token_id=eos, pad_token_id=eos,
+        max_length=max_length, is_multilingual=True,
+        lang_to_id={f"<|{language}|>": ids[f"<|{language}|>"] for language in LANGUAGES},
+        task_to_id={"transcribe": ids["<|transcribe|>"], "translate": ids["<|translate|>"]},
+        no_timestamps_token_id=ids["<|notimestamps|>"], forced_decoder_ids=None,
+        suppress_tokens=[], begin_suppress_tokens=[]
+    )
+    model.save_pretrained(path)
+    return path
+
+
+def build_standin_base(d_model: int, layers: int, seed: int = 0):
+    """Random openai-whisper model with the real vocabulary, so whisper.decode works unchanged"""
+    from whisper.model import ModelDimensions, Whisper
+
+    torch.manual_seed(seed)
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=d_model, n_audio_head=2, n_audio_layer=layers,
+        n_vocab=51865, n_text_ctx=448, n_text_state=d_model, n_text_head=2, n_text_layer=layers
+    )
+    return Whisper(dims).eval()
+
+
+def synthetic_clip(seconds: float, snr_db: float, rng: np.random.Generator) -> np.ndarray:
+    """Speech-like audio: harmonic 'syllables' at random pitches, separated by
+    pauses (some long enough for VAD and chunking to split on), plus white
+    noise at `snr_db`"""
+    total = int(seconds * SAMPLE_RATE)
+    speech = np.zeros(total, dtype=np.float32)
+    position = int(rng.uniform(0.2, 0.6) * SAMPLE_RATE)
+    while position < total:
+        length = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        t = np.arange(length) / SAMPLE_RATE
+        pitch = rng.uniform(90, 260)
+        syllable = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6)) * np.hanning(length)
+        end = min(total, position + length)
+        speech[position:end] = syllable[:end - position]
+        position = end + int((rng.uniform(0.6, 1.0) if rng.random() < 0.1 else rng.uniform(0.04, 0.2)) * SAMPLE_RATE)
+
+    speech_rms = np.sqrt(np.mean(speech ** 2)) or 1.0
+    noise = rng.normal(0, speech_rms / 10 ** (snr_db / 20), total)
+    clip = speech + noise
+    return (clip * 0.9 / np.max(np.abs(clip))).astype(np.float32)
+
+
+def make_clips(lengths: list, snrs: list, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    clips = []
+    for seconds in lengths:
+        for snr_db in snrs:
+            buffer = io.BytesIO()
+            sf.write(buffer, synthetic_clip(seconds, snr_db, rng), SAMPLE_RATE, format="WAV", subtype="PCM_16")
+            clips.append({"name": f"synthetic_{seconds:g}s_{snr_db:g}db.wav", "seconds": seconds,
+                          "snr_db": snr_db, "data": buffer.getvalue()})
+    return clips
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max())
+    }
+
+
+def stage_breakdown(timings: list) -> dict:
+    """Per-stage summaries over the `timings` blocks of many responses"""
+    stages, model_stages = {}, {}
+    for timing in timings:
+        for stage, seconds in timing.items():
+            if stage == "models":
+                for model, per_model in seconds.items():
+                    for model_stage, model_seconds in per_model.items():
+                        model_stages.setdefault(model, {}).setdefault(model_stage, []).append(model_seconds)
+            else:
+                stages.setdefault(stage, []).append(seconds)
+    return {
+        "stages": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "model_stages": {
+            model: {stage: summarize(values) for stage, values in sorted(per_model.items())}
+            for model, per_model in sorted(model_stages.items())
+        }
+    }
+
+
+async def post_clip(client, clip: dict, country: str, cascade: bool) -> dict:
+    form = {"country": country, "timings": "true"}
+    if cascade:
+        form["cascade"] = "true"
+    start = time.perf_counter()
+    response = await client.post("/transcribe/", files={"file": (clip["name"], clip["data"], "audio/wav")}, data=form)
+    return {
+        "status": response.status_code,
+        "seconds": time.perf_counter() - start,
+        "timings": response.json().get("timings") if response.status_code == 200 else None
+    }
+
+
+async def run_level(client, clips: list, countries: list, concurrency: int, requests: int, cascade: bool) -> dict:
+    """`requests` posts cycling through clips and countries, `concurrency` in flight at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await post_clip(client, clips[i % len(clips)], countries[i % len(countries)], cascade)
+
+    start = time.perf_counter()
+    rows = await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    ok = [row for row in rows if row["status"] == 200]
+    return dict({
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": len(ok),
+        "rejected": sum(row["status"] == 429 for row in rows),
+        "failed": sum(row["status"] not in (200, 429) for row in rows),
+        "seconds": elapsed,
+        "requests_per_second": len(ok) / elapsed,
+        "audio_seconds_per_second": sum(
+            clips[i % len(clips)]["seconds"] for i, row in enumerate(rows) if row["status"] == 200
+        ) / elapsed,
+        "latency": summarize([row["seconds"] for row in ok])
+    }, **stage_breakdown([row["timings"] for row in ok if row["timings"]]))
+
+
+async def benchmark(args, model_dir: Path) -> dict:
+    # The app reads its settings at import time
+    os.environ["RESULT_CACHE_SIZE"] = "0"
+    os.environ.pop("RESULT_CACHE_DIR", None)
+    os.environ.pop("PRELOAD_MODELS", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import httpx
+    import main as server
+
+    # Every handler type gets its own stand-in; countries of the same type share it
+    standins = {}
+    for seed, model_type in enumerate(sorted({config["type"] for config in server.COUNTRY_MODELS.values()})):
+        standins[model_type] = str(build_standin_model(
+            model_dir / model_type, args.d_model, args.layers, args.max_length, seed
+        ))
+    for config in server.COUNTRY_MODELS.values():
+        config["model_id"] = standins[config["type"]]
+        config["draft_model_id"] = None
+    base = build_standin_base(args.d_model, args.layers)
+    server.whisper.load_model = lambda *a, **kw: base
+
+    countries = args.countries or list(server.COUNTRY_MODELS)
+    clips = make_clips(args.lengths, args.snr, args.seed)
+    await server.initialize_models()
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Load every model and run each code path once before timing anything
+            for country in countries:
+                warmup = await post_clip(client, clips[0], country, args.cascade)
+                if warmup["status"] != 200:
+                    raise RuntimeError(f"Warm-up request for {country} failed with {warmup['status']}")
+
+            levels = []
+            for concurrency in args.concurrency:
+                levels.append(await run_level(
+                    client, clips, countries, concurrency, args.requests or 4 * concurrency, args.cascade
+                ))
+    finally:
+        server.inference_pool.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "torch_threads": torch.get_num_threads(),
+        "cpu_count": os.cpu_count(),
+        "standin": {"d_model": args.d_model, "layers": args.layers, "max_length": args.max_length},
+        "countries": {country: server.COUNTRY_MODELS[country]["type"] for country in countries},
+        "cascade": args.cascade,
+        "clips": [{key: clip[key] for key in ("name", "seconds", "snr_db")} for clip in clips],
+        "levels": levels
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def number_list(kind):
+    return lambda value: [kind(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcription pipeline with local stand-in models")
+    parser.add_argument("--concurrency", type=number_list(int), default=[1, 4, 8],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, help="Requests per level (default 4 x concurrency)")
+    parser.add_argument("--countries", type=lambda value: value.split(","), help="COUNTRY_MODELS keys to cycle through")
+    parser.add_argument("--lengths", type=number_list(float), default=[3, 10, 25, 45], help="Clip lengths in seconds")
+    parser.add_argument("--snr", type=number_list(float), default=[30, 10, 0], help="Clip noise levels (SNR in dB)")
+    parser.add_argument("--d-model", type=int, default=64, help="Stand-in model width")
+    parser.add_argument("--layers", type=int, default=2, help="Stand-in encoder and decoder layers")
+    parser.add_argument("--max-length", type=int, default=64, help="Stand-in generation length limit")
+    parser.add_argument("--cascade", action="store_true", help="Run requests in cascade mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-dir", type=Path, help="Where to write the stand-in models (default: a temp dir)")
+    parser.add_argument("--output", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        report = asyncio.run(benchmark(args, args.model_dir or Path(temp_dir)))
+
+    print(f"\n{'concurrency':>11}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'rejected':>10}{'failed':>8}")
+    for level in report["levels"]:
+        latency = level["latency"] or {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+        print(f"{level['concurrency']:>11}{level['requests_per_second']:>8.2f}{latency['p50']:>8.2f}"
+              f"{latency['p95']:>8.2f}{latency['p99']:>8.2f}{level['rejected']:>10}{level['failed']:>8}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compare fp32 / bf16 / int8 inference for one COUNTRY_MODELS entry on a local
+audio set, reporting latency, model memory, process RSS and WER.
+
+    python benchmark_precision.py --country Malaysia --audio-dir ./samples
+
+Any `<clip>.txt` next to an audio file is used as its reference transcript;
+clips without one are scored against the fp32 output instead, so the WER
+column then reads as the drift introduced by the reduced precision.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from features import SharedFeatures
+from main import COUNTRY_MODELS, MODEL_CACHE_DIR, ModelHandler, decode_audio
+from metrics import current_rss_bytes
+from precision import PRECISIONS
+
+AUDIO_EXTENSIONS = {".wav", ".m4a", ".mp3", ".flac", ".ogg", ".opus", ".webm"}
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Levenshtein distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_clips(audio_dir: Path):
+    clips = []
+    for path in sorted(audio_dir.iterdir()):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        audio = asyncio.run(decode_audio(path.read_bytes()))
+        reference_path = path.with_suffix(".txt")
+        reference = reference_path.read_text(encoding="utf-8").strip() if reference_path.exists() else None
+        clips.append({"name": path.name, "audio": audio, "reference": reference})
+    return clips
+
+
+def benchmark(country: str, precision: str, clips: list, repeats: int) -> dict:
+    config = dict(COUNTRY_MODELS[country], precision=precision)
+    handler = ModelHandler(config, MODEL_CACHE_DIR / config["model_id"].replace('/', '_'))
+
+    rss_before = current_rss_bytes()
+    load_start = time.perf_counter()
+    if not handler._load():
+        raise RuntimeError(f"Failed to load {config['model_id']} at {precision}")
+    load_seconds = time.perf_counter() - load_start
+    rss_after_load = current_rss_bytes()
+
+    # One untimed pass so lazy initialisation doesn't count against the first clip
+    handler._transcribe_batch(SharedFeatures(clips[0]["audio"]).items())
+
+    latencies = []
+    texts = {}
+    for clip in clips:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = handler._transcribe_batch(SharedFeatures(clip["audio"]).items())[0]
+            texts[clip["name"]] = (result or {}).get("text") or ""
+            latencies.append(time.perf_counter() - start)
+
+    result = {
+        "precision": precision,
+        "load_seconds": load_seconds,
+        "model_memory_mb": handler.memory_bytes() / 1024 / 1024,
+        "rss_delta_mb": (rss_after_load - rss_before) / 1024 / 1024 if rss_before and rss_after_load else None,
+        "latency_mean_seconds": float(np.mean(latencies)),
+        "latency_p50_seconds": float(np.percentile(latencies, 50)),
+        "latency_p95_seconds": float(np.percentile(latencies, 95)),
+        "texts": texts
+    }
+
+    handler.unload()
+    gc.collect()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Whisper handler precisions")
+    parser.add_argument("--country", required=True, choices=list(COUNTRY_MODELS))
+    parser.add_argument("--audio-dir", required=True, type=Path)
+    parser.add_argument("--precisions", default=",".join(PRECISIONS),
+                        help="Comma-separated list, fp32 is always run as the baseline")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    clips = load_clips(args.audio_dir)
+    if not clips:
+        raise SystemExit(f"No audio files found in {args.audio_dir}")
+
+    precisions = ["fp32"] + [p for p in args.precisions.split(",") if p and p != "fp32"]
+    results = [benchmark(args.country, precision, clips, args.repeats) for precision in precisions]
+
+    baseline = results[0]["texts"]
+    for result in results:
+        errors = [
+            word_error_rate(clip["reference"] or baseline[clip["name"]], result["texts"][clip["name"]])
+            for clip in clips
+        ]
+        result["wer"] = float(np.mean(errors))
+    for result in results:
+        result["wer_delta"] = result["wer"] - results[0]["wer"]
+
+    print(f"\n{'precision':<10}{'load s':>8}{'model MB':>10}{'RSS MB':>9}{'p50 s':>8}{'p95 s':>8}{'WER':>7}{'dWER':>8}")
+    for r in results:
+        rss = f"{r['rss_delta_mb']:.0f}" if r["rss_delta_mb"] is not None else "-"
+        print(f"{r['precision']:<10}{r['load_seconds']:>8.2f}{r['model_memory_mb']:>10.0f}{rss:>9}"
+              f"{r['latency_p50_seconds']:>8.3f}{r['latency_p95_seconds']:>8.3f}{r['wer']:>7.3f}{r['wer_delta']:>+8.3f}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"country": args.country, "results": results}, indent=2, ensure_ascii=False))
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare plain and speculative (draft-assisted) decoding for one COUNTRY_MODELS
+entry on a local audio set, reporting tokens/sec, latency and whether both
+modes produced the same output.
+
+    python benchmark_speculative.py --country Malaysia --audio-dir ./samples
+
+The draft defaults to openai/whisper-tiny and is loaded at the model's
+configured precision. Greedy assisted decoding reproduces plain generate
+token for token, apart from near-ties that verifying several tokens in one
+forward pass can flip; any clip where the outputs differ is listed.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmark_precision import load_clips
+from features import SharedFeatures
+from main import COUNTRY_MODELS, MODEL_CACHE_DIR, ModelHandler
+
+
+def time_generate(handler: ModelHandler, features, speculative: bool, repeats: int):
+    """Best-of-`repeats` latency and the token ids of the last run"""
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tokens = handler.generate(features, speculative=speculative)[0]
+        latencies.append(time.perf_counter() - start)
+    return min(latencies), tokens.tolist()
+
+
+def benchmark(country: str, draft_model_id: str, clips: list, repeats: int) -> dict:
+    config = dict(COUNTRY_MODELS[country], draft_model_id=draft_model_id)
+    handler = ModelHandler(config, MODEL_CACHE_DIR / config["model_id"].replace('/', '_'))
+    if not handler._load():
+        raise RuntimeError(f"Failed to load {config['model_id']}")
+    if handler.draft_model is None:
+        raise RuntimeError(f"{draft_model_id} can't be used as a draft for {config['model_id']}")
+
+    # One untimed pass of each mode so lazy initialisation isn't measured
+    warmup = handler.input_features(SharedFeatures(clips[0]["audio"]).items())
+    handler.generate(warmup, speculative=False)
+    handler.generate(warmup, speculative=True)
+
+    rows = []
+    for clip in clips:
+        features = handler.input_features(SharedFeatures(clip["audio"]).items())
+        plain_seconds, plain_tokens = time_generate(handler, features, False, repeats)
+        speculative_seconds, speculative_tokens = time_generate(handler, features, True, repeats)
+        rows.append({
+            "name": clip["name"],
+            "tokens": len(plain_tokens),
+            "plain_seconds": plain_seconds,
+            "speculative_seconds": speculative_seconds,
+            "plain_tokens_per_second": len(plain_tokens) / plain_seconds,
+            "speculative_tokens_per_second": len(speculative_tokens) / speculative_seconds,
+            "speedup": plain_seconds / speculative_seconds,
+            "identical": plain_tokens == speculative_tokens,
+            "plain_text": handler.processor.decode(plain_tokens, skip_special_tokens=True),
+            "speculative_text": handler.processor.decode(speculative_tokens, skip_special_tokens=True)
+        })
+
+    handler.unload()
+    return {
+        "country": country,
+        "model_id": config["model_id"],
+        "draft_model_id": draft_model_id,
+        "precision": config.get("precision", "fp32"),
+        "plain_tokens_per_second": sum(r["tokens"] for r in rows) / sum(r["plain_seconds"] for r in rows),
+        "speculative_tokens_per_second": sum(r["tokens"] for r in rows) / sum(r["speculative_seconds"] for r in rows),
+        "speedup_median": float(np.median([r["speedup"] for r in rows])),
+        "identical_outputs": sum(r["identical"] for r in rows),
+        "clips": rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding with a Whisper tiny draft")
+    parser.add_argument("--country", required=True, choices=list(COUNTRY_MODELS))
+    parser.add_argument("--audio-dir", required=True, type=Path)
+    parser.add_argument("--draft", default="openai/whisper-tiny", help="Draft model id")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    clips = load_clips(args.audio_dir)
+    if not clips:
+        raise SystemExit(f"No audio files found in {args.audio_dir}")
+
+    report = benchmark(args.country, args.draft, clips, args.repeats)
+
+    print(f"\n{'clip':<30}{'tokens':>7}{'plain tok/s':>13}{'spec tok/s':>12}{'speedup':>9}{'same':>6}")
+    for r in report["clips"]:
+        print(f"{r['name'][:29]:<30}{r['tokens']:>7}{r['plain_tokens_per_second']:>13.1f}"
+              f"{r['speculative_tokens_per_second']:>12.1f}{r['speedup']:>8.2f}x{'yes' if r['identical'] else 'NO':>6}")
+    print(f"\nOverall: {report['plain_tokens_per_second']:.1f} -> {report['speculative_tokens_per_second']:.1f} tokens/s, "
+          f"median speedup {report['speedup_median']:.2f}x, "
+          f"{report['identical_outputs']}/{len(report['clips'])} identical outputs")
+    for r in report["clips"]:
+        if not r["identical"]:
+            print(f"  {r['name']}: plain {r['plain_text']!r} vs speculative {r['speculative_text']!r}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import json
+import tarfile
+import threading
+import zipfile
+from collections import namedtuple
+from pathlib import PurePosixPath
+
+from audio_io import UploadTooLargeError
+
+AUDIO_EXTENSIONS = {".wav", ".m4a", ".mp3", ".flac", ".ogg", ".opus", ".webm", ".mp4", ".aac"}
+
+# One clip of a bulk request. `read()` returns its encoded bytes, or is None
+# when the manifest names a file that wasn't uploaded.
+BulkItem = namedtuple("BulkItem", ["index", "name", "country", "read"])
+
+
+def is_audio(name: str) -> bool:
+    return PurePosixPath(name).suffix.lower() in AUDIO_EXTENSIONS
+
+
+def reader(fileobj):
+    """read() for an uploaded file that works however many times the manifest
+    names it, also from several threads at once"""
+    lock = threading.Lock()
+
+    def read() -> bytes:
+        with lock:
+            fileobj.seek(0)
+            return fileobj.read()
+    return read
+
+
+def _member_reader(name: str, size: int, read, lock, max_member_bytes: int = None):
+    def read_member() -> bytes:
+        if max_member_bytes and size > max_member_bytes:
+            raise UploadTooLargeError(f"{name} is larger than {max_member_bytes / 1024 / 1024:.0f} MB")
+        with lock:
+            return read()
+    return read_member
+
+
+def archive_members(filename: str, fileobj, max_member_bytes: int = None, max_total_bytes: int = None) -> list:
+    """
+    (name, read) for every audio file in a zip or tar archive, read lazily.
+    Sizes come from the archive's own index (reads stop there), so a member
+    over `max_member_bytes` fails when read, and an archive whose audio adds
+    up to more than `max_total_bytes` uncompressed is refused up front.
+    Blocking: call it, and the reads, off the event loop.
+    """
+    lock = threading.Lock()
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        archive = zipfile.ZipFile(fileobj)
+        members = [
+            (info.filename, info.file_size, lambda info=info: archive.read(info))
+            for info in archive.infolist()
+            if not info.is_dir() and is_audio(info.filename)
+        ]
+    else:
+        fileobj.seek(0)
+        try:
+            archive = tarfile.open(fileobj=fileobj, mode="r:*")
+        except tarfile.TarError:
+            raise ValueError(f"{filename} is not a zip or tar archive")
+        members = [
+            (member.name, member.size, lambda member=member: archive.extractfile(member).read())
+            for member in archive.getmembers()
+            if member.isfile() and is_audio(member.name)
+        ]
+
+    total = sum(size for _, size, _ in members)
+    if max_total_bytes and total > max_total_bytes:
+        raise UploadTooLargeError(
+            f"{filename} holds {total / 1024 / 1024:.0f} MB of audio, more than {max_total_bytes / 1024 / 1024:.0f} MB"
+        )
+    return [(name, _member_reader(name, size, read, lock, max_member_bytes)) for name, size, read in members]
+
+
+def parse_manifest(text: str) -> list:
+    """
+    [(file name, country)] from a JSON manifest: either a list of
+    {"file": ..., "country": ...} objects (country optional) or an object
+    mapping file names to countries.
+    """
+    try:
+        manifest = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Manifest is not valid JSON: {e}")
+
+    if isinstance(manifest, dict):
+        return [(str(name), country) for name, country in manifest.items()]
+    if isinstance(manifest, list):
+        entries = []
+        for entry in manifest:
+            if isinstance(entry, str):
+                entries.append((entry, None))
+            elif isinstance(entry, dict) and entry.get("file"):
+                entries.append((str(entry["file"]), entry.get("country")))
+            else:
+                raise ValueError(f"Manifest entries need a 'file' field: {entry!r}")
+        return entries
+    raise ValueError("Manifest must be a JSON list or object")
+
+
+def collect_items(files: list, manifest: str = None, default_country: str = None) -> list:
+    """
+    BulkItems for a bulk request. `files` holds (name, read) pairs from the
+    uploads and the audio files of any archive. Without a manifest every
+    file is an item for `default_country`; with one, the manifest decides
+    which files are transcribed, in what order and for which country, and
+    files can be named by their full archive path or just their base name.
+    """
+    if manifest is None:
+        return [BulkItem(index, name, default_country, read) for index, (name, read) in enumerate(files)]
+
+    by_name = {}
+    for name, read in files:
+        by_name.setdefault(name, read)
+        by_name.setdefault(PurePosixPath(name).name, read)
+    return [
+        BulkItem(index, name, country or default_country, by_name.get(name))
+        for index, (name, country) in enumerate(parse_manifest(manifest))
+    ]
@@ -0,0 +1,85 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+
+# `overlap` is the number of samples this chunk shares with the previous one
+Chunk = namedtuple("Chunk", ["start", "end", "overlap"])
+
+
+def split_audio(audio: np.ndarray, sample_rate: int = 16000, max_seconds: float = 28.0,
+                overlap_seconds: float = 1.5, search_seconds: float = 4.0,
+                silence_margin_db: float = 15.0, frame_ms: float = 30) -> list:
+    """
+    Split audio into chunks that fit Whisper's 30 s window.
+
+    Each cut is placed at the quietest frame in the last `search_seconds` of
+    the chunk when that frame is at least `silence_margin_db` below the clip's
+    average level. When there is no such pause the cut falls at the limit and
+    the next chunk starts `overlap_seconds` earlier, so words on the boundary
+    are seen whole by one of the two chunks.
+    """
+    max_len = int(max_seconds * sample_rate)
+    if len(audio) <= max_len:
+        return [Chunk(0, len(audio), 0)]
+
+    frame = int(sample_rate * frame_ms / 1000)
+    overlap = int(overlap_seconds * sample_rate)
+    silence_db = 10 * np.log10(np.mean(audio ** 2) + 1e-12) - silence_margin_db
+
+    chunks = []
+    start, shared = 0, 0
+    while start < len(audio):
+        end = start + max_len
+        if end >= len(audio):
+            chunks.append(Chunk(start, len(audio), shared))
+            break
+
+        low = max(start + frame, end - int(search_seconds * sample_rate))
+        n_frames = (end - low) // frame
+        zone = audio[low:low + n_frames * frame].reshape(n_frames, frame)
+        energy_db = 10 * np.log10(np.mean(zone ** 2, axis=1) + 1e-12)
+        quietest = int(np.argmin(energy_db))
+
+        if energy_db[quietest] < silence_db:
+            cut = low + quietest * frame + frame // 2
+            chunks.append(Chunk(start, cut, shared))
+            start, shared = cut, 0
+        else:
+            chunks.append(Chunk(start, end, shared))
+            start, shared = end - overlap, overlap
+
+    return chunks
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def _drop_overlap(previous: str, text: str, max_words: int = 12, min_chars: int = 4) -> str:
+    """Remove the start of `text` that repeats the end of `previous`"""
+    prev_words, words = previous.split(), text.split()
+    for k in range(min(max_words, len(prev_words), len(words)), 0, -1):
+        if [_normalize(w) for w in prev_words[-k:]] == [_normalize(w) for w in words[:k]]:
+            return " ".join(words[k:])
+
+    # Scripts without spaces (e.g. Thai): fall back to a character match
+    if len(words) <= 1 or len(prev_words) <= 1:
+        for k in range(min(len(previous), len(text), max_words * 4), min_chars - 1, -1):
+            if previous[-k:] == text[:k]:
+                return text[k:]
+    return text
+
+
+def stitch(texts: list, chunks: list) -> str:
+    """Join per-chunk transcriptions, de-duplicating text from overlapping audio"""
+    result = ""
+    for text, chunk in zip(texts, chunks):
+        text = (text or "").strip()
+        if not text:
+            continue
+        if result and chunk.overlap:
+            text = _drop_overlap(result, text).strip()
+        if text:
+            result = f"{result} {text}" if result else text
+    return result
@@ -0,0 +1,372 @@
+"""
+TorchScript artifacts for the transformers Whisper models.
+
+`export_whisper` traces a model's encoder and its decoder into one file: a
+first decoder step and a next step that carries the self- and cross-
+attention keys/values from one token to the next. The processor, configs
+and a manifest (versions plus the parity check against eager generate) are
+saved next to it. `CompiledWhisper` loads the artifact without building the
+transformers model and decodes greedily the way
+`WhisperForConditionalGeneration.generate` does: the same forced prompt
+tokens, suppressed tokens and eos padding, so it yields the same token ids.
+"""
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import torch
+import transformers
+from transformers import GenerationConfig, WhisperConfig, WhisperProcessor
+from transformers.models.whisper.tokenization_whisper import TO_LANGUAGE_CODE
+
+from features import log_mel_batch, mel_config
+from precision import load_whisper_model
+
+logger = logging.getLogger(__name__)
+
+# Bump when the traced entry points change; older artifacts are re-exported
+ARTIFACT_VERSION = 1
+MODEL_FILE = "model.pt"
+MANIFEST_FILE = "manifest.json"
+
+
+def compiled_dir(root, model_id: str, precision: str = "fp32") -> Path:
+    return Path(root) / f"{model_id.replace('/', '_')}_{precision}"
+
+
+def _flatten(past_key_values) -> list:
+    # TorchScript traces lists of tensors, not nested tuples: 4 per layer
+    return [tensor for layer in past_key_values for tensor in layer]
+
+
+class _Traceable(torch.nn.Module):
+    """The entry points traced into one module, so they share one copy of the weights"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def encode(self, input_features):
+        return self.model.model.encoder(input_features, return_dict=False)[0]
+
+    def first(self, decoder_input_ids, encoder_hidden_states):
+        outputs = self.model.model.decoder(
+            input_ids=decoder_input_ids, encoder_hidden_states=encoder_hidden_states,
+            use_cache=True, return_dict=False
+        )
+        return self.model.proj_out(outputs[0]), _flatten(outputs[1])
+
+    def step(self, decoder_input_ids, encoder_hidden_states, past: List[torch.Tensor]):
+        past_key_values = tuple(tuple(past[i:i + 4]) for i in range(0, len(past), 4))
+        outputs = self.model.model.decoder(
+            input_ids=decoder_input_ids, encoder_hidden_states=encoder_hidden_states,
+            past_key_values=past_key_values, use_cache=True, return_dict=False
+        )
+        return self.model.proj_out(outputs[0]), _flatten(outputs[1])
+
+
+def parity_features(processor, count: int = 3) -> torch.Tensor:
+    """Log-mel features of a few deterministic synthetic clips (silence, tones, noise)"""
+    config = mel_config(processor.feature_extractor)
+    rng = np.random.default_rng(0)
+    t = np.arange(config.sampling_rate * 4) / config.sampling_rate
+    clips = [np.zeros(config.sampling_rate, dtype=np.float32)]
+    for i in range(1, count):
+        tone = 0.3 * np.sin(2 * np.pi * (180 + 70 * i) * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2
+        clips.append((tone + 0.02 * rng.standard_normal(len(t))).astype(np.float32))
+    return log_mel_batch(clips[:count], config)
+
+
+def _strip(sequence: torch.Tensor, pad_token_id: int) -> list:
+    tokens = sequence.tolist()
+    # Keep one trailing eos/pad, drop the padding after it
+    while len(tokens) > 1 and tokens[-1] == pad_token_id and tokens[-2] == pad_token_id:
+        tokens.pop()
+    return tokens
+
+
+def parity_check(model, compiled: "CompiledWhisper", input_features: torch.Tensor, generate_kwargs: dict) -> dict:
+    """Compare the artifact's greedy tokens with eager `model.generate` on the same features"""
+    input_features = input_features.to(model.dtype)
+    with torch.no_grad():
+        start_time = time.perf_counter()
+        eager = model.generate(input_features, **generate_kwargs)
+        eager_seconds = time.perf_counter() - start_time
+        eager_hidden = model.model.encoder(input_features).last_hidden_state
+        compiled_hidden = compiled.module.encode(input_features)
+
+    compiled.warmup(**generate_kwargs)
+    start_time = time.perf_counter()
+    results = compiled.generate(input_features, **generate_kwargs)
+    compiled_seconds = time.perf_counter() - start_time
+
+    pad_token_id = compiled.pad_token_id
+    mismatched = [
+        i for i, (sequence, result) in enumerate(zip(eager, results))
+        if _strip(sequence, pad_token_id) != _strip(result["tokens"], pad_token_id)
+    ]
+    return {
+        "clips": len(results),
+        "match": not mismatched,
+        "mismatched_clips": mismatched,
+        "encoder_max_abs_diff": float((eager_hidden.float() - compiled_hidden.float()).abs().max()),
+        "eager_seconds": eager_seconds,
+        "compiled_seconds": compiled_seconds
+    }
+
+
+def export_whisper(model, processor, path, model_id: str, precision: str = "fp32",
+                   generate_kwargs: dict = None, input_features: torch.Tensor = None) -> dict:
+    """
+    Trace `model` into `path` and check the artifact against it. The
+    manifest is written last and records the parity result, so a half
+    written export is never picked up and callers can refuse a mismatch.
+    """
+    path = Path(path)
+    model = model.eval()
+    config = model.config
+    features = torch.zeros(1, config.num_mel_bins, 2 * config.max_source_positions, dtype=model.dtype)
+    decoder_input_ids = torch.full((1, 1), config.decoder_start_token_id, dtype=torch.long)
+
+    start_time = time.perf_counter()
+    traceable = _Traceable(model).eval()
+    with torch.no_grad():
+        encoder_hidden_states = traceable.encode(features)
+        _, past = traceable.first(decoder_input_ids, encoder_hidden_states)
+        traced = torch.jit.trace_module(traceable, {
+            "encode": (features,),
+            "first": (decoder_input_ids, encoder_hidden_states),
+            "step": (decoder_input_ids, encoder_hidden_states, past)
+        })
+
+    path.mkdir(parents=True, exist_ok=True)
+    (path / MANIFEST_FILE).unlink(missing_ok=True)
+    torch.jit.save(traced, str(path / MODEL_FILE))
+    processor.save_pretrained(path)
+    config.save_pretrained(path)
+    model.generation_config.save_pretrained(path)
+    export_seconds = time.perf_counter() - start_time
+
+    compiled = CompiledWhisper(path, manifest={"dtype": str(model.dtype).replace("torch.", "")})
+    if input_features is None:
+        input_features = parity_features(processor)
+    parity = parity_check(model, compiled, input_features, generate_kwargs or {})
+
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "model_id": model_id,
+        "precision": precision,
+        "dtype": str(model.dtype).replace("torch.", ""),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "generate_kwargs": generate_kwargs or {},
+        "export_seconds": export_seconds,
+        "parity": parity
+    }
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    logger.info("Exported %s (%s) to %s in %.1f s, parity %s",
+                model_id, precision, path, export_seconds, "ok" if parity["match"] else "MISMATCH")
+    return manifest
+
+
+def read_manifest(path):
+    """The artifact's manifest, or None when it is missing or was made by another torch/export version"""
+    try:
+        manifest = json.loads((Path(path) / MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("torch") != torch.__version__:
+        return None
+    return manifest
+
+
+def load_compiled(root, model_id: str, cache_dir, precision: str = "fp32", generate_kwargs: dict = None):
+    """
+    CompiledWhisper for `model_id`, exporting it from the transformers
+    checkpoint the first time (or after a torch upgrade) and warming it up.
+    Returns None when the artifact doesn't reproduce eager generate, so the
+    caller can fall back to transformers.
+    """
+    path = compiled_dir(root, model_id, precision)
+    manifest = read_manifest(path)
+    if manifest is None:
+        logger.info("Exporting %s (%s) to TorchScript", model_id, precision)
+        model = load_whisper_model(model_id, cache_dir, precision)
+        processor = WhisperProcessor.from_pretrained(model_id, cache_dir=cache_dir)
+        manifest = export_whisper(model, processor, path, model_id, precision, generate_kwargs)
+        del model
+    if not manifest["parity"]["match"]:
+        logger.warning("TorchScript artifact for %s differs from eager generate on clips %s",
+                       model_id, manifest["parity"]["mismatched_clips"])
+        return None
+
+    compiled = CompiledWhisper(path, manifest)
+    compiled.warmup(**(generate_kwargs or {}))
+    return compiled
+
+
+class CompiledWhisper:
+    """A Whisper model loaded from a TorchScript artifact, decoded greedily"""
+
+    def __init__(self, path, manifest: dict = None):
+        self.path = Path(path)
+        self.manifest = manifest or json.loads((self.path / MANIFEST_FILE).read_text())
+        self.dtype = getattr(torch, self.manifest["dtype"])
+        self.module = torch.jit.load(str(self.path / MODEL_FILE), map_location="cpu").eval()
+        self.processor = WhisperProcessor.from_pretrained(self.path)
+        self.config = WhisperConfig.from_pretrained(self.path)
+        self.generation_config = GenerationConfig.from_pretrained(self.path)
+
+        generation_config = self.generation_config
+        self.eos_token_id = generation_config.eos_token_id
+        self.pad_token_id = generation_config.pad_token_id if generation_config.pad_token_id is not None else self.eos_token_id
+        self.suppress_tokens = torch.tensor(generation_config.suppress_tokens or [], dtype=torch.long)
+        self.begin_suppress_tokens = torch.tensor(generation_config.begin_suppress_tokens or [], dtype=torch.long)
+        self.lang_to_id = getattr(generation_config, "lang_to_id", None) or {}
+        self.language_ids = torch.tensor(sorted(self.lang_to_id.values()), dtype=torch.long)
+        self.id_to_language = {token_id: token.strip("<|>") for token, token_id in self.lang_to_id.items()}
+
+        tokenizer = self.processor.tokenizer
+        self.special_ids = torch.tensor(tokenizer.all_special_ids)
+        self.no_speech_id = None
+        for token in ("<|nospeech|>", "<|nocaptions|>"):
+            token_id = tokenizer.convert_tokens_to_ids(token)
+            if token_id is not None and token_id != tokenizer.unk_token_id:
+                self.no_speech_id = token_id
+                break
+
+    def memory_bytes(self) -> int:
+        return (self.path / MODEL_FILE).stat().st_size
+
+    def language_token_id(self, language: str) -> int:
+        language = language.lower()
+        if language in self.lang_to_id:
+            token = language
+        elif language in TO_LANGUAGE_CODE:
+            token = f"<|{TO_LANGUAGE_CODE[language]}|>"
+        elif language in TO_LANGUAGE_CODE.values():
+            token = f"<|{language}|>"
+        else:
+            raise ValueError(f"Unsupported language: {language}")
+        return self.lang_to_id[token]
+
+    def forced_tokens(self, language: str = None, task: str = None) -> dict:
+        """{position: token id} forced into the prompt (None lets the model
+        choose), resolved like transformers' Whisper generate"""
+        generation_config = self.generation_config
+        if language is None and task is None:
+            forced = getattr(self.config, "forced_decoder_ids", None) or getattr(generation_config, "forced_decoder_ids", None)
+            return {position: token for position, token in forced or []}
+
+        forced = {1: self.language_token_id(language) if language else None}
+        task_to_id = getattr(generation_config, "task_to_id", None)
+        if task_to_id:
+            if (task or "transcribe") not in task_to_id:
+                raise ValueError(f"Unsupported task: {task}")
+            forced[2] = task_to_id[task or "transcribe"]
+        no_timestamps = getattr(generation_config, "no_timestamps_token_id", None)
+        if no_timestamps is not None:
+            forced[max(forced) + 1] = no_timestamps
+        return forced
+
+    def generate(self, input_features: torch.Tensor, language: str = None, task: str = None,
+                 max_new_tokens: int = None, stopping_criteria=None, detect_language: bool = False) -> list:
+        """
+        [{"tokens", "avg_logprob", "no_speech_prob", "language"}] per clip.
+
+        The scores come from the log-probabilities seen while decoding,
+        scored like Whisper (text tokens plus the first end-of-text). With
+        `detect_language`, an unforced language position picks the most
+        likely language token, as openai-whisper does, and "language" is set.
+        """
+        forced = self.forced_tokens(language, task)
+        max_length = 1 + max_new_tokens if max_new_tokens else self.generation_config.max_length
+        max_length = min(max_length, self.config.max_target_positions)
+        begin_index = 1 + (max(forced) if forced else 0)
+
+        input_features = input_features.to(self.dtype)
+        batch_size = input_features.shape[0]
+        with torch.no_grad():
+            encoder_hidden_states = self.module.encode(input_features)
+            sequences = torch.full((batch_size, 1), self.config.decoder_start_token_id, dtype=torch.long)
+            logits, past = self.module.first(sequences, encoder_hidden_states)
+            unfinished = torch.ones(batch_size, dtype=torch.bool)
+            token_logprobs = []
+            first_logprobs = None
+
+            while True:
+                scores = logits[:, -1].float()
+                logprobs = scores.log_softmax(dim=-1)
+                if first_logprobs is None:
+                    first_logprobs = logprobs
+
+                position = sequences.shape[1]
+                if len(self.suppress_tokens):
+                    scores[:, self.suppress_tokens] = -float("inf")
+                if position == begin_index and len(self.begin_suppress_tokens):
+                    scores[:, self.begin_suppress_tokens] = -float("inf")
+                if forced.get(position) is not None:
+                    scores[:, :] = -float("inf")
+                    scores[:, forced[position]] = 0
+                elif position == 1 and detect_language and len(self.language_ids):
+                    mask = torch.full_like(scores, -float("inf"))
+                    mask[:, self.language_ids] = 0
+                    scores = scores + mask
+
+                next_tokens = scores.argmax(dim=-1)
+                next_tokens = torch.where(unfinished, next_tokens, torch.full_like(next_tokens, self.pad_token_id))
+                token_logprobs.append(logprobs.gather(-1, next_tokens.unsqueeze(-1)).squeeze(-1))
+                sequences = torch.cat([sequences, next_tokens.unsqueeze(-1)], dim=-1)
+                unfinished &= next_tokens != self.eos_token_id
+
+                if not unfinished.any() or sequences.shape[1] >= max_length:
+                    break
+                if stopping_criteria is not None and stopping_criteria(sequences, scores):
+                    break
+                logits, past = self.module.step(next_tokens.unsqueeze(-1), encoder_hidden_states, past)
+
+        token_logprobs = torch.stack(token_logprobs, dim=1)
+        return [
+            self._result(sequence, token_logprobs[i], first_logprobs[i], detect_language)
+            for i, sequence in enumerate(sequences)
+        ]
+
+    def _result(self, sequence: torch.Tensor, token_logprobs: torch.Tensor, first_logprobs: torch.Tensor,
+                detect_language: bool) -> dict:
+        # Like Whisper, score the text tokens plus the first end-of-text, but
+        # not the forced prompt or the padding after it
+        targets = sequence[1:]
+        eos = targets == self.eos_token_id
+        first_eos = eos & (eos.cumsum(0) == 1)
+        special = torch.isin(targets, self.special_ids)
+        scored = (~special & (eos.cumsum(0) == 0)) | first_eos
+        avg_logprob = float(token_logprobs[scored].sum() / max(1, int(scored.sum())))
+
+        # Position 0 is the prediction right after <|startoftranscript|>
+        no_speech_prob = float(first_logprobs[self.no_speech_id].exp()) if self.no_speech_id is not None else None
+        language = self.id_to_language.get(int(sequence[1])) if detect_language and len(sequence) > 1 else None
+        return {"tokens": sequence, "avg_logprob": avg_logprob, "no_speech_prob": no_speech_prob, "language": language}
+
+    def detect_language(self, input_features: torch.Tensor) -> list:
+        """{language code: probability} per clip, from the first decoder step alone"""
+        with torch.no_grad():
+            encoder_hidden_states = self.module.encode(input_features.to(self.dtype))
+            decoder_input_ids = torch.full(
+                (input_features.shape[0], 1), self.config.decoder_start_token_id, dtype=torch.long
+            )
+            logits, _ = self.module.first(decoder_input_ids, encoder_hidden_states)
+        probs = logits[:, -1, self.language_ids].float().softmax(dim=-1)
+        codes = [self.id_to_language[int(token_id)] for token_id in self.language_ids]
+        return [dict(zip(codes, row.tolist())) for row in probs]
+
+    def warmup(self, runs: int = 2, **generate_kwargs):
+        """Decode a silent window a few times so the TorchScript executor has
+        profiled and optimized its graphs before the first request"""
+        features = torch.zeros(1, self.config.num_mel_bins, 2 * self.config.max_source_positions)
+        start_time = time.perf_counter()
+        for _ in range(runs):
+            self.generate(features, **dict(generate_kwargs, max_new_tokens=4))
+        logger.info("Warmed up %s in %.2f s", self.path.name, time.perf_counter() - start_time)
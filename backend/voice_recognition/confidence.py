@@ -0,0 +1,62 @@
+import zlib
+
+import numpy as np
+
+
+def compression_ratio(text: str) -> float:
+    """Text length over its zlib-compressed length; repetitive hallucinations score high"""
+    data = (text or "").encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def merge(confidences: list):
+    """One confidence for a (stitched) transcription from its per-chunk confidences"""
+    confidences = [c for c in confidences if c]
+    if not confidences:
+        return None
+
+    def values(key):
+        # Degenerate decodes can score -inf/nan, which JSON can't carry
+        return [
+            c[key] for c in confidences
+            if c.get(key) is not None and (isinstance(c[key], str) or np.isfinite(c[key]))
+        ]
+
+    merged = {
+        "avg_logprob": float(np.mean(values("avg_logprob"))) if values("avg_logprob") else None,
+        # A clip has speech if any of its chunks does
+        "no_speech_prob": float(min(values("no_speech_prob"))) if values("no_speech_prob") else None,
+        "compression_ratio": float(max(values("compression_ratio"))) if values("compression_ratio") else None
+    }
+    languages = values("language")
+    if languages:
+        merged["language"] = max(set(languages), key=languages.count)
+    return merged
+
+
+def assess(confidence, logprob_threshold: float = -1.0, no_speech_threshold: float = 0.6,
+           compression_ratio_threshold: float = 2.4, language: str = None):
+    """
+    (confident, reason) for one transcription, using Whisper's own fallback
+    rules: a low average log-probability or a high compression ratio means
+    the text is unreliable, unless the no-speech probability says the audio
+    is silent anyway. When `language` is given, a different detected
+    language also counts as unreliable.
+    """
+    if not confidence:
+        return False, "no confidence signals"
+
+    avg_logprob = confidence.get("avg_logprob")
+    no_speech_prob = confidence.get("no_speech_prob")
+    ratio = confidence.get("compression_ratio")
+    low_logprob = avg_logprob is not None and avg_logprob < logprob_threshold
+
+    if no_speech_prob is not None and no_speech_prob > no_speech_threshold and low_logprob:
+        return True, "no speech"
+    if language and confidence.get("language") and confidence["language"] != language:
+        return False, f"detected language {confidence['language']}, expected {language}"
+    if ratio is not None and ratio > compression_ratio_threshold:
+        return False, f"compression ratio {ratio:.2f} > {compression_ratio_threshold}"
+    if low_logprob:
+        return False, f"avg log-prob {avg_logprob:.2f} < {logprob_threshold}"
+    return True, "confident"
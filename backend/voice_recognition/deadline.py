@@ -0,0 +1,28 @@
+import time
+
+from transformers import StoppingCriteria
+
+
+class Deadline:
+    """A request's latency budget, measured from when the request arrived"""
+
+    def __init__(self, seconds: float, started_at: float = None):
+        self.seconds = seconds
+        self.expires_at = (started_at or time.monotonic()) + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """Stops generate() once every request in the batch is past its deadline,
+    so work nobody will wait for stops burning CPU mid-decode"""
+
+    def __init__(self, deadlines: list):
+        self.deadlines = deadlines
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return all(deadline.expired() for deadline in self.deadlines)
@@ -0,0 +1,99 @@
+"""
+Export COUNTRY_MODELS entries and the base model to TorchScript ahead of
+deployment, so servers using the "torchscript" backend start from the
+artifact instead of exporting on their first load.
+
+    python export_models.py --countries Malaysia,Thailand --base --audio-dir ./samples
+
+Each artifact is checked against eager transformers generate on the given
+clips (or a few synthetic ones) and the result is kept in its manifest; the
+server refuses artifacts whose greedy tokens differ.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from transformers import WhisperProcessor
+
+from benchmark_precision import load_clips
+from compiled import MODEL_FILE, CompiledWhisper, compiled_dir, export_whisper, parity_features
+from features import log_mel_batch, mel_config
+from main import BASE_MODEL_ID, COMPILED_MODEL_DIR, COUNTRY_MODELS, MODEL_CACHE_DIR, ModelHandler
+from precision import PRECISIONS, load_whisper_model
+
+
+def export(model_id: str, precision: str, generate_kwargs: dict, clips: list) -> dict:
+    cache_dir = MODEL_CACHE_DIR / model_id.replace('/', '_')
+    start_time = time.perf_counter()
+    model = load_whisper_model(model_id, cache_dir, precision)
+    processor = WhisperProcessor.from_pretrained(model_id, cache_dir=cache_dir)
+    eager_load_seconds = time.perf_counter() - start_time
+
+    if clips:
+        config = mel_config(processor.feature_extractor)
+        input_features = log_mel_batch([clip["audio"] for clip in clips], config)
+    else:
+        input_features = parity_features(processor)
+
+    path = compiled_dir(COMPILED_MODEL_DIR, model_id, precision)
+    manifest = export_whisper(model, processor, path, model_id, precision, generate_kwargs, input_features)
+    del model
+
+    start_time = time.perf_counter()
+    CompiledWhisper(path)
+    compiled_load_seconds = time.perf_counter() - start_time
+    return {
+        "model_id": model_id,
+        "precision": precision,
+        "path": str(path),
+        "artifact_mb": (path / MODEL_FILE).stat().st_size / 1024 / 1024,
+        "eager_load_seconds": eager_load_seconds,
+        "compiled_load_seconds": compiled_load_seconds,
+        **manifest
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Whisper models to TorchScript artifacts")
+    parser.add_argument("--countries", default=",".join(COUNTRY_MODELS),
+                        help="Comma-separated COUNTRY_MODELS keys, empty for none")
+    parser.add_argument("--base", action="store_true", help=f"Also export the base model ({BASE_MODEL_ID})")
+    parser.add_argument("--precision", choices=PRECISIONS,
+                        help="Override each country's configured precision")
+    parser.add_argument("--audio-dir", type=Path, help="Clips for the parity check (first 30 s of each)")
+    parser.add_argument("--output", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    countries = [c.strip() for c in args.countries.split(",") if c.strip()]
+    unknown = [c for c in countries if c not in COUNTRY_MODELS]
+    if unknown:
+        raise SystemExit(f"Unknown countries: {unknown}")
+    clips = load_clips(args.audio_dir) if args.audio_dir else []
+
+    results = []
+    for country in countries:
+        config = COUNTRY_MODELS[country]
+        generate_kwargs = ModelHandler(config, MODEL_CACHE_DIR)._generate_kwargs()
+        precision = args.precision or config.get("precision", "fp32")
+        results.append(dict(export(config["model_id"], precision, generate_kwargs, clips), name=country))
+    if args.base:
+        results.append(dict(export(BASE_MODEL_ID, "fp32", {"task": "transcribe"}, clips), name="base"))
+
+    print(f"\n{'model':<12}{'precision':>10}{'MB':>7}{'load s':>8}{'eager load s':>14}{'parity':>8}"
+          f"{'decode s':>10}{'eager s':>9}")
+    for r in results:
+        parity = r["parity"]
+        print(f"{r['name']:<12}{r['precision']:>10}{r['artifact_mb']:>7.0f}{r['compiled_load_seconds']:>8.2f}"
+              f"{r['eager_load_seconds']:>14.2f}{'ok' if parity['match'] else 'FAIL':>8}"
+              f"{parity['compiled_seconds']:>10.3f}{parity['eager_seconds']:>9.3f}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"results": results}, indent=2, ensure_ascii=False))
+        print(f"\nReport written to {args.output}")
+    if not all(r["parity"]["match"] for r in results):
+        raise SystemExit("Parity check failed for: " + ", ".join(r["name"] for r in results if not r["parity"]["match"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import librosa
+import numpy as np
+import torch
+
+from chunking import Chunk
+
+# Everything that determines a Whisper log-mel spectrogram; models whose
+# configs compare equal can share features
+MelConfig = namedtuple("MelConfig", ["n_mels", "n_fft", "hop_length", "sampling_rate", "n_samples"])
+
+
+def mel_config(feature_extractor) -> MelConfig:
+    """MelConfig of a transformers WhisperFeatureExtractor"""
+    return MelConfig(
+        feature_extractor.feature_size,
+        feature_extractor.n_fft,
+        feature_extractor.hop_length,
+        feature_extractor.sampling_rate,
+        feature_extractor.n_samples
+    )
+
+
+@lru_cache(maxsize=None)
+def _mel_filters(config: MelConfig) -> torch.Tensor:
+    # Slaney-style filters, the same bank Whisper and transformers use
+    filters = librosa.filters.mel(sr=config.sampling_rate, n_fft=config.n_fft, n_mels=config.n_mels)
+    return torch.from_numpy(filters.astype(np.float32))
+
+
+def log_mel_batch(audios: list, config: MelConfig) -> torch.Tensor:
+    """(batch, n_mels, frames) Whisper log-mel features, each clip padded or
+    trimmed to the 30 s window, from a single batched STFT"""
+    batch = torch.zeros(len(audios), config.n_samples)
+    for i, audio in enumerate(audios):
+        audio = audio[:config.n_samples]
+        batch[i, :len(audio)] = torch.from_numpy(np.asarray(audio, dtype=np.float32))
+
+    stft = torch.stft(
+        batch, config.n_fft, config.hop_length,
+        window=torch.hann_window(config.n_fft), return_complex=True
+    )
+    power = stft[..., :-1].abs() ** 2
+    log_spec = torch.clamp(_mel_filters(config) @ power, min=1e-10).log10()
+    # Dynamic range is limited per clip, not across the batch
+    log_spec = torch.maximum(log_spec, log_spec.amax(dim=(1, 2), keepdim=True) - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
+class SharedFeatures:
+    """Log-mel features for one request's audio chunks.
+
+    Features are computed the first time any model asks for a given config
+    and handed to every later model with the same config, so the base and
+    country models do not each run their own STFT over the same audio.
+    `deadline` is the request's Deadline and `timer` its StageTimer, if it
+    has them.
+    """
+
+    def __init__(self, audio: np.ndarray, chunks: list = None, deadline=None, timer=None):
+        self.audio = audio
+        self.chunks = chunks or [Chunk(0, len(audio), 0)]
+        self.deadline = deadline
+        self.timer = timer
+        self.computed = 0
+        self.reused = 0
+        self._features = {}
+        self._lock = threading.Lock()
+
+    def items(self) -> list:
+        """(features, chunk) pairs, the unit the model batchers work on"""
+        return [(self, chunk) for chunk in self.chunks]
+
+    def chunk_audio(self, chunk) -> np.ndarray:
+        return self.audio[chunk.start:chunk.end]
+
+
+def gather_features(items: list, config: MelConfig) -> torch.Tensor:
+    """
+    Stacked features for (SharedFeatures, chunk) pairs, possibly from
+    different requests. Chunks nobody has computed yet for this config are
+    done together in one batched pass and kept for the other models.
+    """
+    # Hold every request's lock so a model asking for the same features at
+    # the same moment waits for them instead of computing them again
+    owners = sorted({id(shared): shared for shared, _ in items}.values(), key=id)
+    for shared in owners:
+        shared._lock.acquire()
+    try:
+        missing = []
+        for shared, chunk in items:
+            key = (config, chunk.start, chunk.end)
+            if key in shared._features:
+                shared.reused += 1
+            elif (shared, key) not in missing:
+                missing.append((shared, key))
+
+        if missing:
+            computed = log_mel_batch([shared.audio[start:end] for shared, (_, start, end) in missing], config)
+            for (shared, key), features in zip(missing, computed):
+                shared._features[key] = features
+                shared.computed += 1
+
+        return torch.stack([shared._features[(config, chunk.start, chunk.end)] for shared, chunk in items])
+    finally:
+        for shared in owners:
+            shared._lock.release()
+
+
+class _RollingBuffer:
+    """Rows appended at the end and dropped from the front, addressed by
+    their absolute index in the stream. Appends are amortised O(1) and the
+    storage is reallocated to fit what is kept, so memory follows the kept
+    rows rather than everything ever appended."""
+
+    def __init__(self, width: int = None, dtype=np.float32, capacity: int = 4096):
+        self._data = np.zeros((capacity,) if width is None else (capacity, width), dtype=dtype)
+        self.start = 0  # absolute index of the first kept row
+        self._head = 0  # where that row sits in _data
+        self._len = 0
+
+    @property
+    def end(self) -> int:
+        """Absolute index one past the last row, i.e. rows appended so far"""
+        return self.start + self._len
+
+    def append(self, rows: np.ndarray):
+        count = len(rows)
+        if self._head + self._len + count > len(self._data):
+            capacity = max(4096, 2 * (self._len + count))
+            data = self._data if capacity == len(self._data) else np.zeros((capacity,) + self._data.shape[1:], self._data.dtype)
+            data[:self._len] = self._data[self._head:self._head + self._len]
+            self._data, self._head = data, 0
+        self._data[self._head + self._len:self._head + self._len + count] = rows
+        self._len += count
+
+    def view(self, start: int, end: int) -> np.ndarray:
+        """Rows [start, end) by absolute index; start must not have been dropped"""
+        if start < self.start:
+            raise ValueError(f"Index {start} was already dropped (buffer starts at {self.start})")
+        end = min(end, self.end)
+        return self._data[self._head + start - self.start:self._head + max(start, end) - self.start]
+
+    def drop_before(self, index: int):
+        index = min(max(index, self.start), self.end)
+        self._head += index - self.start
+        self._len -= index - self.start
+        self.start = index
+
+
+class IncrementalMelFeatures:
+    """Whisper log-mel features for a growing audio stream.
+
+    Reproduces WhisperFeatureExtractor's log-mel computation, but keeps the
+    mel power of every STFT frame that can no longer change as audio is
+    appended. Decoding a rolling window then only needs the few frames that
+    touch the end of the received audio, instead of a full 30 s STFT per
+    window. Audio and frames before the earliest window still needed are
+    dropped with `trim()`, so a long stream costs constant time per chunk.
+    """
+
+    def __init__(self, feature_extractor):
+        self.feature_extractor = feature_extractor
+        self.n_fft = feature_extractor.n_fft
+        self.hop_length = feature_extractor.hop_length
+        self.n_samples = feature_extractor.n_samples
+        self.n_frames = feature_extractor.nb_max_frames
+        self.mel_filters = feature_extractor.mel_filters.astype(np.float32)
+        self.window = np.hanning(self.n_fft + 1)[:-1].astype(np.float32)  # periodic Hann, as in Whisper
+        self._audio = _RollingBuffer()
+        self._mel_power = _RollingBuffer(self.mel_filters.shape[1])
+
+    @property
+    def received(self) -> int:
+        """Samples appended so far"""
+        return self._audio.end
+
+    def trim(self, before: int):
+        """Forget what no window starting at or after sample `before` needs"""
+        half = self.n_fft // 2
+        # Frames still to be finalised, and windows' edge frames, read up to half an FFT back
+        self._audio.drop_before(min(before, self._mel_power.end * self.hop_length) - half)
+        self._mel_power.drop_before(before // self.hop_length)
+
+    def _frames_power(self, padded: np.ndarray, count: int) -> np.ndarray:
+        """Mel power of `count` frames taken every hop from the start of `padded`"""
+        if count <= 0:
+            return np.zeros((0, self.mel_filters.shape[1]), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)[::self.hop_length][:count]
+        spectrum = np.abs(np.fft.rfft(frames * self.window, n=self.n_fft)) ** 2
+        return (spectrum @ self.mel_filters).astype(np.float32)
+
+    def append(self, samples: np.ndarray):
+        """Add audio and extend the cache with the frames that are now final"""
+        self._audio.append(samples.astype(np.float32, copy=False))
+
+        # Frame i covers padded[i * hop : i * hop + n_fft], where padded is the
+        # stream with Whisper's reflect padding in front; it is final once its
+        # right edge has arrived
+        half = self.n_fft // 2
+        stable = (half + self._audio.end - self.n_fft) // self.hop_length + 1
+        first = self._mel_power.end
+        if stable <= first:
+            return
+
+        low = first * self.hop_length
+        high = (stable - 1) * self.hop_length + self.n_fft
+        if low < half:
+            padded = np.pad(self._audio.view(0, high - half), (half, 0), mode="reflect")[low:]
+        else:
+            padded = self._audio.view(low - half, high - half)
+        self._mel_power.append(self._frames_power(padded, stable - first))
+
+    def window_features(self, start: int, end: int = None) -> torch.Tensor:
+        """Model input features for audio[start:end], padded to Whisper's 30 s window.
+
+        `start` must sit on a hop boundary so cached frames line up with the window.
+        """
+        end = self._audio.end if end is None else end
+        end = min(end, start + self.n_samples)
+        if start % self.hop_length:
+            raise ValueError(f"Window start {start} is not a multiple of {self.hop_length}")
+
+        half = self.n_fft // 2
+        if end - start <= half:
+            # Too short to reuse anything, let the extractor handle the edge cases
+            return self.feature_extractor(
+                self._audio.view(start, end), sampling_rate=self.feature_extractor.sampling_rate, return_tensors="pt"
+            ).input_features
+
+        first_frame = start // self.hop_length
+        # Cached frames can be reused while they don't reach past the window end
+        reusable = min(self._mel_power.end - first_frame, (end - half - start) // self.hop_length + 1)
+        reusable = max(0, min(reusable, self.n_frames))
+        cached = self._mel_power.view(first_frame, first_frame + reusable)
+
+        # Frames that overlap the end of the window see zero padding after it
+        tail_start = start + reusable * self.hop_length - half
+        tail_count = (end + half - 1 - (start + reusable * self.hop_length)) // self.hop_length + 1
+        tail_count = max(0, min(self.n_frames - reusable, tail_count))
+        if tail_start < 0:
+            segment = np.pad(self._audio.view(start, end), (half, 0), mode="reflect")[tail_start + half:]
+        else:
+            segment = self._audio.view(tail_start, end)
+        segment = np.pad(segment, (0, max(0, tail_count * self.hop_length + self.n_fft - len(segment))))
+        tail = self._frames_power(segment, tail_count)
+
+        mel = np.full((self.n_frames, self.mel_filters.shape[1]), 1e-10, dtype=np.float32)
+        mel[:reusable] = cached
+        mel[reusable:reusable + len(tail)] = tail
+        head_count = min(reusable, -(-half // self.hop_length))
+        if start > 0 and head_count > 0:
+            # The extractor reflect-pads the window start, where the cache saw real audio
+            head = np.pad(self._audio.view(start, start + head_count * self.hop_length + self.n_fft), (half, 0), mode="reflect")
+            mel[:head_count] = self._frames_power(head, head_count)
+
+        log_spec = np.log10(np.maximum(mel, 1e-10)).T
+        log_spec = np.maximum(log_spec, log_spec.max() - 8.0)
+        log_spec = (log_spec + 4.0) / 4.0
+        return torch.from_numpy(log_spec).unsqueeze(0)
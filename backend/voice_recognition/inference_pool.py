@@ -0,0 +1,138 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when a model worker already has as many requests as it may hold"""
+
+    def __init__(self, worker_name: str, depth: int):
+        super().__init__(f"Inference queue for '{worker_name}' is full ({depth} requests waiting)")
+        self.worker_name = worker_name
+        self.depth = depth
+
+
+class InferenceWorker:
+    """A single dedicated thread for one model, with bounded admission.
+
+    Every request must be admitted before it is queued; once `max_queue`
+    requests are in flight (waiting or running) further admissions fail fast
+    with QueueFullError so the API can answer 429 instead of piling up work.
+    """
+
+    def __init__(self, name: str, max_queue: int = 16, initializer=None):
+        self.name = name
+        self.max_queue = max(1, int(max_queue))
+        self.depth = 0
+        self._waiters = deque()  # futures of wait_admit() callers, oldest first
+        # `initializer` runs once on the worker's thread, e.g. to set its torch threads and CPU affinity
+        self.initializer = initializer
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"infer-{self.name}", initializer=self.initializer)
+
+    def has_room(self) -> bool:
+        return self.depth < self.max_queue
+
+    @contextmanager
+    def admit(self):
+        """Reserve a queue slot for the duration of one request"""
+        if not self.has_room():
+            raise QueueFullError(self.name, self.depth)
+
+        ticket = {"worker": self.name, "depth": self.depth, "admitted_at": time.perf_counter()}
+        self.depth += 1
+        try:
+            yield ticket
+        finally:
+            self.depth -= 1
+            self._wake_next()
+
+    async def wait_admit(self):
+        """Like admit(), but waits for a free slot instead of raising QueueFullError"""
+        while not self.has_room():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass on a wake-up this caller can no longer use
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_next()
+                raise
+        return self.admit()
+
+    def _wake_next(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def run(self, fn, *args, tickets=None, **kwargs):
+        """Run a blocking call on this worker's thread"""
+        submitted_at = time.perf_counter()
+        for ticket in tickets or []:
+            ticket.setdefault("enqueued_at", submitted_at)
+
+        def call():
+            started_at = time.perf_counter()
+            for ticket in tickets or []:
+                ticket["started_at"] = started_at
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                finished_at = time.perf_counter()
+                for ticket in tickets or []:
+                    ticket["finished_at"] = finished_at
+
+        if self._executor is None:
+            self._executor = self._new_executor()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    def shutdown(self):
+        """Stop the worker's thread; the next run() starts a new one"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def queue_wait(ticket: dict) -> float:
+    """Seconds a request waited between reaching a model and its inference starting"""
+    if ticket is None or "started_at" not in ticket:
+        return None
+    return ticket["started_at"] - ticket["enqueued_at"]
+
+
+def inference_time(ticket: dict) -> float:
+    """Seconds the batch carrying a request spent running on the model's thread"""
+    if ticket is None or "finished_at" not in ticket:
+        return None
+    return ticket["finished_at"] - ticket["started_at"]
+
+
+class InferencePool:
+    """One InferenceWorker per model so different models decode on separate cores.
+    With a ThreadPlan, each worker's thread count and CPU set come from it."""
+
+    def __init__(self, max_queue: int = 16, thread_plan=None):
+        self.max_queue = max_queue
+        self.thread_plan = thread_plan
+        self.workers = {}
+
+    def worker(self, name: str) -> InferenceWorker:
+        if name not in self.workers:
+            initializer = self.thread_plan.initializer(name) if self.thread_plan else None
+            self.workers[name] = InferenceWorker(name, self.max_queue, initializer)
+        return self.workers[name]
+
+    def depths(self) -> dict:
+        return {name: worker.depth for name, worker in self.workers.items()}
+
+    def shutdown(self):
+        for worker in self.workers.values():
+            worker.shutdown()
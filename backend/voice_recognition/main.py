@@ -1,23 +1,50 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 import whisper
-from transformers import WhisperForConditionalGeneration, WhisperProcessor, pipeline
-import tempfile
+from transformers import StoppingCriteriaList, WhisperProcessor, pipeline
+from transformers.modeling_outputs import BaseModelOutput
 import os
 import torch
 import asyncio
 from pathlib import Path
-import librosa
 from transformers.models.whisper import tokenization_whisper
 import time  # Add this import at the top
 from pydub import AudioSegment
-import soundfile as sf
 import numpy as np
-import noisereduce as nr
-import subprocess
-from starlette.background import BackgroundTask
+import json
+import logging
+import tarfile
+import zipfile
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from batching import MicroBatcher
+from inference_pool import InferencePool, QueueFullError, inference_time, queue_wait
+from model_registry import ModelRegistry
+from precision import load_whisper_model, model_size_bytes
+from compiled import CompiledWhisper, load_compiled
+from streaming import StreamingDecoder, StreamingSession
+from vad import compact, detect_speech, noise_sample
+from chunking import split_audio, stitch
+from result_cache import ResultCache
+from bulk import archive_members, collect_items, reader
+from audio_io import OUTPUT_FORMATS, UploadLimitMiddleware, UploadTooLargeError, decode_stream, encode_stream, encoded_size, upload_chunks
+from denoiser import SpectralGate, StreamingDenoiser
+import confidence
+from deadline import Deadline, DeadlineStoppingCriteria
+from features import MelConfig, SharedFeatures, gather_features, mel_config
+from topology import ThreadPlan, process_share, set_main_threads
+from supervisor import Supervisor
+from routing import ROUTE_MODES, choose_country, language_code, route_languages
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, StageTimer, current_pss_bytes, current_rss_bytes, timed
+
+# DEBUG logs every request's intermediate results; INFO keeps one line per
+# request plus model loading, WARNING silences the hot path entirely
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 # Add this for Malaysian model
 tokenization_whisper.TASK_IDS = ["translate", "transcribe", "transcribeprecise"]
@@ -25,6 +52,121 @@ tokenization_whisper.TASK_IDS = ["translate", "transcribe", "transcribeprecise"]
 PROJECT_ROOT = Path(__file__).parent
 MODEL_CACHE_DIR = PROJECT_ROOT / "models" / "huggingface"
 MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# TorchScript artifacts for models served with the "torchscript" backend
+COMPILED_MODEL_DIR = PROJECT_ROOT / "models" / "compiled"
+
+# Sample rate expected by every Whisper model we serve
+TARGET_SAMPLE_RATE = 16000
+
+# Micro-batching knobs: how long to gather concurrent requests and how many to
+# decode together. Per-model overrides live in COUNTRY_MODELS.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# Every model runs on its own inference thread; once this many requests are
+# waiting on one model, new ones are rejected with 429
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "16"))
+BASE_MODEL_WORKER = "base"
+BASE_MODEL_ID = "openai/whisper-tiny"
+BASE_MODEL_FAILED = "Base model transcription failed"
+# "whisper" serves the base model with openai-whisper; "torchscript" serves
+# BASE_MODEL_ID from a TorchScript artifact (exported on first use, or ahead
+# of time with export_models.py)
+BASE_MODEL_BACKEND = os.getenv("BASE_MODEL_BACKEND", "whisper")
+
+# Country models are loaded on first use. Idle ones are evicted (least
+# recently used first) once loaded models exceed the budget; 0 disables it.
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# Comma-separated COUNTRY_MODELS keys to load at startup, e.g. "Malaysia,Thailand"
+PRELOAD_MODELS = [c.strip() for c in os.getenv("PRELOAD_MODELS", "").split(",") if c.strip()]
+
+# Voice activity detection: only speech regions (joined by a short gap) are
+# denoised and transcribed; up to VAD_NOISE_SAMPLE_SECONDS of the rest is used
+# as the denoiser's noise profile
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_REGION_GAP_SECONDS = float(os.getenv("VAD_REGION_GAP_SECONDS", "0.2"))
+VAD_NOISE_SAMPLE_SECONDS = float(os.getenv("VAD_NOISE_SAMPLE_SECONDS", "2.0"))
+
+# Clips longer than this are split (at pauses when possible, otherwise with
+# overlap) and the chunks decoded as one batch, then stitched back together
+CHUNK_MAX_SECONDS = float(os.getenv("CHUNK_MAX_SECONDS", "28"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", "1.5"))
+
+# Denoising runs on its own single inference thread; clips arriving together
+# are denoised in batches of up to this many
+DENOISE_WORKER = "denoise"
+DENOISE_BATCH_SIZE = int(os.getenv("DENOISE_BATCH_SIZE", "8"))
+
+# Threads and CPU placement for the inference workers. Each model worker runs
+# WORKER_THREADS intra-op threads, unless BASE_MODEL_THREADS or a country's
+# "threads" key says otherwise; "auto" shares the physical cores evenly
+# between them. PIN_WORKERS=1 pins every worker, the denoiser included, to
+# its own cores. A denoise batch is split over at most DENOISE_THREADS threads.
+WORKER_THREADS = os.getenv("WORKER_THREADS", "1")
+BASE_MODEL_THREADS = os.getenv("BASE_MODEL_THREADS", WORKER_THREADS)
+DENOISE_THREADS = int(os.getenv("DENOISE_THREADS", "1"))
+PIN_WORKERS = os.getenv("PIN_WORKERS", "0") == "1"
+
+# Web worker processes. Above 1, a supervisor loads the base model and the
+# country models (PRELOAD_MODELS, or all of them when unset) once and then
+# forks the workers, which share those weights copy-on-write instead of each
+# loading its own; with PIN_WORKERS every process gets its own cores. A model
+# a worker loads later (/warmup/, reload after eviction) is its own copy.
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+
+# Cascade mode runs the models one at a time in each country's cascade_order
+# and skips the second when the first is confident by Whisper's fallback
+# thresholds. Requests can switch it on or off with the `cascade` form field.
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "0") == "1"
+CASCADE_LOGPROB_THRESHOLD = float(os.getenv("CASCADE_LOGPROB_THRESHOLD", "-1.0"))
+CASCADE_NO_SPEECH_THRESHOLD = float(os.getenv("CASCADE_NO_SPEECH_THRESHOLD", "0.6"))
+CASCADE_COMPRESSION_RATIO_THRESHOLD = float(os.getenv("CASCADE_COMPRESSION_RATIO_THRESHOLD", "2.4"))
+
+# Language routing: Whisper language ID on the first mel window picks the
+# country model by its language(s). ROUTE_LANGUAGE=missing routes requests
+# that name no known country, "always" routes every request and "off" never;
+# requests can override it with the `route` form field. A route at least
+# ROUTE_CONFIDENCE_THRESHOLD sure runs only that country's model, skipping
+# the base transcription.
+ROUTE_LANGUAGE = os.getenv("ROUTE_LANGUAGE", "missing")
+if ROUTE_LANGUAGE not in ROUTE_MODES:
+    raise ValueError(f"ROUTE_LANGUAGE must be one of {ROUTE_MODES}, got '{ROUTE_LANGUAGE}'")
+ROUTE_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTE_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Bulk transcription decodes uploads a window at a time and transcribes each
+# window longest first, so clips of similar length reach the model batchers
+# together; this many clips are in the pipeline at once
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", str(BATCH_MAX_SIZE)))
+BULK_SORT_WINDOW = int(os.getenv("BULK_SORT_WINDOW", "64"))
+BULK_DECODE_CONCURRENCY = int(os.getenv("BULK_DECODE_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# Uploads to /transcribe/ and /denoise/ are streamed into ffmpeg and cut off
+# past MAX_UPLOAD_MB, or once they decode to more than MAX_AUDIO_SECONDS of
+# audio (0 disables either cap), so large uploads can't exhaust memory. A
+# /transcribe/batch/ request may carry up to MAX_BULK_UPLOAD_MB in total, and
+# its archive as much audio uncompressed; each clip in it is held to
+# MAX_UPLOAD_MB.
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+MAX_BULK_UPLOAD_MB = float(os.getenv("MAX_BULK_UPLOAD_MB", "500"))
+MAX_BULK_UPLOAD_BYTES = int(MAX_BULK_UPLOAD_MB * 1024 * 1024)
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "900"))
+# Request size cap of each upload endpoint
+UPLOAD_ENDPOINTS = {
+    "/transcribe/": MAX_UPLOAD_BYTES,
+    "/denoise/": MAX_UPLOAD_BYTES,
+    "/transcribe/batch/": MAX_BULK_UPLOAD_BYTES
+}
+
+# Transcription results keyed by audio content, model and settings. Set
+# RESULT_CACHE_DIR to also keep them on disk across restarts.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+
+# Streaming: decode a new partial after this much fresh audio, and commit the
+# window's text once it spans this many seconds (must stay below Whisper's 30 s)
+STREAM_STEP_SECONDS = float(os.getenv("STREAM_STEP_SECONDS", "1.0"))
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "20"))
 
 app = FastAPI()
 
@@ -37,7 +179,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-torch.set_num_threads(1)
+# Oversized uploads get a 413 as soon as they pass their endpoint's cap,
+# before Starlette spools the whole multipart body to disk
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits=UPLOAD_ENDPOINTS,
+    on_reject=lambda path: REQUESTS.inc(endpoint=path.strip("/"), status="too_large")
+)
+
+@app.middleware("http")
+async def record_arrival(request: Request, call_next):
+    """Note when the request arrived, so deadlines include the upload"""
+    request.state.arrived_at = time.monotonic()
+    return await call_next(request)
+
+# The event loop thread stays single-threaded. It is initialised before any
+# worker starts, so a worker's count cannot leak into it later; other helper
+# threads (VAD, model loading) take the count of the last worker started,
+# which is harmless as they do no parallel torch work.
+set_main_threads(1)
+
+thread_plan = ThreadPlan(
+    {BASE_MODEL_WORKER: BASE_MODEL_THREADS, DENOISE_WORKER: DENOISE_THREADS},
+    default_threads=WORKER_THREADS,
+    pin=PIN_WORKERS
+)
+inference_pool = InferencePool(max_queue=INFERENCE_QUEUE_SIZE, thread_plan=thread_plan)
+result_cache = ResultCache(max_entries=RESULT_CACHE_SIZE, disk_dir=RESULT_CACHE_DIR)
+
+# Prometheus metrics served at /metrics. Stage histograms are fed as requests
+# finish; the gauges are read when scraped.
+metrics_registry = MetricsRegistry()
+REQUESTS = metrics_registry.register(Counter(
+    "voice_requests_total", "Requests handled, by endpoint and outcome", ["endpoint", "status"]
+))
+REQUEST_STAGE_SECONDS = metrics_registry.register(Histogram(
+    "voice_request_stage_seconds", "Time a /transcribe/ request spent in each stage", ["stage"]
+))
+MODEL_STAGE_SECONDS = metrics_registry.register(Histogram(
+    "voice_model_stage_seconds", "Time a request spent in each stage of one model", ["stage", "model"]
+))
+RESULT_CACHE_LOOKUPS = metrics_registry.register(Counter(
+    "voice_result_cache_lookups_total", "Result cache lookups, by the tier that answered (memory, disk or miss)", ["tier"]
+))
+ROUTES = metrics_registry.register(Counter(
+    "voice_language_routes_total", "Language routing decisions, by outcome and country", ["outcome", "country"]
+))
+metrics_registry.register(Gauge(
+    "voice_inference_queue_depth", "Requests admitted to each inference worker",
+    lambda: {(name,): depth for name, depth in inference_pool.depths().items()}, ["worker"]
+))
+metrics_registry.register(Gauge(
+    "voice_model_load_seconds", "How long each loaded model took to load",
+    lambda: {("base",): base_model_load_seconds,
+             **{(key,): seconds for key, seconds in model_registry.load_times.items()}}, ["model"]
+))
+metrics_registry.register(Gauge(
+    "voice_model_memory_bytes", "Parameter memory of each loaded country model",
+    lambda: {(key,): handler.memory_bytes() for key, handler in model_registry.handlers.items()}, ["model"]
+))
+metrics_registry.register(Gauge(
+    "voice_model_active_requests", "Requests using each country model; a model in use is never evicted",
+    lambda: {(key,): status["active_requests"] for key, status in model_registry.status().items()}, ["model"]
+))
+metrics_registry.register(Gauge(
+    "voice_worker_threads", "Intra-op threads planned for each inference worker",
+    lambda: {(name,): layout.threads for name, layout in thread_plan.layout.items()}, ["worker"]
+))
+metrics_registry.register(Gauge(
+    "process_resident_memory_bytes", "Resident set size of the server process", current_rss_bytes
+))
+metrics_registry.register(Gauge(
+    "process_proportional_memory_bytes",
+    "Proportional set size of the server process; weights shared between web workers count once in total",
+    current_pss_bytes
+))
 
 # Updated model configurations with clearer country labeling
 COUNTRY_MODELS = {
@@ -45,73 +261,158 @@ COUNTRY_MODELS = {
         "name": "Malaysian Whisper Model",
         "model_id": "mesolitica/malaysian-whisper-small-v3",
         "language": "ms",
-        "type": "malaysian"
+        # Languages that route here; Whisper often hears Malay as Indonesian
+        "route_languages": ["ms", "id"],
+        "type": "malaysian",
+        "precision": "fp32",  # fp32, bf16 or int8 (dynamic quantization of Linear layers)
+        # Set to a Whisper tiny checkpoint (e.g. "openai/whisper-tiny") to decode
+        # speculatively, with the tiny model drafting tokens for this one to verify
+        "draft_model_id": None,
+        # "transformers", or "torchscript" to decode with the artifact under
+        # models/compiled/ (traced encoder plus cached-KV decoder steps)
+        "backend": "transformers",
+        "cascade_order": "base_first"  # or "country_first"
     },
     "Singapore": {
         "name": "Singlish Whisper Model",
         "model_id": "jensenlwt/whisper-small-singlish-122k",
         "language": "en",
-        "type": "pipeline"
+        "type": "pipeline",
+        "precision": "fp32",
+        "draft_model_id": None,
+        "backend": "transformers",
+        "cascade_order": "base_first"
     },
     "Thailand": {
         "name": "Thai Whisper Model",
         "model_id": "juierror/whisper-tiny-thai",
         "language": "Thai",
-        "type": "thai"
+        "type": "thai",
+        "precision": "fp32",
+        "backend": "transformers",
+        # Whisper tiny sized already, so it goes first and the base model only backs it up
+        "cascade_order": "country_first"
     }
 }
 
+# Lay out every worker up front, so which cores a model gets doesn't depend
+# on which model happens to be used first
+for country, config in COUNTRY_MODELS.items():
+    if config.get("threads"):
+        thread_plan.threads[country] = config["threads"]
+thread_plan.plan([BASE_MODEL_WORKER, *COUNTRY_MODELS, DENOISE_WORKER])
+
 class ModelHandler:
-    def __init__(self, model_config, cache_dir):
+    def __init__(self, model_config, cache_dir, worker=None, name: str = None):
         self.config = model_config
+        # Label for this model's logs and metrics
+        self.name = name or model_config["model_id"]
         self.cache_dir = cache_dir
         self.model = None
         self.processor = None
         self.pipeline = None
+        self.draft_model = None
+        self.compiled = None
         self.device = "cpu"  # Always use CPU
+        self.worker = worker
+        self.batcher = MicroBatcher(
+            self._transcribe_batch,
+            max_batch_size=model_config.get("max_batch_size", BATCH_MAX_SIZE),
+            max_wait_ms=model_config.get("max_wait_ms", BATCH_MAX_WAIT_MS),
+            name=model_config["model_id"],
+            worker=worker
+        )
 
     async def load(self):
+        # from_pretrained blocks for seconds, keep it off the event loop
+        return await asyncio.to_thread(self._load)
+
+    def unload(self):
+        # Stop the batching task and the worker's thread too; the task holds
+        # on to this handler, and both restart if the model is loaded again
+        self.batcher.shutdown()
+        if self.worker is not None:
+            self.worker.shutdown()
+        self.model = None
+        self.processor = None
+        self.pipeline = None
+        self.draft_model = None
+        self.compiled = None
+
+    def memory_bytes(self) -> int:
+        total = model_size_bytes(self.model) if self.model is not None else 0
+        if self.draft_model is not None:
+            total += model_size_bytes(self.draft_model)
+        if self.compiled is not None:
+            total += self.compiled.memory_bytes()
+        return total
+
+    def _load_draft(self, precision: str):
+        """Whisper tiny draft for speculative decoding, or None when it can't be used"""
+        draft_id = self.config["draft_model_id"]
+        logger.info("Loading draft model: %s (%s)", draft_id, precision)
+        draft = load_whisper_model(draft_id, MODEL_CACHE_DIR / draft_id.replace('/', '_'), precision).to(self.device)
+
+        # The draft proposes token ids from the same features the model sees
+        if (draft.config.vocab_size != self.model.config.vocab_size
+                or draft.config.num_mel_bins != self.model.config.num_mel_bins):
+            logger.warning("Draft model %s does not match %s (vocab %d vs %d), speculative decoding disabled",
+                           draft_id, self.config["model_id"], draft.config.vocab_size, self.model.config.vocab_size)
+            return None
+        return draft
+
+    def _load(self):
         try:
             model_type = self.config["type"]
             model_id = self.config["model_id"]
+            precision = self.config.get("precision", "fp32")
+
+            if self.config.get("backend", "transformers") == "torchscript":
+                logger.info("Loading TorchScript model: %s (%s)", model_id, precision)
+                self.compiled = load_compiled(COMPILED_MODEL_DIR, model_id, self.cache_dir, precision, self._generate_kwargs())
+                if self.compiled is not None:
+                    self.processor = self.compiled.processor
+                    logger.info("TorchScript model loaded successfully: %s", model_id)
+                    return True
+                logger.warning("Falling back to transformers for %s", model_id)
             
             if model_type == "pipeline":
-                print(f"Loading pipeline model: {model_id}")
+                logger.info("Loading pipeline model: %s (%s)", model_id, precision)
                 try:
-                    # Create pipeline directly
+                    # Load the model ourselves so the precision setting applies
+                    self.processor = WhisperProcessor.from_pretrained(
+                        model_id,
+                        cache_dir=self.cache_dir
+                    )
+                    self.model = load_whisper_model(model_id, self.cache_dir, precision)
                     self.pipeline = pipeline(
                         task="automatic-speech-recognition",
-                        model=model_id,
+                        model=self.model,
+                        tokenizer=self.processor.tokenizer,
+                        feature_extractor=self.processor.feature_extractor,
                         chunk_length_s=30,
+                        torch_dtype=self.model.dtype,
                         device=self.device
                     )
-                    print(f"Pipeline model loaded successfully: {model_id}")
-                    return True
+                    logger.info("Pipeline model loaded successfully: %s", model_id)
                 except Exception as e:
-                    print(f"Error creating pipeline: {str(e)}")
+                    logger.error("Error creating pipeline: %s", e)
                     raise
             
             elif model_type == "malaysian":
-                print(f"Loading Malaysian model: {model_id}")
+                logger.info("Loading Malaysian model: %s (%s)", model_id, precision)
                 # Load processor first
                 self.processor = WhisperProcessor.from_pretrained(
                     model_id,
                     cache_dir=self.cache_dir
                 )
                 
-                # Load model for CPU
-                self.model = WhisperForConditionalGeneration.from_pretrained(
-                    model_id,
-                    cache_dir=self.cache_dir,
-                    torch_dtype=torch.float32  # Use float32 for CPU
-                ).to(self.device)
-                
-                # Set to eval mode
-                self.model.eval()
-                print("Malaysian model loaded successfully")
+                # Load model for CPU at the configured precision, in eval mode
+                self.model = load_whisper_model(model_id, self.cache_dir, precision).to(self.device)
+                logger.info("Malaysian model loaded successfully")
                 
             else:
-                print(f"Loading custom model: {model_id}")
+                logger.info("Loading custom model: %s (%s)", model_id, precision)
                 self.processor = WhisperProcessor.from_pretrained(
                     model_id,
                     cache_dir=self.cache_dir,
@@ -119,482 +420,1237 @@ class ModelHandler:
                     task="transcribe"
                 )
                 
-                self.model = WhisperForConditionalGeneration.from_pretrained(
-                    model_id,
-                    cache_dir=self.cache_dir
-                ).to(self.device)
+                self.model = load_whisper_model(model_id, self.cache_dir, precision).to(self.device)
+
+            if self.config.get("draft_model_id"):
+                self.draft_model = self._load_draft(precision)
             
             return True
         except Exception as e:
-            print(f"Error loading model {model_id}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error loading model %s: %s", model_id, e)
             return False
 
-    async def transcribe(self, file_path: str):
+    async def transcribe(self, features: SharedFeatures, ticket: dict = None):
+        """{"text", "confidence"} for the request's audio, or None on failure"""
         try:
-            if self.config["type"] == "pipeline":
-                return await self._transcribe_pipeline(file_path)
-            elif self.config["type"] == "malaysian":
-                return await self._transcribe_malaysian(file_path)
-            else:
-                return await self._transcribe_thai(file_path)
+            # Long clips arrive split to fit the 30 s window; chunks and concurrent
+            # requests for this model are all decoded together by the batcher
+            chunks = features.chunks
+            results = await asyncio.gather(*[
+                self.batcher.submit(item, ticket) for item in features.items()
+            ])
+            if len(chunks) == 1 or all(result is None for result in results):
+                return results[0]
+            logger.debug("Stitching %d chunks", len(chunks))
+            results = [result or {"text": None, "confidence": None} for result in results]
+            return {
+                "text": stitch([result["text"] for result in results], chunks),
+                "confidence": confidence.merge([result["confidence"] for result in results])
+            }
         except Exception as e:
-            print(f"Error in transcription: {str(e)}")
+            logger.exception("Error in transcription: %s", e)
             return None
 
-    async def _transcribe_pipeline(self, file_path: str):
+    def _transcribe_batch(self, items: list) -> list:
+        """Transcribe (SharedFeatures, chunk) pairs"""
+        deadlines = [features.deadline for features, _ in items]
+        if all(deadline is not None and deadline.expired() for deadline in deadlines):
+            logger.warning("Skipping batch of %d: every request is past its deadline", len(items))
+            return [None] * len(items)
+
+        # The TorchScript artifact decodes every model type from shared features
+        if self.compiled is None and self.config["type"] == "pipeline":
+            return self._transcribe_pipeline(items)
+        return self._transcribe_features(items)
+
+    def input_features(self, items: list) -> torch.Tensor:
+        """Log-mel features for a batch, shared with other models using the same config"""
+        with self._timed(items, "features"):
+            return gather_features(items, mel_config(self.processor.feature_extractor))
+
+    def _timed(self, items: list, stage: str):
+        """Charge a batch stage to every request in the batch"""
+        return timed([features.timer for features, _ in items], stage, self.name)
+
+    def _transcribe_pipeline(self, items: list) -> list:
+        if self.draft_model is not None:
+            # The pipeline can't pass a draft model through its batched generate
+            return self._transcribe_features(items)
+
+        # The pipeline runs its own feature extractor, so it gets raw audio
+        audios = [features.chunk_audio(chunk) for features, chunk in items]
         try:
-            print(f"Transcribing with pipeline model...")
+            logger.debug("Transcribing %d clip(s) with pipeline model", len(audios))
             if self.pipeline is None:
                 raise RuntimeError("Pipeline not initialized")
                 
-            # Use direct file path for pipeline
-            result = await asyncio.to_thread(
-                self.pipeline, 
-                file_path,
-                batch_size=8,
-                return_timestamps=False
-            )
+            # Pass the decoded buffers with their rate so the pipeline skips ffmpeg
+            # Feature extraction happens inside the pipeline, so it counts as generate
+            with self._timed(items, "generate"):
+                results = self.pipeline(
+                    [{"raw": audio, "sampling_rate": TARGET_SAMPLE_RATE} for audio in audios],
+                    batch_size=max(8, len(audios)),
+                    return_timestamps=False
+                )
             
-            print(f"Pipeline transcription result: {result}")
-            return result["text"] if isinstance(result, dict) else result
+            logger.debug("Pipeline transcription result: %s", results)
+            # The pipeline doesn't expose token scores, so there are no confidence signals
+            return [
+                {"text": result["text"] if isinstance(result, dict) else result, "confidence": None}
+                for result in results
+            ]
         except Exception as e:
-            print(f"Error in pipeline transcription: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.exception("Error in pipeline transcription: %s", e)
+            return [None] * len(audios)
 
-    async def _transcribe_malaysian(self, file_path: str):
-        try:
-            audio, sr = await asyncio.to_thread(
-                librosa.load, 
-                file_path, 
-                sr=16000,
-                mono=True
-            )
-            
-            print(f"Loaded audio: {len(audio)} samples, {sr}Hz")
-
-            # Process audio
-            with torch.no_grad():
-                inputs = self.processor(
-                    audio, 
-                    sampling_rate=16000, 
-                    return_tensors="pt"
-                )
-                
-                # Move input features to CPU
-                input_features = inputs["input_features"].to(self.device)
-                
-                # Generate transcription
-                generated = await asyncio.to_thread(
-                    self.model.generate,
-                    input_features,
-                    language="ms",
-                    task="transcribe"
-                )
-                
-                # Decode result
-                transcription = self.processor.batch_decode(
-                    generated, 
-                    skip_special_tokens=True
-                )[0]
-                
-                print(f"Malaysian model transcription: {transcription}")
-                return transcription
+    def _generate_kwargs(self) -> dict:
+        if self.config["type"] == "malaysian":
+            return {"language": "ms", "task": "transcribe"}
+        elif self.config["type"] == "thai":
+            # Explicitly set Thai language
+            return {"max_new_tokens": 255, "language": "th", "task": "transcribe"}
+        # Pipeline models decode with their own generation config
+        return {}
 
-        except Exception as e:
-            print(f"Error in Malaysian transcription: {str(e)}")
-            import traceback
-            traceback.print_exc()
+    def generate(self, input_features: torch.Tensor, speculative: bool = None, encoder_outputs=None,
+                 stopping_criteria: StoppingCriteriaList = None) -> list:
+        """Token ids for a batch of precomputed log-mel features.
+
+        With a draft model loaded (or `speculative` set) every clip is decoded
+        with assisted generation: the draft proposes a few tokens and this
+        model checks them all in one forward pass. Greedy assisted decoding
+        gives the same tokens as plain generate, up to floating-point ties.
+        """
+        speculative = self.draft_model is not None if speculative is None else speculative
+        generate_kwargs = self._generate_kwargs()
+        if stopping_criteria is not None:
+            generate_kwargs["stopping_criteria"] = stopping_criteria
+        if self.compiled is not None:
+            return [result["tokens"] for result in self.compiled.generate(input_features, **generate_kwargs)]
+        # Move input features to CPU, matching the model's dtype
+        input_features = input_features.to(self.device, dtype=self.model.dtype)
+        with torch.no_grad():
+            if not speculative:
+                if encoder_outputs is not None:
+                    return list(self.model.generate(input_features, encoder_outputs=encoder_outputs, **generate_kwargs))
+                return list(self.model.generate(input_features, **generate_kwargs))
+
+            # Assisted generation only handles one sequence at a time
+            sequences = []
+            for i, features in enumerate(input_features.split(1)):
+                kwargs = dict(generate_kwargs)
+                if encoder_outputs is not None:
+                    kwargs["encoder_outputs"] = BaseModelOutput(last_hidden_state=encoder_outputs.last_hidden_state[i:i + 1])
+                sequences.append(self.model.generate(features, assistant_model=self.draft_model, **kwargs)[0])
+            return sequences
+
+    def decode_features(self, input_features: torch.Tensor) -> list:
+        """Generate and decode text for a batch of precomputed log-mel features"""
+        return self.processor.batch_decode(self.generate(input_features), skip_special_tokens=True)
+
+    def _sequence_confidence(self, encoder_output: torch.Tensor, sequence: torch.Tensor) -> dict:
+        """Average log-probability of the decoded tokens and the no-speech
+        probability, from one teacher-forced pass over the finished sequence"""
+        tokenizer = self.processor.tokenizer
+        logits = self.model(
+            encoder_outputs=BaseModelOutput(last_hidden_state=encoder_output.unsqueeze(0)),
+            decoder_input_ids=sequence[:-1].unsqueeze(0)
+        ).logits[0].float()
+        logprobs = logits.log_softmax(dim=-1)
+        targets = sequence[1:]
+        token_logprobs = logprobs.gather(-1, targets.unsqueeze(-1)).squeeze(-1)
+
+        # Like Whisper, score the text tokens plus the first end-of-text, but
+        # not the forced prompt or the padding after it
+        eos = targets == tokenizer.eos_token_id
+        first_eos = eos & (eos.cumsum(0) == 1)
+        special = torch.isin(targets, torch.tensor(tokenizer.all_special_ids))
+        scored = (~special & (eos.cumsum(0) == 0)) | first_eos
+        avg_logprob = float(token_logprobs[scored].sum() / max(1, int(scored.sum())))
+
+        # Position 0 is the prediction right after <|startoftranscript|>
+        no_speech_id = None
+        for token in ("<|nospeech|>", "<|nocaptions|>"):
+            token_id = tokenizer.convert_tokens_to_ids(token)
+            if token_id is not None and token_id != tokenizer.unk_token_id:
+                no_speech_id = token_id
+                break
+        no_speech_prob = float(logprobs[0, no_speech_id].exp()) if no_speech_id is not None else None
+
+        return {"avg_logprob": avg_logprob, "no_speech_prob": no_speech_prob}
+
+    @staticmethod
+    def _stopping_criteria(items: list):
+        """Stop decoding early once every request in the batch has run out of time"""
+        deadlines = [features.deadline for features, _ in items]
+        if not deadlines or any(deadline is None for deadline in deadlines):
             return None
+        return StoppingCriteriaList([DeadlineStoppingCriteria(deadlines)])
 
-    async def _transcribe_thai(self, file_path: str):
-        try:
-            print("Starting Thai transcription...")
-            audio, sr = await asyncio.to_thread(librosa.load, file_path, sr=16000)
-            inputs = self.processor(
-                audio, 
-                sampling_rate=16000, 
-                return_tensors="pt"
-            ).input_features
-            
-            generated = await asyncio.to_thread(
-                self.model.generate,
-                input_features=inputs.to(self.device),
-                max_new_tokens=255,
-                language="th",  # Explicitly set Thai language
-                task="transcribe"
-            )
-            
-            # Get transcription and ensure proper encoding
-            transcription = self.processor.batch_decode(generated, skip_special_tokens=True)[0]
-            print(f"Thai transcription (raw): {transcription.encode('utf-8')}")
-            
-            return transcription
+    def decode_scored(self, input_features: torch.Tensor, stopping_criteria: StoppingCriteriaList = None) -> list:
+        """[{"text", "confidence"}] for a batch of precomputed log-mel features"""
+        if self.compiled is not None:
+            return self._decode_compiled(input_features, stopping_criteria)
+        input_features = input_features.to(self.device, dtype=self.model.dtype)
+        with torch.no_grad():
+            # Run the encoder once for both generation and scoring
+            encoder_outputs = self.model.get_encoder()(input_features)
+            sequences = self.generate(input_features, encoder_outputs=encoder_outputs, stopping_criteria=stopping_criteria)
+            scores = [
+                self._sequence_confidence(encoder_outputs.last_hidden_state[i], sequence)
+                for i, sequence in enumerate(sequences)
+            ]
+
+        texts = self.processor.batch_decode(sequences, skip_special_tokens=True)
+        return [
+            {"text": text, "confidence": confidence.merge([dict(score, compression_ratio=confidence.compression_ratio(text))])}
+            for text, score in zip(texts, scores)
+        ]
 
+    def _decode_compiled(self, input_features: torch.Tensor, stopping_criteria: StoppingCriteriaList = None) -> list:
+        # The artifact scores tokens while decoding, no separate scoring pass
+        results = self.compiled.generate(input_features, stopping_criteria=stopping_criteria, **self._generate_kwargs())
+        texts = self.processor.batch_decode([result["tokens"] for result in results], skip_special_tokens=True)
+        return [
+            {"text": text, "confidence": confidence.merge([{
+                "avg_logprob": result["avg_logprob"],
+                "no_speech_prob": result["no_speech_prob"],
+                "compression_ratio": confidence.compression_ratio(text)
+            }])}
+            for text, result in zip(texts, results)
+        ]
+
+    def _transcribe_features(self, items: list) -> list:
+        try:
+            logger.debug("Transcribing %d clip(s) with %s model", len(items), self.name)
+            inputs = self.input_features(items)
+            with self._timed(items, "generate"):
+                transcriptions = self.decode_scored(inputs, self._stopping_criteria(items))
+            logger.debug("%s model transcription: %s", self.name, [t["text"] for t in transcriptions])
+            return transcriptions
         except Exception as e:
-            print(f"Error in Thai transcription: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.exception("Error in %s transcription: %s", self.name, e)
+            return [None] * len(items)
+
+def create_model_handler(country: str) -> ModelHandler:
+    config = COUNTRY_MODELS[country]
+    model_specific_cache = MODEL_CACHE_DIR / config["model_id"].replace('/', '_')
+    return ModelHandler(config, model_specific_cache, inference_pool.worker(country), name=country)
 
-# Initialize model handlers
-model_handlers = {}
+# Fine-tuned model handlers, loaded on demand
+model_registry = ModelRegistry(create_model_handler, memory_budget_mb=MODEL_MEMORY_BUDGET_MB)
+base_model_load_seconds = None
+models_initialized = False
 
-async def initialize_models():
-    """Initialize all models asynchronously"""
-    print("Initializing models...")
+def log_thread_layout():
+    """Startup report of how the inference workers share the CPUs"""
+    report = thread_plan.report()
+    logger.info("Thread layout: %d CPUs (%d physical cores), workers %s",
+                report["cpus"], report["physical_cores"], "pinned" if report["pinned"] else "not pinned")
+    for name, layout in report["workers"].items():
+        logger.info("  %-12s %2d thread(s)%s", name, layout["threads"],
+                    f" on CPUs {layout['cpus']}" if layout["cpus"] else "")
+    if report["oversubscribed"]:
+        logger.warning("Workers plan %d threads on %d CPUs; they will compete for cores",
+                       report["threads_total"], report["cpus"])
+
+async def initialize_models(preload: list = None):
+    """Initialize all models asynchronously; `preload` lists the country
+    models to load now (default PRELOAD_MODELS)"""
+    log_thread_layout()
+    logger.info("Initializing models")
     
     # Initialize base Whisper model first
-    print("Loading base Whisper model...")
-    global base_model
+    logger.info("Loading base Whisper model")
+    global base_model, base_model_load_seconds, models_initialized
     try:
-        base_model = whisper.load_model(
-            "tiny", 
-            device="cpu",  # Always use CPU
-            download_root=str(PROJECT_ROOT / "models" / "whisper")
-        )
-        print("Base model loaded successfully")
+        start_time = time.perf_counter()
+        base_model = None
+        if BASE_MODEL_BACKEND == "torchscript":
+            base_model = load_compiled(
+                COMPILED_MODEL_DIR, BASE_MODEL_ID, MODEL_CACHE_DIR / BASE_MODEL_ID.replace('/', '_'),
+                generate_kwargs={"task": "transcribe"}
+            )
+            if base_model is None:
+                logger.warning("Falling back to openai-whisper for the base model")
+        if base_model is None:
+            base_model = whisper.load_model(
+                "tiny", 
+                device="cpu",  # Always use CPU
+                download_root=str(PROJECT_ROOT / "models" / "whisper")
+            )
+        base_model_load_seconds = time.perf_counter() - start_time
+        logger.info("Base model loaded in %.2f seconds", base_model_load_seconds)
     except Exception as e:
-        print(f"Error loading base model: {str(e)}")
+        logger.exception("Error loading base model: %s", e)
         raise RuntimeError("Failed to load base Whisper model")
 
-    # Initialize fine-tuned models
-    for country, config in COUNTRY_MODELS.items():
-        model_specific_cache = MODEL_CACHE_DIR / config["model_id"].replace('/', '_')
-        handler = ModelHandler(config, model_specific_cache)
-        await handler.load()
-        model_handlers[country] = handler
+    # Fine-tuned models load lazily; only the requested ones are loaded now
+    preload = [country for country in (PRELOAD_MODELS if preload is None else preload) if country in COUNTRY_MODELS]
+    if preload:
+        logger.info("Preloading fine-tuned models: %s", preload)
+        await model_registry.preload(preload)
 
-    print("Model initialization complete")
+    models_initialized = True
+    logger.info("Model initialization complete")
+
+def configure_worker_process(index: int, count: int):
+    """Runs in each forked web worker before it serves"""
+    logger.info("Web worker %d of %d (pid %d)", index, count, os.getpid())
+    if PIN_WORKERS:
+        thread_plan.use_cpus(process_share(thread_plan.cpus, index, count))
+    elif count * thread_plan.report()["threads_total"] > len(thread_plan.cpus):
+        logger.warning("%d web workers plan %d threads each on %d CPUs; set PIN_WORKERS=1 or fewer threads",
+                       count, thread_plan.report()["threads_total"], len(thread_plan.cpus))
+    log_thread_layout()
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize models when the FastAPI app starts"""
-    await initialize_models()
+    """Initialize models when the FastAPI app starts, unless a supervisor
+    already loaded them before forking this worker"""
+    if not models_initialized:
+        await initialize_models()
+
+@app.post("/warmup/")
+async def warmup_models(countries: str = Form(None)):
+    """
+    Load fine-tuned models ahead of traffic and report how long each took.
+    Accepts a comma-separated list of countries; defaults to all of them.
+    """
+    requested = [c.strip() for c in countries.split(",")] if countries else list(COUNTRY_MODELS)
+    unknown = [c for c in requested if c not in COUNTRY_MODELS]
+    if unknown:
+        return JSONResponse(status_code=400, content={"error": f"Unknown countries: {unknown}"})
+
+    report = {}
+    for country in requested:
+        already_loaded = country in model_registry.handlers
+        start_time = time.perf_counter()
+        try:
+            handler = await model_registry.get(country)
+            report[country] = {
+                "model_id": COUNTRY_MODELS[country]["model_id"],
+                "already_loaded": already_loaded,
+                "load_seconds": model_registry.load_times.get(country),
+                "wait_seconds": time.perf_counter() - start_time,
+                "memory_mb": handler.memory_bytes() / 1024 / 1024
+            }
+        except Exception as e:
+            report[country] = {"model_id": COUNTRY_MODELS[country]["model_id"], "error": str(e)}
+
+    return JSONResponse(content=jsonable_encoder({
+        "models": report,
+        "loaded": list(model_registry.handlers),
+        "total_memory_mb": model_registry.total_bytes() / 1024 / 1024,
+        "memory_budget_mb": MODEL_MEMORY_BUDGET_MB or None
+    }))
+
+@app.get("/metrics")
+async def export_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+def observe_timings(timer: StageTimer):
+    """Feed one finished request's stage timings into the histograms"""
+    report = timer.report()
+    for model, stages in report.pop("models").items():
+        for stage, seconds in stages.items():
+            MODEL_STAGE_SECONDS.observe(seconds, stage=stage, model=model)
+    for stage, seconds in report.items():
+        REQUEST_STAGE_SECONDS.observe(seconds, stage=stage)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the per-model inference threads"""
+    inference_pool.shutdown()
+
+def base_mel_config() -> MelConfig:
+    if isinstance(base_model, CompiledWhisper):
+        return mel_config(base_model.processor.feature_extractor)
+    return MelConfig(
+        base_model.dims.n_mels,
+        whisper.audio.N_FFT,
+        whisper.audio.HOP_LENGTH,
+        whisper.audio.SAMPLE_RATE,
+        whisper.audio.N_SAMPLES
+    )
+
+def _transcribe_base(features: SharedFeatures) -> dict:
+    # The deadline is checked before and after the features; the TorchScript
+    # backend also stops decoding at it, but whisper.decode cannot be
+    # interrupted, so an eager decode that has started runs to the end
+    if features.deadline is not None and features.deadline.expired():
+        logger.warning("Skipping base model: request is past its deadline")
+        return None
+
+    # Decode every chunk in one batch, reusing features a country model with
+    # the same mel config has already computed (or leaving them for it)
+    chunks = features.chunks
+    logger.debug("Decoding %d chunk(s) with base model", len(chunks))
+    with timed([features.timer], "features", "base"):
+        mels = gather_features(features.items(), base_mel_config())
+    if features.deadline is not None and features.deadline.expired():
+        logger.warning("Skipping base model decode: request is past its deadline")
+        return None
+    with timed([features.timer], "generate", "base"):
+        if isinstance(base_model, CompiledWhisper):
+            results = _decode_base_compiled(mels, features.deadline)
+        else:
+            results = [
+                {
+                    "text": result.text,
+                    "avg_logprob": result.avg_logprob,
+                    "no_speech_prob": result.no_speech_prob,
+                    "compression_ratio": result.compression_ratio,
+                    "language": result.language
+                }
+                for result in whisper.decode(base_model, mels.to(base_model.device),
+                                             whisper.DecodingOptions(fp16=False, without_timestamps=True))
+            ]
+    return {
+        "text": stitch([result.pop("text") for result in results], chunks),
+        "confidence": confidence.merge(results)
+    }
+
+def _decode_base_compiled(mels: torch.Tensor, deadline: Deadline = None) -> list:
+    # Like whisper.decode: detect the language, transcribe, no timestamps,
+    # at most half the text context
+    results = base_model.generate(
+        mels, task="transcribe", detect_language=True,
+        max_new_tokens=base_model.config.max_target_positions // 2,
+        stopping_criteria=StoppingCriteriaList([DeadlineStoppingCriteria([deadline])]) if deadline else None
+    )
+    texts = base_model.processor.batch_decode([result["tokens"] for result in results], skip_special_tokens=True)
+    return [
+        {
+            "text": text.strip(),
+            "avg_logprob": result["avg_logprob"],
+            "no_speech_prob": result["no_speech_prob"],
+            "compression_ratio": confidence.compression_ratio(text.strip()),
+            "language": result["language"]
+        }
+        for text, result in zip(texts, results)
+    ]
+
+def _detect_language(features: SharedFeatures) -> dict:
+    """{language code: probability} from the base model on the first mel window"""
+    with timed([features.timer], "features", "base"):
+        mels = gather_features(features.items()[:1], base_mel_config())
+    with timed([features.timer], "language_id", "base"):
+        if isinstance(base_model, CompiledWhisper):
+            return base_model.detect_language(mels)[0]
+        _, language_probs = whisper.detect_language(base_model, mels.to(base_model.device))
+        return language_probs[0]
 
-async def transcribe_with_base_model(file_path: str):
+async def transcribe_with_base_model(features: SharedFeatures, ticket: dict = None):
     """Transcribe audio using the base Whisper model"""
     try:
-        print("Starting base model transcription...")
-        result = base_model.transcribe(file_path)
-        print(f"Base model transcription complete: {result['text']}")
-        return result["text"]
+        logger.debug("Starting base model transcription")
+        # Run on the base model's own thread so the event loop keeps serving requests
+        worker = inference_pool.worker(BASE_MODEL_WORKER)
+        result = await worker.run(_transcribe_base, features, tickets=[ticket] if ticket else None)
+        logger.debug("Base model transcription complete: %s", (result or {}).get("text"))
+        return result
     except Exception as e:
-        print(f"Error in base model transcription: {str(e)}")
-        return "Base model transcription failed"
+        logger.exception("Error in base model transcription: %s", e)
+        return {"text": BASE_MODEL_FAILED, "confidence": None}
+
+def pipeline_settings(country: str = None) -> dict:
+    """Everything besides the audio that changes a model's output, for cache keys"""
+    settings = {
+        "vad": [VAD_ENABLED, VAD_REGION_GAP_SECONDS, VAD_NOISE_SAMPLE_SECONDS],
+        "chunking": [CHUNK_MAX_SECONDS, CHUNK_OVERLAP_SECONDS],
+        "denoiser": audio_denoiser.gate.settings(),
+        # The backend that actually loaded; a failed TorchScript load falls back to eager
+        "base_backend": "torchscript" if isinstance(base_model, CompiledWhisper) else "whisper"
+    }
+    if country in COUNTRY_MODELS:
+        settings["model"] = {
+            key: COUNTRY_MODELS[country].get(key)
+            for key in ("type", "language", "precision", "draft_model_id", "backend")
+        }
+    return settings
+
+def cached_result(key: str):
+    """Result cache lookup, counted by the tier that answered"""
+    value, tier = result_cache.lookup(key)
+    RESULT_CACHE_LOOKUPS.inc(tier=tier)
+    return value
+
+def cascade_order(country: str) -> list:
+    """Models in the order the cascade tries them for this country"""
+    if COUNTRY_MODELS[country].get("cascade_order", "base_first") == "country_first":
+        return ["fine_tuned", "base"]
+    return ["base", "fine_tuned"]
+
+def should_route(country: str, route: bool = None) -> bool:
+    """Whether the spoken language picks the country model (see ROUTE_LANGUAGE)"""
+    route_mode = ROUTE_LANGUAGE if route is None else ("always" if route else "off")
+    return route_mode == "always" or (route_mode == "missing" and country not in COUNTRY_MODELS)
+
+async def process_transcription(audio: np.ndarray, country: str, base_ticket: dict = None,
+                                fine_tuned_ticket: dict = None, cascade: bool = None,
+                                deadline: Deadline = None, timer: StageTimer = None,
+                                route: bool = None, admit=None) -> dict:
+    """
+    Run one decoded clip through the cache, VAD, denoiser and the models.
+
+    Normally the base and country models run side by side. In cascade mode
+    they run one after the other in the country's cascade_order, and the
+    second only when the first result isn't confident. With a deadline,
+    whatever has finished when it passes is returned and the rest abandoned.
+    Stage timings are added to `timer` when one is given.
+
+    When the request is routed (see ROUTE_LANGUAGE, or `route` to force it
+    on or off), the base model's language ID picks the country first; a
+    confident route runs only that country's model, admitted to its queue
+    with the async `admit(worker_name)` callback. If that queue is full by
+    then, the request is answered as if the route were unsure rather than
+    throwing away the decode and language ID.
+    """
+    cascade = CASCADE_ENABLED if cascade is None else cascade
+    timer = timer or StageTimer()
+    # Repeated uploads of the same audio are answered from the result cache
+    audio_digest = ResultCache.audio_digest(audio)
+    keys = {
+        "route": result_cache.key(audio_digest, f"{BASE_MODEL_ID}#language", pipeline_settings()),
+        "base": result_cache.key(audio_digest, BASE_MODEL_ID, pipeline_settings()),
+        "fine_tuned": result_cache.key(
+            audio_digest, COUNTRY_MODELS[country]["model_id"], pipeline_settings(country)
+        ) if country in COUNTRY_MODELS else None
+    }
+    results = {"base": None, "fine_tuned": None}
+    cache_info = {"base_model": None, "fine_tuned_model": None}
+    state = {"prepared": False, "features": None, "vad": None, "denoise": {"metrics": None}}
+    unfinished = []
+
+    async def prepare():
+        """VAD, denoising and chunking, done once however many models run; None without speech"""
+        if state["prepared"]:
+            return state["features"]
+        clip = audio
+
+        # Trim leading/trailing silence and long pauses before any heavy work
+        noise = None
+        if VAD_ENABLED:
+            with timer.stage("vad"):
+                vad_result = state["vad"] = await asyncio.to_thread(detect_speech, clip, TARGET_SAMPLE_RATE)
+            regions = vad_result["regions"]
+            logger.debug("VAD: %.2fs of speech in %.2fs, regions: %s",
+                         vad_result["speech_seconds"], vad_result["total_seconds"], regions)
+            if not regions:
+                logger.debug("No speech detected, skipping denoising and transcription")
+                state["prepared"] = True
+                return None
+            # Non-speech audio gives the denoiser a clean noise profile
+            noise = noise_sample(clip, regions, int(VAD_NOISE_SAMPLE_SECONDS * TARGET_SAMPLE_RATE))
+            clip = compact(clip, regions, int(VAD_REGION_GAP_SECONDS * TARGET_SAMPLE_RATE))
+
+        # First denoise the audio
+        with timer.stage("denoise"):
+            denoised_result = state["denoise"] = await audio_denoiser.denoise(clip, noise)
+        denoised_audio = denoised_result["audio"]
+        logger.debug("Noise reduction metrics: %s", denoised_result["metrics"])
+
+        # Split long clips to fit the 30 s window; every model decodes the
+        # same chunks and shares their log-mel features when configs match
+        chunks = split_audio(denoised_audio, TARGET_SAMPLE_RATE, CHUNK_MAX_SECONDS, CHUNK_OVERLAP_SECONDS)
+        state["features"] = SharedFeatures(denoised_audio, chunks, deadline, timer)
+        state["prepared"] = True
+        return state["features"]
+
+    async def run(names: list):
+        """Fill in results for these models, from the cache or by transcribing"""
+        pending = []
+        for name in names:
+            cached = cached_result(keys[name])
+            if isinstance(cached, str):
+                cached = {"text": cached, "confidence": None}  # entry from before confidences were kept
+            cache_info[f"{name}_model"] = "hit" if cached is not None else "miss"
+            if cached is not None:
+                results[name] = cached
+            else:
+                pending.append(name)
+        if not pending:
+            return
+
+        if deadline is not None and deadline.expired():
+            logger.warning("Deadline reached, not starting %s model(s)", ", ".join(pending))
+            unfinished.extend(pending)
+            return
+        try:
+            features = await asyncio.wait_for(prepare(), deadline.remaining() if deadline else None)
+        except asyncio.TimeoutError:
+            logger.warning("Deadline reached while preparing the audio")
+            unfinished.extend(pending)
+            return
+
+        if features is None:
+            for name in pending:
+                results[name] = {"text": "", "confidence": None}
+        else:
+            # Create tasks for the models whose results aren't cached
+            logger.debug("Starting transcription with %s model(s)", ", ".join(pending))
+            tasks = {
+                "base": lambda: transcribe_with_base_model(features, base_ticket),
+                "fine_tuned": lambda: transcribe_with_fine_tuned_model(features, country, fine_tuned_ticket)
+            }
+            running = {name: asyncio.create_task(tasks[name]()) for name in pending}
+
+            # Run the tasks in parallel, waiting no longer than the deadline allows
+            done, _ = await asyncio.wait(running.values(), timeout=deadline.remaining() if deadline else None)
+            for name, task in running.items():
+                if task in done:
+                    results[name] = task.result()
+                else:
+                    # Queued work is dropped and generation stops at the deadline,
+                    # so an abandoned model doesn't hold up requests behind it
+                    logger.warning("Deadline reached, abandoning %s model", name)
+                    task.cancel()
+                    unfinished.append(name)
+            logger.debug("Log-mel features: %d computed, %d reused", features.computed, features.reused)
+
+        # Failed transcriptions are not cached so a retry runs them again
+        for name in pending:
+            result = results[name]
+            if result is not None and result["text"] != BASE_MODEL_FAILED:
+                result_cache.put(keys[name], result)
+
+    async def detect_language():
+        """Language ID distribution for the clip ({} without speech, None past the deadline)"""
+        cached = cached_result(keys["route"])
+        if cached is not None:
+            return cached
+        if deadline is not None and deadline.expired():
+            return None
+        try:
+            features = await asyncio.wait_for(prepare(), deadline.remaining() if deadline else None)
+        except asyncio.TimeoutError:
+            logger.warning("Deadline reached while preparing the audio")
+            return None
+        if features is None:
+            return {}
+        worker = inference_pool.worker(BASE_MODEL_WORKER)
+        language_probs = await worker.run(_detect_language, features, tickets=[base_ticket] if base_ticket else None)
+        result_cache.put(keys["route"], language_probs)
+        return language_probs
+
+    routing = None
+    if should_route(country, route):
+        requested_country = country
+        language_probs = await detect_language()
+        routing = choose_country(
+            language_probs or {},
+            {name: route_languages(config) for name, config in COUNTRY_MODELS.items()},
+            ROUTE_CONFIDENCE_THRESHOLD
+        )
+        queue_full = False
+        if routing["confident"] and routing["country"] != country:
+            try:
+                routed_ticket = await admit(routing["country"]) if admit else None
+            except QueueFullError as e:
+                logger.warning("Not routing to %s: %s", routing["country"], e)
+                queue_full = True
+                routing["confident"] = False
+            else:
+                country = routing["country"]
+                fine_tuned_ticket = routed_ticket
+                keys["fine_tuned"] = result_cache.key(
+                    audio_digest, COUNTRY_MODELS[country]["model_id"], pipeline_settings(country)
+                )
+        routing.update(requested_country=requested_country, skipped_base=routing["confident"], queue_full=queue_full)
+        ROUTES.inc(
+            outcome="routed" if routing["confident"] else "queue_full" if queue_full
+            else "no_speech" if language_probs == {} else "unsure",
+            country=routing["country"] or ""
+        )
+        logger.debug("Routing: %s (%.2f) -> %s", routing["language"], routing["confidence"], routing["country"])
+
+    cascade_info = None
+    if routing is not None and routing["confident"]:
+        await run(["fine_tuned"])
+        if results["fine_tuned"] is None and "fine_tuned" not in unfinished:
+            logger.warning("Routed %s model failed, falling back to the base model", country)
+            await run(["base"])
+    elif not cascade or keys["fine_tuned"] is None:
+        await run([name for name in ("base", "fine_tuned") if keys[name]])
+    else:
+        first, second = cascade_order(country)
+        await run([first])
+        if first in unfinished:
+            confident, reason = False, "deadline reached"
+        elif state["prepared"] and state["features"] is None:
+            confident, reason = True, "no speech detected"
+        else:
+            confident, reason = confidence.assess(
+                (results[first] or {}).get("confidence"),
+                logprob_threshold=CASCADE_LOGPROB_THRESHOLD,
+                no_speech_threshold=CASCADE_NO_SPEECH_THRESHOLD,
+                compression_ratio_threshold=CASCADE_COMPRESSION_RATIO_THRESHOLD,
+                # The base model detects the language itself; trust it only when it hears the country's one
+                language=language_code(COUNTRY_MODELS[country]["language"]) if first == "base" else None
+            )
+        logger.debug("Cascade: %s model %s (%s)", first, "confident" if confident else "not confident", reason)
+        if not confident:
+            await run([second])
+        cascade_info = {
+            "order": [f"{first}_model", f"{second}_model"],
+            "path": [f"{name}_model" for name in (first, second) if results[name] is not None],
+            "escalated": not confident,
+            "reason": reason
+        }
+
+    if not state["prepared"]:
+        logger.debug("All results served from cache, skipping denoising and transcription")
+
+    for model, ticket in (("base", base_ticket), (country, fine_tuned_ticket)):
+        timer.add("queue_wait", queue_wait(ticket), model)
+        timer.add("inference", inference_time(ticket), model)
+
+    base_result = results["base"] or {}
+    fine_tuned_result = results["fine_tuned"] or {}
+    vad_result = state["vad"]
+    return {
+        "base_model": {
+            "text": base_result.get("text"),
+            "model": "whisper-base",
+            "confidence": base_result.get("confidence")
+        },
+        "fine_tuned_model": {
+            "text": fine_tuned_result["text"],
+            "model_name": COUNTRY_MODELS[country]["name"],
+            "model_id": COUNTRY_MODELS[country]["model_id"],
+            "language": COUNTRY_MODELS[country]["language"],
+            "confidence": fine_tuned_result.get("confidence")
+        } if fine_tuned_result.get("text") and country in COUNTRY_MODELS else None,
+        "country": country,
+        "routing": routing,
+        "noise_reduction_metrics": state["denoise"]["metrics"],
+        "vad": {
+            "speech_detected": bool(vad_result["regions"]),
+            "speech_seconds": vad_result["speech_seconds"],
+            "total_seconds": vad_result["total_seconds"],
+            "trimmed_seconds": vad_result["total_seconds"] - vad_result["speech_seconds"],
+            "regions": [
+                [start / TARGET_SAMPLE_RATE, end / TARGET_SAMPLE_RATE]
+                for start, end in vad_result["regions"]
+            ]
+        } if vad_result is not None else None,
+        "cascade": cascade_info,
+        "deadline": {
+            "budget_ms": deadline.seconds * 1000,
+            "met": not unfinished,
+            "unfinished": [f"{name}_model" for name in unfinished]
+        } if deadline else None,
+        "cache": dict(cache_info, stats=result_cache.stats()),
+        "queue": {
+            "base_model": {
+                "depth_at_admission": base_ticket["depth"],
+                "wait_seconds": queue_wait(base_ticket)
+            } if base_ticket else None,
+            "fine_tuned_model": {
+                "depth_at_admission": fine_tuned_ticket["depth"],
+                "wait_seconds": queue_wait(fine_tuned_ticket)
+            } if fine_tuned_ticket else None
+        }
+    }
 
 @app.post("/transcribe/")
 async def transcribe_audio(
+    request: Request,
     file: UploadFile = File(...),
-    country: str = Form(None)
+    country: str = Form(None),
+    cascade: bool = Form(None),
+    deadline_ms: float = Form(None),
+    x_deadline_ms: float = Header(None),
+    timings: bool = Form(False),
+    route: bool = Form(None)
 ):
+    """
+    Transcribe an upload with the base model and the country's model.
+    An optional latency budget (form field deadline_ms or header
+    X-Deadline-Ms), counted from when the request arrived, returns
+    whatever has finished by then, and timings=true adds a per-stage
+    timing breakdown to the response.
+    Without a known country the spoken language picks the country model;
+    route=true does that for every request, route=false never.
+    """
+    admission = ExitStack()
+    timer = StageTimer()
     try:
-        print("\n=== Received Request ===")
-        print(f"Country: '{country}'")
+        logger.debug("Received request for country '%s'", country)
         start_time = time.time()
+        budget_ms = deadline_ms or x_deadline_ms
+        deadline = Deadline(budget_ms / 1000, started_at=request.state.arrived_at) if budget_ms else None
 
-        # Save uploaded file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.m4a') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-            print(f"File saved at: {temp_path}")
-
-        # First denoise the audio
-        print("Starting denoising process...")
-        denoiser = AudioDenoiser(sample_rate=48000)
-        denoised_result = await denoiser.process_audio(temp_path)
-        denoised_path = denoised_result["output_path"]
-        
-        print(f"Audio denoised. Starting transcription...")
-        print(f"Noise reduction metrics: {denoised_result['metrics']}")
-
-        # Create tasks for both models using denoised audio
-        print("Starting parallel transcription...")
-        base_task = asyncio.create_task(transcribe_with_base_model(denoised_path))
-        fine_tuned_task = asyncio.create_task(
-            transcribe_with_fine_tuned_model(denoised_path, country)
+        # Reserve inference queue slots up front so an overloaded model is
+        # rejected before we spend any time decoding or denoising
+        base_ticket = admission.enter_context(inference_pool.worker(BASE_MODEL_WORKER).admit())
+        fine_tuned_ticket = admission.enter_context(
+            inference_pool.worker(country).admit()
         ) if country in COUNTRY_MODELS else None
+        if should_route(country, route):
+            # A routed request needs room on whichever country model language
+            # ID picks; with every one of them full, reject it now
+            workers = [inference_pool.worker(name) for name in COUNTRY_MODELS]
+            if not any(worker.has_room() for worker in workers):
+                raise QueueFullError(workers[0].name, workers[0].depth)
 
-        # Run both tasks in parallel
-        if fine_tuned_task:
-            base_result, fine_tuned_result = await asyncio.gather(base_task, fine_tuned_task)
-        else:
-            base_result = await base_task
-            fine_tuned_result = None
+        # Stream the upload straight into a 16 kHz float32 buffer
+        with timer.stage("decode"):
+            audio = await decode_audio(upload_chunks(file, MAX_UPLOAD_BYTES))
+        logger.debug("Decoded audio: %d samples at %dHz", len(audio), TARGET_SAMPLE_RATE)
 
-        # Clean up temporary files
-        for path in [temp_path, denoised_path]:
-            if path and os.path.exists(path):
-                os.unlink(path)
-                print(f"Removed temporary file: {path}")
+        async def admit(worker_name: str) -> dict:
+            return admission.enter_context(inference_pool.worker(worker_name).admit())
+
+        response_data = await process_transcription(
+            audio, country, base_ticket, fine_tuned_ticket, cascade, deadline, timer, route, admit
+        )
 
         # Calculate elapsed time
         elapsed_time = time.time() - start_time
+        response_data["processing_time"] = f"{elapsed_time:.2f} seconds"
+        timer.add("total", timer.elapsed())
+        observe_timings(timer)
+        if timings:
+            response_data["timings"] = timer.report()
+        REQUESTS.inc(endpoint="transcribe", status="ok")
 
-        response_data = {
-            "base_model": {
-                "text": base_result,
-                "model": "whisper-base"
-            },
-            "fine_tuned_model": {
-                "text": fine_tuned_result,
-                "model_name": COUNTRY_MODELS[country]["name"],
-                "model_id": COUNTRY_MODELS[country]["model_id"],
-                "language": COUNTRY_MODELS[country]["language"]
-            } if fine_tuned_result and country in COUNTRY_MODELS else None,
-            "country": country,
-            "processing_time": f"{elapsed_time:.2f} seconds",
-            "noise_reduction_metrics": denoised_result["metrics"]
-        }
-        
-        print("\n=== Response Data ===")
-        print(f"Base Model Result: {base_result}")
-        print(f"Fine-tuned Model Result: {fine_tuned_result}")
-        print(f"Country: {country}")
-        print(f"Total processing time: {elapsed_time:.2f} seconds")
+        logger.info("Transcribed %s request in %.2f seconds (cache: base %s, fine-tuned %s)",
+                    response_data["country"], elapsed_time, response_data["cache"]["base_model"],
+                    response_data["cache"]["fine_tuned_model"])
+        logger.debug("Base model result: %s", response_data["base_model"]["text"])
+        logger.debug("Fine-tuned model result: %s", (response_data["fine_tuned_model"] or {}).get("text"))
         
         return JSONResponse(
             content=jsonable_encoder(response_data),
             headers={"Content-Type": "application/json; charset=utf-8"}
         )
 
+    except QueueFullError as e:
+        logger.warning("Rejecting request: %s", e)
+        REQUESTS.inc(endpoint="transcribe", status="rejected")
+        return JSONResponse(
+            status_code=429,
+            content={"error": str(e), "queue": e.worker_name, "queue_depth": e.depth},
+            headers={"Retry-After": "1"}
+        )
+
+    except UploadTooLargeError as e:
+        logger.warning("Rejecting upload: %s", e)
+        REQUESTS.inc(endpoint="transcribe", status="too_large")
+        return JSONResponse(status_code=413, content={"error": str(e)})
+
     except Exception as e:
-        print(f"\nError in transcribe_audio: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Clean up in case of error
-        if 'temp_path' in locals() and temp_path and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        if 'denoised_path' in locals() and denoised_path and os.path.exists(denoised_path):
-            os.unlink(denoised_path)
-            
+        logger.exception("Error in transcribe_audio: %s", e)
+        REQUESTS.inc(endpoint="transcribe", status="error")
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
 
-async def transcribe_with_fine_tuned_model(file_path: str, country: str):
+    finally:
+        # Free the queue slots once both models are done with this request
+        admission.close()
+
+async def transcribe_with_fine_tuned_model(features: SharedFeatures, country: str, ticket: dict = None):
     try:
-        if country not in model_handlers:
-            print(f"No model handler found for country: {country}")
+        if country not in COUNTRY_MODELS:
+            logger.warning("No model handler found for country: %s", country)
             return None
         
-        handler = model_handlers[country]
-        if handler is None:
-            print(f"Model handler is None for country: {country}")
-            return None
-            
-        result = await handler.transcribe(file_path)
+        async with model_registry.use(country) as handler:
+            result = await handler.transcribe(features, ticket)
         if result is None:
-            print(f"Transcription failed for {country}")
+            logger.warning("Transcription failed for %s", country)
             return None
             
         return result
         
     except Exception as e:
-        print(f"Error in fine-tuned transcription: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in fine-tuned transcription: %s", e)
         return None
 
+async def decode_audio(data, sample_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Decode an uploaded audio file (bytes, or an async iterator of chunks
+    fed to ffmpeg as they arrive) into a mono float32 buffer without
+    touching disk"""
+    return await decode_stream(data, sample_rate, MAX_AUDIO_SECONDS)
+
+async def admit_when_free(admission: ExitStack, worker_name: str) -> dict:
+    """Queue slot for a bulk item; bulk work waits for room instead of taking a 429"""
+    return admission.enter_context(await inference_pool.worker(worker_name).wait_admit())
+
+async def transcribe_bulk_item(item, audio: np.ndarray, decode_seconds: float,
+                               cascade: bool = None, timings: bool = False, route: bool = None) -> dict:
+    """One NDJSON line for a decoded bulk item; failures become an error line"""
+    timer = StageTimer()
+    timer.add("decode", decode_seconds)
+    admission = ExitStack()
+    try:
+        base_ticket = await admit_when_free(admission, BASE_MODEL_WORKER)
+        fine_tuned_ticket = await admit_when_free(admission, item.country) if item.country in COUNTRY_MODELS else None
+        result = await process_transcription(
+            audio, item.country, base_ticket, fine_tuned_ticket, cascade, timer=timer,
+            route=route, admit=lambda worker_name: admit_when_free(admission, worker_name)
+        )
+        timer.add("total", timer.elapsed() + decode_seconds)
+        observe_timings(timer)
+        if timings:
+            result["timings"] = timer.report()
+        REQUESTS.inc(endpoint="batch", status="ok")
+        return {
+            "index": item.index,
+            "file": item.name,
+            "country": item.country,
+            "status": "ok",
+            "audio_seconds": len(audio) / TARGET_SAMPLE_RATE,
+            "result": result
+        }
+    except Exception as e:
+        logger.exception("Error transcribing bulk item %s: %s", item.name, e)
+        return bulk_error(item, e)
+    finally:
+        admission.close()
+
+def bulk_error(item, error: Exception) -> dict:
+    REQUESTS.inc(endpoint="batch", status="error")
+    return {"index": item.index, "file": item.name, "country": item.country, "status": "error", "error": str(error)}
+
+async def bulk_results(items: list, cascade: bool = None, timings: bool = False, route: bool = None):
+    """NDJSON lines for every item, in the order they finish, then a summary line"""
+    start_time = time.perf_counter()
+    ready = asyncio.Queue(maxsize=BULK_SORT_WINDOW)  # decoded items awaiting transcription
+    finished = asyncio.Queue()
+    decode_slots = asyncio.Semaphore(BULK_DECODE_CONCURRENCY)
+
+    async def decode(item):
+        if item.read is None:
+            raise FileNotFoundError(f"{item.name} is listed in the manifest but was not uploaded")
+        async with decode_slots:
+            started_at = time.perf_counter()
+            # Archive members decompress as they are read; keep that off the event loop
+            audio = await decode_audio(await asyncio.to_thread(item.read))
+            return audio, time.perf_counter() - started_at
+
+    async def produce():
+        for start in range(0, len(items), BULK_SORT_WINDOW):
+            window = items[start:start + BULK_SORT_WINDOW]
+            decoded = await asyncio.gather(*[decode(item) for item in window], return_exceptions=True)
+            usable = []
+            for item, outcome in zip(window, decoded):
+                if isinstance(outcome, Exception):
+                    await finished.put(bulk_error(item, outcome))
+                else:
+                    usable.append((item, *outcome))
+            # Longest first: the slow clips start early and neighbours batch well
+            for entry in sorted(usable, key=lambda entry: len(entry[1]), reverse=True):
+                await ready.put(entry)
+        for _ in range(BULK_CONCURRENCY):
+            await ready.put(None)
+
+    async def consume():
+        while (entry := await ready.get()) is not None:
+            await finished.put(await transcribe_bulk_item(*entry, cascade=cascade, timings=timings, route=route))
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(BULK_CONCURRENCY)]
+    failed = 0
+    try:
+        for _ in items:
+            line = await finished.get()
+            failed += line["status"] == "error"
+            yield json.dumps(jsonable_encoder(line), ensure_ascii=False) + "\n"
+        yield json.dumps({"summary": {
+            "items": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "seconds": time.perf_counter() - start_time
+        }}) + "\n"
+    finally:
+        # Also stops the work when the client goes away mid-stream
+        for task in tasks:
+            task.cancel()
+
+@app.post("/transcribe/batch/")
+async def transcribe_batch(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    manifest: str = Form(None),
+    country: str = Form(None),
+    cascade: bool = Form(None),
+    timings: bool = Form(False),
+    route: bool = Form(None)
+):
+    """
+    Transcribe many clips in one request: any number of `files`, and/or a zip
+    or tar `archive`. A JSON `manifest` can pick the files and give each its
+    own country; `country` is the default. Results stream back as NDJSON, one
+    line per clip as it finishes, and a clip that fails gets an error line
+    without stopping the rest. Clips without a known country are routed by
+    their language, as in /transcribe/.
+    """
+    try:
+        uploads = [(upload.filename, reader(upload.file)) for upload in files or []]
+        if archive is not None:
+            uploads += await asyncio.to_thread(
+                archive_members, archive.filename, archive.file,
+                max_member_bytes=MAX_UPLOAD_BYTES, max_total_bytes=MAX_BULK_UPLOAD_BYTES
+            )
+        items = collect_items(uploads, manifest, country)
+    except UploadTooLargeError as e:
+        REQUESTS.inc(endpoint="batch", status="too_large")
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not items:
+        return JSONResponse(status_code=400, content={"error": "No audio files in the request"})
+
+    logger.info("Bulk request with %d item(s)", len(items))
+    return StreamingResponse(bulk_results(items, cascade, timings, route), media_type="application/x-ndjson")
+
+@app.websocket("/ws/transcribe")
+async def stream_transcription(websocket: WebSocket, country: str = None, format: str = "pcm16", denoise: bool = False):
+    """
+    Streaming transcription with incremental results.
+    Send binary audio chunks, either raw 16 kHz mono 16-bit PCM (format=pcm16)
+    or any ffmpeg-readable stream such as Ogg/WebM Opus (format=opus), then a
+    text message {"event": "end"}. With denoise=true the audio is denoised
+    as it arrives. The server replies with
+    {"type": "partial", ...} messages while audio arrives and a
+    {"type": "final", ...} message once the stream ends.
+    """
+    await websocket.accept()
+    if country not in COUNTRY_MODELS:
+        await websocket.send_json({"type": "error", "error": f"Unsupported country: {country}"})
+        await websocket.close(code=1008)
+        return
+
+    logger.info("Streaming session (%s, %s, denoise=%s)", country, format, denoise)
+    decoder = None
+    try:
+        async with model_registry.use(country) as handler:
+            session = StreamingSession(
+                handler.processor.feature_extractor,
+                sample_rate=TARGET_SAMPLE_RATE,
+                step_seconds=STREAM_STEP_SECONDS,
+                max_window_seconds=STREAM_WINDOW_SECONDS,
+                denoiser=audio_denoiser.stream() if denoise else None
+            )
+
+            async def decode_window(final: bool = False):
+                start, end, completes_window = session.next_window()
+                features = session.features.window_features(start, end)
+                if final or completes_window:
+                    # Committed text must be produced even when the model is busy
+                    text = (await handler.worker.run(handler.decode_features, features))[0]
+                    session.commit(end, text)
+                    return
+                try:
+                    # Partials are best-effort; skip them while the model is overloaded
+                    with handler.worker.admit() as ticket:
+                        text = (await handler.worker.run(handler.decode_features, features, tickets=[ticket]))[0]
+                except QueueFullError:
+                    return
+                session.mark_decoded(end)
+                await websocket.send_json({
+                    "type": "partial",
+                    "text": session.running_text(text),
+                    "stable_text": session.committed_text,
+                    "audio_seconds": end / TARGET_SAMPLE_RATE
+                })
+
+            if format != "pcm16":
+                decoder = StreamingDecoder(session.append, sample_rate=TARGET_SAMPLE_RATE)
+                await decoder.start()
+
+            decode_task = None
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+
+                if message.get("bytes"):
+                    if decoder:
+                        await decoder.feed(message["bytes"])
+                    else:
+                        session.append_pcm16(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("event") == "end":
+                    break
+
+                # Only one decode in flight; the next one picks up all audio received meanwhile
+                if (decode_task is None or decode_task.done()) and session.has_new_audio():
+                    if decode_task is not None:
+                        decode_task.result()
+                    decode_task = asyncio.create_task(decode_window())
+
+            if decoder:
+                await decoder.close()
+            session.flush()
+            if decode_task is not None:
+                await decode_task
+            while session.has_new_audio(final=True):
+                await decode_window(final=True)
+
+            logger.debug("Streaming transcription: %s", session.committed_text)
+            await websocket.send_json({
+                "type": "final",
+                "text": session.committed_text,
+                "audio_seconds": session.received / TARGET_SAMPLE_RATE,
+                "model_id": COUNTRY_MODELS[country]["model_id"]
+            })
+            await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.info("Streaming client disconnected")
+    except Exception as e:
+        logger.exception("Error in streaming transcription: %s", e)
+        try:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        if decoder:
+            decoder.kill()
+
 class AudioDenoiser:
-    def __init__(self, sample_rate: int = 48000):
+    """
+    Long-lived spectral-gating denoiser.
+
+    Concurrent requests are gathered by a MicroBatcher and denoised together
+    in vectorised passes on the worker's thread. With an `executor` a batch
+    is split across its threads, so denoising never uses more cores than
+    that executor has however many requests arrive.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, worker=None, executor: ThreadPoolExecutor = None):
         self.sample_rate = sample_rate
-        print(f"Noise reduction initialized with {sample_rate}Hz sample rate")
+        self.gate = SpectralGate(sample_rate=sample_rate)
+        self.executor = executor
+        self.batcher = MicroBatcher(
+            self._reduce_batch,
+            max_batch_size=DENOISE_BATCH_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            name=f"denoiser-{sample_rate}",
+            worker=worker
+        )
+        logger.info("Noise reduction initialized with %dHz sample rate", sample_rate)
 
-    async def process_audio(self, file_path: str, output_format: str = 'wav') -> dict:
-        try:
-            print("\n=== Starting Audio Processing ===")
-            print(f"Input file: {file_path}")
+    def _reduce_batch(self, items: list) -> list:
+        if self.executor is None or len(items) < 2:
+            return self.gate.reduce_batch(items)
 
-            # Create new temporary WAV file path
-            temp_dir = os.path.dirname(file_path)
-            wav_path = os.path.join(temp_dir, f'temp_{os.path.basename(file_path)}_{int(time.time())}.wav')
-            print("Converting to WAV...")
-            
-            result = subprocess.run([
-                'ffmpeg',
-                '-i', file_path,        # Input file
-                '-acodec', 'pcm_s16le', # Convert to PCM 16-bit
-                '-ar', str(self.sample_rate),  # Set sample rate
-                '-ac', '1',             # Convert to mono
-                wav_path               # Output to new temporary file
-            ], capture_output=True, text=True)
-
-            if result.returncode != 0:
-                raise Exception(f"FFmpeg conversion failed: {result.stderr}")
-
-            # Load and validate converted WAV
-            audio, sample_rate = sf.read(wav_path, dtype='float32')
-            
-            # Check if audio has any content
-            if len(audio) == 0:
-                raise ValueError("Empty audio file")
-                
-            # Check if audio has any non-zero values
-            if np.all(audio == 0):
-                raise ValueError("Audio file contains only zeros")
-                
-            print(f"Raw audio shape: {audio.shape}")
-            print(f"Raw audio range: {audio.min():.4f} to {audio.max():.4f}")
-            
-            # Ensure mono
-            if len(audio.shape) > 1:
-                audio = audio.mean(axis=1)
-                print("Converted stereo to mono")
-
-            # Apply noise reduction
-            print("Applying noise reduction...")
-            denoised_audio = nr.reduce_noise(
-                y=audio,
-                sr=sample_rate,
-                stationary=True,
-                prop_decrease=0.75,
-                freq_mask_smooth_hz=100,
-                n_jobs=-1
-            )
-            
-            # Calculate metrics
-            original_rms = np.sqrt(np.mean(audio**2))
-            denoised_rms = np.sqrt(np.mean(denoised_audio**2))
-            noise_reduction = original_rms - denoised_rms
-            
-            # Save output
-            output_path = wav_path.replace('.wav', '_denoised.wav')
-            sf.write(output_path, denoised_audio, sample_rate)
+        # Clips of similar length share a slice, so little of it is padding
+        order = sorted(range(len(items)), key=lambda i: len(items[i][0]))
+        parts = [list(part) for part in np.array_split(order, min(len(items), DENOISE_THREADS))]
+        reduced = self.executor.map(self.gate.reduce_batch, [[items[i] for i in part] for part in parts])
+        results = [None] * len(items)
+        for part, part_results in zip(parts, reduced):
+            for i, result in zip(part, part_results):
+                results[i] = result
+        return results
+
+    def _validate(self, audio: np.ndarray, noise: np.ndarray = None):
+        # Check if audio has any content
+        if len(audio) == 0:
+            raise ValueError("Empty audio file")
             
-            print("\n=== Processing Complete ===")
-            print(f"Saved to: {output_path}")
-            print(f"Original RMS: {original_rms:.4f}")
-            print(f"Denoised RMS: {denoised_rms:.4f}")
-            print(f"Noise Reduction: {noise_reduction:.4f}")
-
-            # Clean up intermediate WAV file
-            if os.path.exists(wav_path):
-                os.unlink(wav_path)
+        # Check if audio has any non-zero values
+        if np.all(audio == 0):
+            raise ValueError("Audio file contains only zeros")
             
-            return {
-                "output_path": output_path,
-                "metrics": {
-                    "original_rms": float(original_rms),
-                    "denoised_rms": float(denoised_rms),
-                    "noise_reduction": float(noise_reduction)
-                }
-            }
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw audio shape: %s, range: %.4f to %.4f", audio.shape, audio.min(), audio.max())
 
+        # Only trust a noise sample long enough to estimate a spectrum from
+        if noise is not None and len(noise) < self.sample_rate // 2:
+            noise = None
+        return noise
+
+    async def denoise(self, audio: np.ndarray, noise: np.ndarray = None) -> dict:
+        """Denoise an already-decoded mono buffer sampled at self.sample_rate,
+        optionally using a known noise-only sample for the noise profile"""
+        try:
+            noise = self._validate(audio, noise)
+            result = await self.batcher.submit((audio.astype(np.float32, copy=False), noise))
+            logger.debug("Original RMS: %.4f, denoised RMS: %.4f",
+                         result["metrics"]["original_rms"], result["metrics"]["denoised_rms"])
+            return result
         except Exception as e:
-            # Clean up any temporary files
-            for path in [wav_path]:
-                if 'wav_path' in locals() and os.path.exists(path):
-                    os.unlink(path)
-            
-            print(f"Error in audio processing: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in audio processing: %s", e)
             raise
 
+    def stream(self, noise: np.ndarray = None) -> StreamingDenoiser:
+        """Denoiser for audio that arrives incrementally, e.g. a WebSocket stream"""
+        return self.gate.stream(noise)
+
+# One denoiser at the model rate for transcription and one at 48 kHz for
+# /denoise/ output; both share the denoise thread and, with DENOISE_THREADS
+# above 1, the threads its batches are split across
+denoise_executor = ThreadPoolExecutor(
+    max_workers=DENOISE_THREADS,
+    thread_name_prefix="denoise",
+    initializer=thread_plan.initializer(DENOISE_WORKER)
+) if DENOISE_THREADS > 1 else None
+audio_denoiser = AudioDenoiser(TARGET_SAMPLE_RATE, worker=inference_pool.worker(DENOISE_WORKER), executor=denoise_executor)
+output_denoiser = AudioDenoiser(48000, worker=inference_pool.worker(DENOISE_WORKER), executor=denoise_executor)
+
 @app.post("/denoise/")
-async def denoise_audio(file: UploadFile = File(...)):
+async def denoise_audio(file: UploadFile = File(...), format: str = Form("wav")):
     """
-    Endpoint to denoise audio using noisereduce.
-    Accepts M4A files, converts to WAV, and returns denoised WAV.
+    Endpoint to denoise audio with spectral gating.
+    Accepts any ffmpeg-readable upload and streams the denoised 48 kHz audio
+    back as 16-bit WAV, FLAC or Ogg Opus (format=wav|flac|opus).
     """
-    temp_path = None
-    wav_path = None
-    denoised_path = None
-    
+    if format not in OUTPUT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"Unsupported format '{format}', expected one of {list(OUTPUT_FORMATS)}"})
+
     try:
-        print("\n=== Received Audio File ===")
-        print(f"Filename: {file.filename}")
-        print(f"Content type: {file.content_type}")
-
-        # Create temp directory to store files
-        temp_dir = tempfile.mkdtemp()
-        print(f"Created temp directory: {temp_dir}")
-
-        # Save original M4A file
-        temp_path = os.path.join(temp_dir, 'input.m4a')
-        content = await file.read()
-        with open(temp_path, 'wb') as f:
-            f.write(content)
-        print(f"Saved original file: {temp_path}")
-
-        # Convert M4A to WAV
-        wav_path = os.path.join(temp_dir, 'converted.wav')
-        print("Converting to WAV...")
-        
-        result = subprocess.run([
-            'ffmpeg',
-            '-i', temp_path,
-            '-acodec', 'pcm_s16le',
-            '-ar', '48000',
-            '-ac', '1',
-            '-y',
-            wav_path
-        ], capture_output=True, text=True)
-
-        if result.returncode != 0:
-            raise Exception(f"FFmpeg conversion failed: {result.stderr}")
-
-        # Process WAV file
-        denoiser = AudioDenoiser(sample_rate=48000)
-        result = await denoiser.process_audio(wav_path)
-        denoised_path = result["output_path"]
-        
-        if not os.path.exists(denoised_path):
-            raise Exception("Denoising failed to create output file")
-
-        # Create response
-        response = FileResponse(
-            denoised_path,
-            media_type='audio/wav',
-            headers={
-                "X-Original-RMS": str(result["metrics"]["original_rms"]),
-                "X-Denoised-RMS": str(result["metrics"]["denoised_rms"]),
-                "X-Noise-Reduction": str(result["metrics"]["noise_reduction"])
-            }
+        logger.debug("Received audio file %s (%s)", file.filename, file.content_type)
+
+        # One conversion, straight from the upload to 48 kHz float32 samples
+        audio = await decode_audio(upload_chunks(file, MAX_UPLOAD_BYTES), output_denoiser.sample_rate)
+        result = await output_denoiser.denoise(audio)
+        del audio
+
+        headers = {
+            "X-Original-RMS": str(float(result["metrics"]["original_rms"])),
+            "X-Denoised-RMS": str(float(result["metrics"]["denoised_rms"])),
+            "X-Noise-Reduction": str(float(result["metrics"]["noise_reduction"]))
+        }
+        size = encoded_size(result["audio"], format)
+        if size is not None:
+            headers["Content-Length"] = str(size)
+
+        REQUESTS.inc(endpoint="denoise", status="ok")
+        return StreamingResponse(
+            encode_stream(result["audio"], output_denoiser.sample_rate, format),
+            media_type=OUTPUT_FORMATS[format][0],
+            headers=headers
         )
 
-        # Use BackgroundTask for cleanup
-        def cleanup():
-            try:
-                for path in [temp_path, wav_path, denoised_path]:
-                    if path and os.path.exists(path):
-                        os.unlink(path)
-                if os.path.exists(temp_dir):
-                    os.rmdir(temp_dir)
-                print("Cleanup completed")
-            except Exception as e:
-                print(f"Cleanup error: {e}")
-
-        response.background = BackgroundTask(cleanup)
-        return response
+    except UploadTooLargeError as e:
+        logger.warning("Rejecting upload: %s", e)
+        REQUESTS.inc(endpoint="denoise", status="too_large")
+        return JSONResponse(status_code=413, content={"error": str(e)})
 
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # Clean up on error
-        try:
-            for path in [temp_path, wav_path, denoised_path]:
-                if path and os.path.exists(path):
-                    os.unlink(path)
-            if 'temp_dir' in locals() and os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
-        except Exception as cleanup_error:
-            print(f"Cleanup error: {cleanup_error}")
-            
+        logger.exception("Error processing request: %s", e)
+        REQUESTS.inc(endpoint="denoise", status="error")
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
+    if WEB_WORKERS > 1:
+        Supervisor(
+            app, host="0.0.0.0", port=8000, workers=WEB_WORKERS,
+            preload=lambda: initialize_models(PRELOAD_MODELS or list(COUNTRY_MODELS)),
+            on_fork=configure_worker_process,
+            log_level=LOG_LEVEL.lower()
+        ).run()
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_level=LOG_LEVEL.lower())
@@ -0,0 +1,99 @@
+import asyncio
+import gc
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Loads model handlers on first use and keeps them within a RAM budget.
+
+    `factory(key)` must return a fresh, unloaded handler exposing `load()`,
+    `unload()` and `memory_bytes()`. Loaded handlers are kept in LRU order;
+    when the total size exceeds `memory_budget_mb`, the least recently used
+    handlers that are not serving a request are unloaded.
+    """
+
+    def __init__(self, factory, memory_budget_mb: float = 0):
+        self.factory = factory
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)  # 0 disables the budget
+        self.handlers = OrderedDict()
+        self.load_times = {}
+        self._active = {}
+        self._locks = {}
+
+    def _lock(self, key):
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def total_bytes(self) -> int:
+        return sum(handler.memory_bytes() for handler in self.handlers.values())
+
+    async def get(self, key):
+        """Return a loaded handler for `key`, loading it if necessary"""
+        if key in self.handlers:
+            self.handlers.move_to_end(key)
+            return self.handlers[key]
+
+        # Concurrent first requests for the same model share one load
+        async with self._lock(key):
+            if key in self.handlers:
+                self.handlers.move_to_end(key)
+                return self.handlers[key]
+
+            logger.info("Loading model for '%s' on demand", key)
+            handler = self.factory(key)
+            start_time = time.perf_counter()
+            if not await handler.load():
+                raise RuntimeError(f"Failed to load model for '{key}'")
+            self.load_times[key] = time.perf_counter() - start_time
+            logger.info("Model for '%s' loaded in %.2f seconds (%.0f MB)",
+                        key, self.load_times[key], handler.memory_bytes() / 1024 / 1024)
+
+            self.handlers[key] = handler
+            self._evict(keep=key)
+            return handler
+
+    @asynccontextmanager
+    async def use(self, key):
+        """Borrow a loaded handler; it cannot be evicted while borrowed"""
+        self._active[key] = self._active.get(key, 0) + 1
+        try:
+            yield await self.get(key)
+        finally:
+            self._active[key] -= 1
+
+    def _evict(self, keep=None):
+        if not self.memory_budget:
+            return
+
+        for key in list(self.handlers):
+            if self.total_bytes() <= self.memory_budget:
+                break
+            if key == keep or self._active.get(key, 0) > 0:
+                continue
+            logger.info("Evicting idle model '%s' to stay within the memory budget", key)
+            self.handlers.pop(key).unload()
+            gc.collect()
+
+    async def preload(self, keys):
+        for key in keys:
+            try:
+                await self.get(key)
+            except Exception as e:
+                logger.exception("Error preloading model '%s': %s", key, e)
+
+    def status(self) -> dict:
+        return {
+            key: {
+                "loaded": key in self.handlers,
+                "load_seconds": self.load_times.get(key),
+                "memory_mb": self.handlers[key].memory_bytes() / 1024 / 1024 if key in self.handlers else None,
+                "active_requests": self._active.get(key, 0)
+            }
+            for key in set(self.handlers) | set(self.load_times)
+        }
@@ -0,0 +1,82 @@
+import logging
+from pathlib import Path
+
+import torch
+from transformers import GenerationConfig, WhisperConfig, WhisperForConditionalGeneration
+
+logger = logging.getLogger(__name__)
+
+# Supported values for the "precision" key in COUNTRY_MODELS
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+def quantized_cache_path(cache_dir, model_id: str) -> Path:
+    # Packed quantized weights are pickled torch internals that need not load
+    # in another torch version, so each version keeps its own file
+    version = torch.__version__.replace("+", "_")
+    return Path(cache_dir) / "quantized" / f"{model_id.replace('/', '_')}_int8_torch{version}.pt"
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations fp32)"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(model_id: str, cache_dir, precision: str = "fp32"):
+    """Load a Whisper model for CPU inference at the requested precision.
+
+    int8 weights are cached under `cache_dir` the first time they are
+    produced, so later startups skip both the fp32 load and re-quantizing.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision '{precision}', expected one of {PRECISIONS}")
+
+    if precision == "int8":
+        cached_path = quantized_cache_path(cache_dir, model_id)
+        if cached_path.exists():
+            logger.info("Loading cached int8 weights: %s", cached_path)
+            config = WhisperConfig.from_pretrained(model_id, cache_dir=cache_dir)
+            model = quantize_int8(WhisperForConditionalGeneration(config))
+            # Our own cache file; packed quantized params need the full unpickler
+            model.load_state_dict(torch.load(cached_path, weights_only=False))
+            try:
+                model.generation_config = GenerationConfig.from_pretrained(model_id, cache_dir=cache_dir)
+            except Exception as e:
+                logger.warning("No generation config for %s, using defaults: %s", model_id, e)
+            return model.eval()
+
+        model = WhisperForConditionalGeneration.from_pretrained(
+            model_id,
+            cache_dir=cache_dir,
+            torch_dtype=torch.float32
+        ).eval()
+        logger.info("Quantizing %s to int8", model_id)
+        model = quantize_int8(model)
+        cached_path.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(model.state_dict(), cached_path)
+        logger.info("Saved int8 weights to %s", cached_path)
+        return model
+
+    model = WhisperForConditionalGeneration.from_pretrained(
+        model_id,
+        cache_dir=cache_dir,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else torch.float32
+    )
+    if precision == "bf16":
+        # The ASR pipeline's chunk batching hands over fp32 features; cast them
+        # where they enter the encoder instead of at every call site
+        conv = model.model.encoder.conv1
+        conv.register_forward_pre_hook(lambda module, args: (args[0].to(module.weight.dtype),) + args[1:])
+    return model.eval()
+
+
+def model_size_bytes(model) -> int:
+    """Size of a model's weights, including packed int8 Linear weights"""
+    def tensor_bytes(value):
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(v) for v in value)
+        return 0
+
+    return sum(tensor_bytes(value) for value in model.state_dict().values())
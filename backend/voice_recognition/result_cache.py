@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Content-addressed cache of transcription results.
+
+    Entries live in an in-memory LRU of `max_entries` items and, when
+    `disk_dir` is given, in one small JSON file per key that survives
+    restarts. Values must be JSON-serialisable.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_dir=None):
+        self.max_entries = max(0, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def audio_digest(audio: np.ndarray) -> str:
+        return hashlib.sha256(np.ascontiguousarray(audio).tobytes()).hexdigest()
+
+    @staticmethod
+    def key(audio_digest: str, model_id: str, settings: dict) -> str:
+        payload = json.dumps([audio_digest, model_id, settings], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        return self.lookup(key)[0]
+
+    def lookup(self, key: str):
+        """Cached value for `key` and the tier it came from ("memory", "disk"
+        or "miss"), or (None, "miss")"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key], "memory"
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    value = json.load(f)["value"]
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value, "disk"
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning("Error reading cached result %s: %s", key, e)
+
+        self.misses += 1
+        return None, "miss"
+
+    def _remember(self, key: str, value):
+        if not self.max_entries:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write then rename so readers never see a partial file
+                temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"value": value}, f, ensure_ascii=False)
+                os.replace(temp_path, path)
+            except Exception as e:
+                logger.warning("Error writing cached result %s: %s", key, e)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self.disk_dir is not None
+        }
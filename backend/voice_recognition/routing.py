@@ -0,0 +1,40 @@
+from whisper.tokenizer import TO_LANGUAGE_CODE
+
+# When to route a /transcribe/ request by its spoken language: only when it
+# names no (known) country, for every request, or never
+ROUTE_MODES = ("missing", "always", "off")
+
+
+def language_code(language: str) -> str:
+    """Whisper language code for a COUNTRY_MODELS language ("Thai" -> "th")"""
+    language = language.lower()
+    return TO_LANGUAGE_CODE.get(language, language)
+
+
+def route_languages(model_config: dict) -> list:
+    """Language codes that route to a country model: its "route_languages",
+    or just its own language"""
+    return [language_code(language) for language in model_config.get("route_languages") or [model_config["language"]]]
+
+
+def choose_country(language_probs: dict, country_languages: dict, threshold: float) -> dict:
+    """
+    Routing decision from a language ID distribution ({code: probability}).
+    A country scores the total probability of its languages; the best one
+    is routed to when that reaches `threshold`.
+    """
+    language = max(language_probs, key=language_probs.get) if language_probs else None
+    scores = {
+        country: sum(language_probs.get(code, 0.0) for code in codes)
+        for country, codes in country_languages.items()
+    }
+    country = max(scores, key=scores.get) if scores else None
+    score = scores.get(country, 0.0)
+    return {
+        "language": language,
+        "language_probability": language_probs.get(language) if language else None,
+        "country": country if score >= threshold else None,
+        "confidence": score,
+        "candidate": country,
+        "confident": score >= threshold
+    }
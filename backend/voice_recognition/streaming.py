@@ -0,0 +1,142 @@
+import asyncio
+
+import numpy as np
+
+from features import IncrementalMelFeatures
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Little-endian 16-bit PCM to float32 in [-1, 1]"""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class StreamingDecoder:
+    """A long-lived ffmpeg process turning a compressed stream (Opus/WebM/Ogg/...)
+    into float32 samples as the bytes arrive.
+
+    Every decoded block is passed to `on_audio` from a background reader task.
+    """
+
+    def __init__(self, on_audio, sample_rate: int = 16000):
+        self.on_audio = on_audio
+        self.sample_rate = sample_rate
+        self.process = None
+        self._reader = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            'ffmpeg',
+            '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 'f32le',
+            '-acodec', 'pcm_f32le',
+            '-ar', str(self.sample_rate),
+            '-ac', '1',
+            'pipe:1',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        leftover = b""
+        while True:
+            data = await self.process.stdout.read(16384)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 4  # keep whole float32 samples only
+            leftover = data[usable:]
+            if usable:
+                self.on_audio(np.frombuffer(data[:usable], dtype=np.float32))
+
+    async def feed(self, data: bytes):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    async def close(self):
+        """Flush ffmpeg and wait until every decoded sample has been delivered"""
+        if self.process is None:
+            return
+        if not self.process.stdin.is_closing():
+            self.process.stdin.close()
+        await self._reader
+        await self.process.wait()
+
+    def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+
+
+class StreamingSession:
+    """Rolling-window state for one streaming transcription.
+
+    Audio since the last committed point forms the current window. Partial
+    hypotheses are produced for the growing window; once it reaches
+    `max_window_seconds` its text is committed and a new window starts at its
+    end. Log-mel frames are computed once and shared by every window. With a
+    `denoiser` (a StreamingDenoiser) audio is cleaned as it is appended.
+    """
+
+    def __init__(self, feature_extractor, sample_rate: int = 16000,
+                 step_seconds: float = 1.0, max_window_seconds: float = 20.0, denoiser=None):
+        self.features = IncrementalMelFeatures(feature_extractor)
+        self.denoiser = denoiser
+        self.sample_rate = sample_rate
+        self.step = int(step_seconds * sample_rate)
+        self.max_window = int(max_window_seconds * sample_rate)
+        self.window_start = 0
+        self.decoded_until = 0
+        self.segments = []
+        self._pcm_leftover = b""
+
+    @property
+    def received(self) -> int:
+        return self.features.received
+
+    def append(self, samples: np.ndarray):
+        if self.denoiser is not None:
+            samples = self.denoiser.process(samples)
+        self.features.append(samples)
+
+    def flush(self):
+        """Release the audio the denoiser still holds back at the end of a stream"""
+        if self.denoiser is not None:
+            self.features.append(self.denoiser.flush())
+
+    def append_pcm16(self, data: bytes):
+        data = self._pcm_leftover + data
+        usable = len(data) - len(data) % 2
+        self._pcm_leftover = data[usable:]
+        if usable:
+            self.append(pcm16_to_float32(data[:usable]))
+
+    def has_new_audio(self, final: bool = False) -> bool:
+        pending = self.received - self.decoded_until
+        return pending > 0 if final else pending >= self.step
+
+    def next_window(self):
+        """(start, end, completes_window) for the next decode"""
+        end = min(self.received, self.window_start + self.max_window)
+        return self.window_start, end, end - self.window_start >= self.max_window
+
+    def mark_decoded(self, end: int):
+        self.decoded_until = max(self.decoded_until, end)
+
+    def commit(self, end: int, text: str):
+        """Freeze the text for audio up to `end` and start a new window there"""
+        if text and text.strip():
+            self.segments.append(text.strip())
+        hop = self.features.hop_length
+        self.window_start = end - end % hop  # windows must start on a frame boundary
+        self.mark_decoded(end)
+        # Later windows start here; drop the audio and frames behind it
+        self.features.trim(self.window_start)
+
+    @property
+    def committed_text(self) -> str:
+        return " ".join(self.segments)
+
+    def running_text(self, hypothesis: str) -> str:
+        return " ".join(part for part in [self.committed_text, (hypothesis or "").strip()] if part)
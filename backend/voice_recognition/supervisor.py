@@ -0,0 +1,214 @@
+"""
+Pre-fork multi-process serving.
+
+The supervisor loads the models once, binds the listening socket and then
+forks the web workers. A forked worker sees the parent's memory through
+copy-on-write pages, and since inference only ever reads the weights those
+pages stay shared: N workers cost one copy of the weights plus their own
+activations, instead of N copies.
+
+The supervisor keeps the worker count at its target, replacing workers
+that die. SIGTTIN / SIGTTOU add or remove a worker, SIGHUP replaces all of
+them one by one (cheap, since nothing is reloaded) and SIGTERM / SIGINT
+shut everything down.
+"""
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting counts as a crash;
+# repeated crashes back off before the next fork
+MIN_WORKER_UPTIME_SECONDS = 5.0
+MAX_RESTART_DELAY_SECONDS = 30.0
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket that every forked worker accepts on"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """
+    Loads models with `preload` (a coroutine function) in this process, then
+    serves `app` from `workers` forked uvicorn processes sharing one socket.
+
+    `on_fork(index, count)` runs in each new worker before it starts serving,
+    e.g. to give worker `index` of `count` its own share of the CPUs. A
+    replacement worker takes over the index of the one it replaces.
+    """
+
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+                 preload=None, on_fork=None, log_level: str = "info", shutdown_timeout: float = 30.0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.target = max(1, int(workers))
+        self.preload = preload
+        self.on_fork = on_fork
+        self.log_level = log_level
+        self.shutdown_timeout = shutdown_timeout
+        self.socket = None
+        self.workers = {}     # pid -> (index, start time)
+        self.retiring = set()  # pids told to stop, not yet exited
+        self._signals = []
+        self._crashes = 0
+        self._retry_at = 0.0
+
+    def run(self):
+        # Fast tokenizers' thread pool does not survive a fork
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        if self.preload is not None:
+            start_time = time.perf_counter()
+            asyncio.run(self.preload())
+            logger.info("Models loaded in %.2f seconds, shared by %d workers", time.perf_counter() - start_time, self.target)
+        # Objects that exist now are never collected, so the collector stops
+        # writing to them (and copying their pages) in every worker
+        gc.freeze()
+
+        self.socket = bind_socket(self.host, self.port)
+        logger.info("Supervisor %d listening on %s:%d", os.getpid(), self.host, self.port)
+        for sig in HANDLED_SIGNALS:
+            signal.signal(sig, self._on_signal)
+
+        try:
+            self._loop()
+        finally:
+            self._stop()
+            self.socket.close()
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def _loop(self):
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    logger.info("Shutting down %d workers", len(self.workers))
+                    return
+                if signum == signal.SIGTTIN:
+                    self.target += 1
+                    logger.info("Worker count raised to %d", self.target)
+                elif signum == signal.SIGTTOU and self.target > 1:
+                    self.target -= 1
+                    logger.info("Worker count lowered to %d", self.target)
+                elif signum == signal.SIGHUP:
+                    self._replace_all()
+
+            self._reap()
+            self._scale()
+            time.sleep(0.5)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            if pid not in self.workers:
+                continue
+            index, started = self.workers.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            logger.warning("Worker %d (pid %d) exited with status %d", index, pid, code)
+            if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+                self._crashes += 1
+                delay = min(MAX_RESTART_DELAY_SECONDS, 2 ** (self._crashes - 1))
+                self._retry_at = time.monotonic() + delay
+                logger.warning("Worker %d crashed on startup; restarting in %.0f seconds", index, delay)
+            else:
+                self._crashes = 0
+
+    def _scale(self):
+        if len(self.workers) > self.target:
+            # Retire the highest indexes first
+            for pid, _ in sorted(self.workers.items(), key=lambda item: -item[1][0])[:len(self.workers) - self.target]:
+                self._retire(pid)
+        elif len(self.workers) < self.target and time.monotonic() >= self._retry_at:
+            used = {index for index, _ in self.workers.values()}
+            for index in [i for i in range(self.target) if i not in used][:self.target - len(self.workers)]:
+                self._spawn(index)
+
+    def _replace_all(self):
+        """Fork a new worker for each running one, then stop the old one"""
+        logger.info("Replacing %d workers", len(self.workers))
+        for pid, (index, _) in list(self.workers.items()):
+            self._retire(pid)
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = (index, time.monotonic())
+            logger.info("Started worker %d (pid %d)", index, pid)
+            return
+
+        # Worker process: drop the supervisor's handlers; uvicorn installs its own
+        code = 0
+        try:
+            for sig in HANDLED_SIGNALS:
+                signal.signal(sig, signal.SIG_DFL)
+            if self.on_fork is not None:
+                self.on_fork(index, self.target)
+            self.serve()
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            logger.exception("Worker %d failed", index)
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def serve(self):
+        """Run uvicorn on the inherited socket until it is told to stop"""
+        import uvicorn
+        config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _retire(self, pid: int):
+        """Ask a worker to finish its requests and exit"""
+        self.workers.pop(pid, None)
+        self.retiring.add(pid)
+        self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid: int, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _stop(self):
+        for pid in list(self.workers):
+            self._retire(pid)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self.retiring and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.retiring.discard(pid)
+            else:
+                time.sleep(0.1)
+        for pid in self.retiring:
+            logger.warning("Worker pid %d did not stop in %.0f seconds; killing it", pid, self.shutdown_timeout)
+            self._kill(pid, signal.SIGKILL)
+        self.retiring.clear()
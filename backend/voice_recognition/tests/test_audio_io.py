@@ -0,0 +1,71 @@
+import asyncio
+
+from audio_io import UploadLimitMiddleware
+
+
+async def echo_length(scope, receive, send):
+    """App that reads the whole body and answers with its size"""
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client went away")
+        size += len(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body = str(size).encode()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def call(app, path, chunks, content_length=None):
+    """Send `chunks` as one request body and return (status, body)"""
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    scope = {"type": "http", "path": path, "headers": headers}
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+
+
+def middleware(rejected=None):
+    on_reject = rejected.append if rejected is not None else None
+    return UploadLimitMiddleware(echo_length, {"/upload": 100}, on_reject=on_reject, slack=0)
+
+
+def test_body_under_the_limit_passes():
+    assert call(middleware(), "/upload", [b"x" * 60, b"x" * 40], content_length=100) == (200, b"100")
+
+
+def test_declared_length_over_the_limit_is_refused_unread():
+    rejected = []
+    status, body = call(middleware(rejected), "/upload", [b"x" * 101], content_length=101)
+    assert status == 413 and b"larger than" in body
+    assert rejected == ["/upload"]
+
+
+def test_body_larger_than_its_content_length_is_cut_off():
+    rejected = []
+    status, _ = call(middleware(rejected), "/upload", [b"x" * 80, b"x" * 80], content_length=50)
+    assert status == 413
+    assert rejected == ["/upload"]
+
+
+def test_chunked_body_without_a_length_is_cut_off():
+    status, _ = call(middleware(), "/upload", [b"x" * 60] * 3)
+    assert status == 413
+
+
+def test_other_paths_are_not_limited():
+    assert call(middleware(), "/other", [b"x" * 500], content_length=500) == (200, b"500")
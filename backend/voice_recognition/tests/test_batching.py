@@ -0,0 +1,78 @@
+import asyncio
+
+from batching import MicroBatcher
+
+
+class Recorder:
+    """process_batch stand-in that remembers the batches it was given"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        return [item * 10 for item in items]
+
+
+def test_concurrent_submits_share_one_batch():
+    async def scenario():
+        process = Recorder()
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        assert results == [0, 10, 20, 30, 40]
+        assert process.batches == [[0, 1, 2, 3, 4]]
+
+    asyncio.run(scenario())
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def scenario():
+        process = Recorder()
+        batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        assert results == [0, 10, 20, 30, 40]
+        assert [len(batch) for batch in process.batches] == [2, 2, 1]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_callers_do_not_take_a_batch_slot():
+    async def scenario():
+        process = Recorder()
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+        gave_up = asyncio.ensure_future(batcher.submit(1))
+        waiting = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        gave_up.cancel()
+        assert await waiting == 20
+        assert process.batches == [[2]]
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def failing(items):
+        raise ValueError("model failed")
+
+    async def scenario():
+        batcher = MicroBatcher(failing, max_wait_ms=20)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        assert [str(result) for result in results] == ["model failed"] * 2
+        # The batcher keeps serving after a failed batch
+        batcher.process_batch = Recorder()
+        assert await batcher.submit(3) == 30
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_stops_the_task_and_a_later_submit_restarts_it():
+    async def scenario():
+        batcher = MicroBatcher(Recorder(), max_wait_ms=0)
+        assert await batcher.submit(1) == 10
+        task = batcher._task
+        batcher.shutdown()
+        await asyncio.sleep(0)
+        assert task.cancelled() and batcher._task is None
+        assert await batcher.submit(2) == 20
+
+    asyncio.run(scenario())
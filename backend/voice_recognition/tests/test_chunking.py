@@ -0,0 +1,57 @@
+import numpy as np
+
+from chunking import Chunk, split_audio, stitch
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_short_audio_is_one_chunk():
+    assert split_audio(tone(10), SAMPLE_RATE) == [Chunk(0, SAMPLE_RATE * 10, 0)]
+
+
+def test_cut_without_a_pause_overlaps_the_next_chunk():
+    chunks = split_audio(tone(50), SAMPLE_RATE, max_seconds=28, overlap_seconds=1.5)
+    assert chunks == [
+        Chunk(0, SAMPLE_RATE * 28, 0),
+        Chunk(int(SAMPLE_RATE * 26.5), SAMPLE_RATE * 50, int(SAMPLE_RATE * 1.5))
+    ]
+
+
+def test_cut_at_a_pause_needs_no_overlap():
+    audio = np.concatenate([tone(26), np.zeros(SAMPLE_RATE, dtype=np.float32), tone(20)])
+    chunks = split_audio(audio, SAMPLE_RATE, max_seconds=28)
+    assert len(chunks) == 2
+    assert 26 * SAMPLE_RATE <= chunks[0].end <= 27 * SAMPLE_RATE
+    assert chunks[1].start == chunks[0].end and chunks[1].overlap == 0
+    assert chunks[-1].end == len(audio)
+
+
+def test_every_chunk_fits_the_window():
+    chunks = split_audio(tone(100), SAMPLE_RATE, max_seconds=28)
+    assert all(chunk.end - chunk.start <= 28 * SAMPLE_RATE for chunk in chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == 100 * SAMPLE_RATE
+
+
+def test_stitch_drops_words_repeated_in_the_overlap():
+    chunks = [Chunk(0, 10, 0), Chunk(8, 20, 2)]
+    assert stitch(["the quick brown fox", "Brown fox, jumps over"], chunks) == "the quick brown fox jumps over"
+
+
+def test_stitch_keeps_text_without_overlap():
+    chunks = [Chunk(0, 10, 0), Chunk(10, 20, 0)]
+    assert stitch(["hello there", "there we go"], chunks) == "hello there there we go"
+
+
+def test_stitch_matches_characters_in_unspaced_scripts():
+    chunks = [Chunk(0, 10, 0), Chunk(8, 20, 2)]
+    assert stitch(["สวัสดีครับผม", "ครับผมชื่อเอ"], chunks) == "สวัสดีครับผม ชื่อเอ"
+
+
+def test_stitch_skips_empty_and_missing_chunks():
+    chunks = [Chunk(0, 10, 0), Chunk(8, 20, 2), Chunk(18, 30, 2)]
+    assert stitch([None, "  ", "last words"], chunks) == "last words"
@@ -0,0 +1,38 @@
+from confidence import assess, compression_ratio, merge
+
+
+def test_compression_ratio_flags_repetition():
+    assert compression_ratio("") == 0.0
+    assert compression_ratio("ha " * 50) > 2.4
+    assert compression_ratio("the quick brown fox jumps over the lazy dog") < 2.4
+
+
+def test_merge_combines_chunk_confidences():
+    merged = merge([
+        {"avg_logprob": -0.2, "no_speech_prob": 0.5, "compression_ratio": 1.2, "language": "ms"},
+        None,
+        {"avg_logprob": float("-inf"), "no_speech_prob": 0.1, "compression_ratio": 2.0, "language": "ms"},
+        {"avg_logprob": -0.4, "no_speech_prob": 0.3, "compression_ratio": 1.5, "language": "th"}
+    ])
+    # The -inf log-prob is dropped rather than poisoning the mean
+    assert abs(merged["avg_logprob"] - -0.3) < 1e-9
+    assert merged["no_speech_prob"] == 0.1
+    assert merged["compression_ratio"] == 2.0
+    assert merged["language"] == "ms"
+    assert merge([None, {}]) is None
+
+
+def test_assess_follows_whisper_fallback_rules():
+    good = {"avg_logprob": -0.3, "no_speech_prob": 0.1, "compression_ratio": 1.5}
+    assert assess(good) == (True, "confident")
+    assert assess(None) == (False, "no confidence signals")
+    assert assess({**good, "avg_logprob": -1.5})[0] is False
+    assert assess({**good, "compression_ratio": 3.0})[0] is False
+    # Silent audio is expected to decode badly
+    assert assess({**good, "avg_logprob": -1.5, "no_speech_prob": 0.9}) == (True, "no speech")
+
+
+def test_assess_checks_the_expected_language():
+    confidence = {"avg_logprob": -0.3, "no_speech_prob": 0.1, "compression_ratio": 1.5, "language": "id"}
+    assert assess(confidence, language="id") == (True, "confident")
+    assert assess(confidence, language="ms") == (False, "detected language id, expected ms")
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+from transformers import WhisperFeatureExtractor
+
+from features import IncrementalMelFeatures, log_mel_batch, mel_config
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture(scope="module")
+def feature_extractor():
+    return WhisperFeatureExtractor()
+
+
+@pytest.fixture(scope="module")
+def audio():
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(SAMPLE_RATE * 12) * 0.1).astype(np.float32)
+
+
+def streamed(feature_extractor, audio, chunk_samples=3200) -> IncrementalMelFeatures:
+    features = IncrementalMelFeatures(feature_extractor)
+    for start in range(0, len(audio), chunk_samples):
+        features.append(audio[start:start + chunk_samples])
+    return features
+
+
+@pytest.mark.parametrize("start, end", [(0, SAMPLE_RATE * 5), (160 * 100, SAMPLE_RATE * 12), (0, 100)])
+def test_incremental_windows_match_log_mel_batch(feature_extractor, audio, start, end):
+    features = streamed(feature_extractor, audio)
+    expected = log_mel_batch([audio[start:end]], mel_config(feature_extractor))
+    assert torch.allclose(features.window_features(start, end), expected, atol=1e-4)
+
+
+def test_trimmed_stream_gives_the_same_windows(feature_extractor, audio):
+    features = IncrementalMelFeatures(feature_extractor)
+    window_start = 0
+    for start in range(0, len(audio), 3200):
+        features.append(audio[start:start + 3200])
+        if features.received >= window_start + SAMPLE_RATE * 4:
+            window_start += SAMPLE_RATE * 2
+            features.trim(window_start)
+
+    expected = log_mel_batch([audio[window_start:]], mel_config(feature_extractor))
+    assert torch.allclose(features.window_features(window_start), expected, atol=1e-4)
+    # Audio before the trim point is gone
+    with pytest.raises(ValueError):
+        features.window_features(0, SAMPLE_RATE)
+
+
+def test_window_start_must_be_on_a_hop(feature_extractor, audio):
+    with pytest.raises(ValueError):
+        streamed(feature_extractor, audio).window_features(1)
+
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from contextlib import ExitStack
+
+import pytest
+
+from inference_pool import InferencePool, InferenceWorker, QueueFullError, inference_time, queue_wait
+
+
+def test_admit_rejects_past_max_queue():
+    worker = InferenceWorker("test", max_queue=2)
+    with worker.admit() as first, worker.admit() as second:
+        assert (first["depth"], second["depth"]) == (0, 1)
+        with pytest.raises(QueueFullError) as error:
+            with worker.admit():
+                pass
+        assert (error.value.worker_name, error.value.depth) == ("test", 2)
+    assert worker.depth == 0
+    with worker.admit():
+        assert worker.depth == 1
+
+
+def test_run_records_queue_and_inference_times():
+    async def scenario():
+        worker = InferenceWorker("test")
+        with worker.admit() as ticket:
+            assert await worker.run(sum, [1, 2], tickets=[ticket]) == 3
+        assert queue_wait(ticket) >= 0
+        assert inference_time(ticket) >= 0
+
+    asyncio.run(scenario())
+
+
+def test_pool_keeps_one_worker_per_name():
+    pool = InferencePool(max_queue=3)
+    assert pool.worker("a") is pool.worker("a")
+    assert pool.worker("a") is not pool.worker("b")
+    with pool.worker("a").admit():
+        assert pool.depths() == {"a": 1, "b": 0}
+    pool.shutdown()
+
+
+def test_wait_admit_waits_for_a_released_slot():
+    async def scenario():
+        worker = InferenceWorker("test", max_queue=1)
+        held = ExitStack()
+        held.enter_context(worker.admit())
+        waiting = asyncio.ensure_future(worker.wait_admit())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        loop = asyncio.get_running_loop()
+        released_at = loop.time()
+        held.close()
+        with await waiting:
+            # Woken by the release itself, not by polling
+            assert loop.time() - released_at < 0.01
+            assert worker.depth == 1
+        assert worker.depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_wait_admit_hands_on_a_wake_up_it_cannot_use():
+    async def scenario():
+        worker = InferenceWorker("test", max_queue=1)
+        held = ExitStack()
+        held.enter_context(worker.admit())
+        first = asyncio.ensure_future(worker.wait_admit())
+        second = asyncio.ensure_future(worker.wait_admit())
+        await asyncio.sleep(0)
+        held.close()
+        first.cancel()
+        with await asyncio.wait_for(second, 1):
+            assert worker.depth == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_stops_the_thread_and_a_later_run_restarts_it():
+    async def scenario():
+        worker = InferenceWorker("test")
+        first = await worker.run(threading.current_thread)
+        worker.shutdown()
+        assert worker._executor is None
+        assert await worker.run(threading.current_thread) is not first
+
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeHandler:
+    loads = []
+
+    def __init__(self, key):
+        self.key = key
+        self.loaded = False
+
+    async def load(self):
+        FakeHandler.loads.append(self.key)
+        self.loaded = self.key != "broken"
+        return self.loaded
+
+    def unload(self):
+        self.loaded = False
+
+    def memory_bytes(self) -> int:
+        return 400 * 1024 if self.loaded else 0
+
+
+@pytest.fixture(autouse=True)
+def reset_loads():
+    FakeHandler.loads = []
+
+
+def test_concurrent_first_requests_share_one_load():
+    async def scenario():
+        registry = ModelRegistry(FakeHandler)
+        handlers = await asyncio.gather(*(registry.get("a") for _ in range(4)))
+        assert len({id(handler) for handler in handlers}) == 1
+        assert FakeHandler.loads == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    async def scenario():
+        registry = ModelRegistry(FakeHandler, memory_budget_mb=1)
+        a = await registry.get("a")
+        await registry.get("b")
+        await registry.get("a")
+        await registry.get("c")
+        assert list(registry.handlers) == ["a", "c"]
+        assert a.loaded
+        assert registry.total_bytes() <= MB
+
+    asyncio.run(scenario())
+
+
+def test_models_in_use_are_not_evicted():
+    async def scenario():
+        registry = ModelRegistry(FakeHandler, memory_budget_mb=1)
+        async with registry.use("a") as a:
+            await registry.get("b")
+            await registry.get("c")
+            assert "a" in registry.handlers and a.loaded
+            assert registry.status()["a"]["active_requests"] == 1
+        assert registry.status()["a"]["active_requests"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_load_raises_and_is_not_kept():
+    async def scenario():
+        registry = ModelRegistry(FakeHandler)
+        with pytest.raises(RuntimeError):
+            await registry.get("broken")
+        assert "broken" not in registry.handlers
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import numpy as np
+
+from result_cache import ResultCache
+
+
+def test_key_separates_audio_model_and_settings():
+    digest = ResultCache.audio_digest(np.zeros(16000, dtype=np.float32))
+    other = ResultCache.audio_digest(np.ones(16000, dtype=np.float32))
+    base = ResultCache.key(digest, "base", {"language": "ms", "beam_size": 5})
+
+    assert base == ResultCache.key(digest, "base", {"beam_size": 5, "language": "ms"})
+    assert base != ResultCache.key(other, "base", {"language": "ms", "beam_size": 5})
+    assert base != ResultCache.key(digest, "malaysian", {"language": "ms", "beam_size": 5})
+    assert base != ResultCache.key(digest, "base", {"language": "th", "beam_size": 5})
+
+
+def test_lookup_reports_the_tier(tmp_path):
+    cache = ResultCache(disk_dir=tmp_path)
+    assert cache.lookup("k") == (None, "miss")
+    cache.put("k", {"text": "hello"})
+    assert cache.lookup("k") == ({"text": "hello"}, "memory")
+
+    fresh = ResultCache(disk_dir=tmp_path)
+    assert fresh.lookup("k") == ({"text": "hello"}, "disk")
+    assert fresh.lookup("k")[1] == "memory"
+    assert fresh.stats() == {
+        "hits": 2, "disk_hits": 1, "misses": 0, "memory_entries": 1, "disk_enabled": True
+    }
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_zero_entries_keeps_nothing_in_memory(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=tmp_path)
+    cache.put("k", "v")
+    assert cache.stats()["memory_entries"] == 0
+    assert cache.lookup("k") == ("v", "disk")
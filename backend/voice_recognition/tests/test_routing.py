@@ -0,0 +1,34 @@
+from routing import choose_country, language_code, route_languages
+
+COUNTRY_LANGUAGES = {"malaysia": ["ms", "id"], "thailand": ["th"]}
+
+
+def test_language_code_accepts_names_and_codes():
+    assert language_code("Thai") == "th"
+    assert language_code("Malay") == "ms"
+    assert language_code("ms") == "ms"
+
+
+def test_route_languages_defaults_to_the_model_language():
+    assert route_languages({"language": "Thai"}) == ["th"]
+    assert route_languages({"language": "Malay", "route_languages": ["Malay", "Indonesian"]}) == ["ms", "id"]
+
+
+def test_country_scores_sum_over_its_languages():
+    decision = choose_country({"ms": 0.4, "id": 0.3, "th": 0.3}, COUNTRY_LANGUAGES, threshold=0.6)
+    assert decision["language"] == "ms"
+    assert decision["language_probability"] == 0.4
+    assert decision["country"] == "malaysia" and decision["confident"]
+    assert abs(decision["confidence"] - 0.7) < 1e-9
+
+
+def test_country_below_threshold_is_only_a_candidate():
+    decision = choose_country({"th": 0.5, "en": 0.5}, COUNTRY_LANGUAGES, threshold=0.6)
+    assert decision["country"] is None and not decision["confident"]
+    assert decision["candidate"] == "thailand"
+
+
+def test_empty_distribution_routes_nowhere():
+    decision = choose_country({}, COUNTRY_LANGUAGES, threshold=0.6)
+    assert decision["language"] is None and decision["language_probability"] is None
+    assert decision["country"] is None and decision["confidence"] == 0.0
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from topology import ThreadPlan, process_share, set_main_threads
+
+
+def parallel_op_threads() -> int:
+    # The first parallel op is where a thread that never set its own count
+    # picks up the process-wide one
+    torch.ones(64, 64) @ torch.ones(64, 64)
+    return torch.get_num_threads()
+
+
+def test_worker_thread_counts_do_not_leak_between_threads():
+    plan = ThreadPlan({"a": 3, "b": 2})
+    main_threads = torch.get_num_threads()
+    set_main_threads(1)
+    a = ThreadPoolExecutor(max_workers=1, initializer=plan.initializer("a"))
+    b = ThreadPoolExecutor(max_workers=1, initializer=plan.initializer("b"))
+    try:
+        # Start both threads before either runs a parallel op
+        a.submit(int).result()
+        b.submit(int).result()
+        assert a.submit(parallel_op_threads).result() == 3
+        assert b.submit(parallel_op_threads).result() == 2
+        assert parallel_op_threads() == 1
+    finally:
+        a.shutdown()
+        b.shutdown()
+        set_main_threads(main_threads)
+
+
+def test_auto_workers_share_the_spare_cores():
+    plan = ThreadPlan({"fixed": 2, "x": "auto", "y": "auto"}, cpus=list(range(8)))
+    plan.physical_cores = 8
+    plan.plan(["fixed", "x", "y"])
+    assert [plan.get(name).threads for name in ("fixed", "x", "y")] == [2, 3, 3]
+    assert not plan.oversubscribed()
+
+
+def test_pinned_workers_get_disjoint_cpus():
+    plan = ThreadPlan({"a": 2, "b": 2}, pin=True, cpus=[0, 1, 2, 3])
+    plan.plan(["a", "b"])
+    assert not set(plan.get("a").cpus) & set(plan.get("b").cpus)
+
+
+def test_process_share_splits_cpus():
+    cpus = [0, 1, 2, 3]
+    shares = [process_share(cpus, index, 2) for index in range(2)]
+    assert sorted(cpu for share in shares for cpu in share) == cpus
+    assert not set(shares[0]) & set(shares[1])
@@ -0,0 +1,56 @@
+import numpy as np
+
+from vad import compact, detect_speech, noise_sample
+
+SAMPLE_RATE = 16000
+
+
+def noise(seconds: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(SAMPLE_RATE * seconds)) * 0.003).astype(np.float32)
+
+
+def voiced(seconds: float) -> np.ndarray:
+    """A harmonic, amplitude-modulated tone: loud and far from noise-flat, like a vowel"""
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 150 * t) * (1 + 0.5 * np.sin(2 * np.pi * 4 * t)) + 0.1 * np.sin(2 * np.pi * 450 * t)
+    return tone.astype(np.float32)
+
+
+def test_silence_has_no_speech():
+    result = detect_speech(np.zeros(SAMPLE_RATE * 2, dtype=np.float32), SAMPLE_RATE)
+    assert result == {"regions": [], "speech_seconds": 0.0, "total_seconds": 2.0}
+
+
+def test_background_noise_has_no_speech():
+    assert detect_speech(noise(2), SAMPLE_RATE)["regions"] == []
+
+
+def test_speech_region_is_found_and_padded():
+    audio = np.concatenate([noise(1), voiced(1) + noise(1, seed=1), noise(1, seed=2)])
+    result = detect_speech(audio, SAMPLE_RATE, pad_ms=200)
+    assert len(result["regions"]) == 1
+    start, end = result["regions"][0]
+    # One second of speech from 1.0 s, padded by 0.2 s on each side
+    assert abs(start / SAMPLE_RATE - 0.8) < 0.05
+    assert abs(end / SAMPLE_RATE - 2.2) < 0.05
+    assert result["total_seconds"] == 3.0
+
+
+def test_short_pauses_are_bridged():
+    audio = np.concatenate([noise(1), voiced(0.5), noise(0.2, seed=1), voiced(0.5), noise(1, seed=2)])
+    assert len(detect_speech(audio, SAMPLE_RATE, min_silence_ms=400, pad_ms=0)["regions"]) == 1
+    assert len(detect_speech(audio, SAMPLE_RATE, min_silence_ms=100, pad_ms=0)["regions"]) == 2
+
+
+def test_clip_shorter_than_a_frame():
+    assert detect_speech(np.zeros(10, dtype=np.float32), SAMPLE_RATE)["regions"] == []
+
+
+def test_compact_and_noise_sample():
+    audio = np.arange(10, dtype=np.float32)
+    regions = [(1, 3), (6, 8)]
+    assert compact(audio, regions).tolist() == [1, 2, 6, 7]
+    assert compact(audio, regions, gap_samples=2).tolist() == [1, 2, 0, 0, 6, 7]
+    assert compact(audio, []).size == 0
+    assert noise_sample(audio, regions, 4).tolist() == [0, 3, 4, 5]
@@ -0,0 +1,160 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+
+import torch
+
+# Intra-op threads for one inference worker and the CPUs it is pinned to
+# (None when pinning is off)
+WorkerLayout = namedtuple("WorkerLayout", ["threads", "cpus"])
+
+
+def available_cpus() -> list:
+    """CPUs this process may run on (respects taskset/cgroup cpusets)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _physical_core(cpu: int):
+    topology = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology")
+    try:
+        return (topology / "physical_package_id").read_text().strip(), (topology / "core_id").read_text().strip()
+    except OSError:
+        return ("cpu", cpu)
+
+
+def _cores(cpus: list) -> list:
+    """`cpus` grouped by physical core"""
+    cores = {}
+    for cpu in cpus:
+        cores.setdefault(_physical_core(cpu), []).append(cpu)
+    return list(cores.values())
+
+
+def core_order(cpus: list) -> list:
+    """`cpus` reordered so every physical core comes once before any of its
+    SMT siblings; consecutive slices then land on separate cores"""
+    siblings = _cores(cpus)
+    return [
+        group[i]
+        for i in range(max((len(group) for group in siblings), default=0))
+        for group in siblings if i < len(group)
+    ]
+
+
+def process_share(cpus: list, index: int, count: int) -> list:
+    """Process `index` of `count`'s slice of `cpus`: whole physical cores,
+    SMT siblings included, so processes never share a core unless there are
+    more processes than cores"""
+    cores = _cores(cpus)
+    if count >= len(cores):
+        return sorted(cores[index % len(cores)])
+    start, end = len(cores) * index // count, len(cores) * (index + 1) // count
+    return sorted(cpu for group in cores[start:end] for cpu in group)
+
+
+def _set_thread_count(threads: int):
+    # get_num_threads() makes torch initialise this thread's count from the
+    # process-wide one now, so it is not redone later with whatever another
+    # thread set last
+    torch.get_num_threads()
+    torch.set_num_threads(threads)
+
+
+def set_main_threads(threads: int = 1):
+    """Intra-op threads for the calling thread (e.g. the event loop); call it
+    before any worker thread starts"""
+    _set_thread_count(threads)
+
+
+class ThreadPlan:
+    """
+    How many intra-op threads each inference worker uses and, with `pin`,
+    which CPUs it runs on.
+
+    `threads` maps worker names to thread counts ("auto" splits the physical
+    cores left over by the fixed counts evenly between the auto workers).
+    Workers are laid out in the order they are planned, each on the next
+    free physical cores, so N workers get N disjoint core sets as long as
+    the total fits; beyond that CPUs are reused and the plan reports itself
+    as oversubscribed. Settings are applied by the worker thread itself
+    through `initializer(name)`. CPU affinity is per thread; torch's thread
+    count is per thread only once the thread has initialised it, since
+    set_num_threads() also changes the process-wide count every thread
+    picks up lazily on its first parallel op. `initializer` and
+    `set_main_threads` therefore initialise the thread's count first.
+    """
+
+    def __init__(self, threads: dict = None, default_threads="1", pin: bool = False, cpus: list = None):
+        self.cpus = cpus or available_cpus()
+        self.order = core_order(self.cpus)
+        self.physical_cores = len({_physical_core(cpu) for cpu in self.cpus})
+        self.threads = dict(threads or {})
+        self.default_threads = default_threads
+        self.pin = pin
+        self.layout = {}
+        self._next_cpu = 0
+
+    def _requested(self, name: str):
+        return str(self.threads.get(name) or self.default_threads)
+
+    def plan(self, names: list):
+        """Lay out these workers now, in this order; "auto" ones share what is left"""
+        names = [name for name in names if name not in self.layout]
+        fixed = sum(int(self._requested(name)) for name in names if self._requested(name) != "auto")
+        auto = [name for name in names if self._requested(name) == "auto"]
+        spare = max(0, self.physical_cores - fixed - sum(layout.threads for layout in self.layout.values()))
+        for name in names:
+            threads = max(1, spare // len(auto)) if name in auto else int(self._requested(name))
+            self._assign(name, threads)
+
+    def _assign(self, name: str, threads: int) -> WorkerLayout:
+        threads = max(1, threads)
+        cpus = None
+        if self.pin:
+            cpus = [self.order[(self._next_cpu + i) % len(self.order)] for i in range(threads)]
+            self._next_cpu += threads
+        self.layout[name] = WorkerLayout(threads, cpus)
+        return self.layout[name]
+
+    def get(self, name: str) -> WorkerLayout:
+        if name not in self.layout:
+            self.plan([name])
+        return self.layout[name]
+
+    def initializer(self, name: str):
+        """Callable that applies `name`'s layout to the thread it runs on"""
+        self.get(name)
+
+        def apply():
+            # Looked up when the thread starts, so a later use_cpus() still applies
+            layout = self.get(name)
+            _set_thread_count(layout.threads)
+            if layout.cpus and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, layout.cpus)
+        return apply
+
+    def use_cpus(self, cpus: list):
+        """Lay the already planned workers out again on `cpus` only, e.g. the
+        share of one process among several"""
+        names = list(self.layout)
+        self.cpus = list(cpus)
+        self.order = core_order(self.cpus)
+        self.physical_cores = len({_physical_core(cpu) for cpu in self.cpus})
+        self.layout = {}
+        self._next_cpu = 0
+        self.plan(names)
+
+    def oversubscribed(self) -> bool:
+        return sum(layout.threads for layout in self.layout.values()) > len(self.cpus)
+
+    def report(self) -> dict:
+        return {
+            "cpus": len(self.cpus),
+            "physical_cores": self.physical_cores,
+            "pinned": self.pin,
+            "threads_total": sum(layout.threads for layout in self.layout.values()),
+            "oversubscribed": self.oversubscribed(),
+            "workers": {name: layout._asdict() for name, layout in self.layout.items()}
+        }
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+def _frame_features(frames: np.ndarray):
+    """Per-frame energy (dBFS) and spectral flatness"""
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)) ** 2 + 1e-12
+    # Geometric over arithmetic mean: close to 1 for noise, low for voiced speech
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+    return energy_db, flatness
+
+
+def _to_regions(mask: np.ndarray):
+    """[(first, last + 1), ...] runs of True in a boolean array"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = 16000, frame_ms: float = 30,
+                  margin_db: float = 12.0, dynamic_range_db: float = 30.0, min_energy_db: float = -55.0,
+                  max_flatness: float = 0.45, min_speech_ms: float = 120, min_silence_ms: float = 400,
+                  pad_ms: float = 200) -> dict:
+    """
+    Energy/spectral voice activity detection.
+
+    A frame counts as speech when it is louder than the estimated noise floor
+    by `margin_db` (or within `dynamic_range_db` of the loudest frame, so clips
+    with no silence at all still pass) and its spectrum is not noise-flat.
+    Gaps shorter than `min_silence_ms` are bridged, blips shorter than
+    `min_speech_ms` dropped, and every region padded by `pad_ms`.
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    total_seconds = len(audio) / sample_rate
+    if n_frames == 0:
+        return {"regions": [], "speech_seconds": 0.0, "total_seconds": total_seconds}
+
+    energy_db, flatness = _frame_features(audio[:n_frames * frame].reshape(n_frames, frame))
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(min_energy_db, min(noise_floor + margin_db, energy_db.max() - dynamic_range_db))
+    is_speech = (energy_db > threshold) & (flatness < max_flatness)
+
+    # Bridge short pauses, then drop isolated blips
+    min_silence = int(np.ceil(min_silence_ms / frame_ms))
+    for start, end in _to_regions(~is_speech):
+        if 0 < start and end < n_frames and end - start < min_silence:
+            is_speech[start:end] = True
+    min_speech = int(np.ceil(min_speech_ms / frame_ms))
+    for start, end in _to_regions(is_speech):
+        if end - start < min_speech:
+            is_speech[start:end] = False
+
+    pad = int(sample_rate * pad_ms / 1000)
+    regions = []
+    for start, end in _to_regions(is_speech):
+        start, end = max(0, start * frame - pad), min(len(audio), end * frame + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)  # padding made neighbours overlap
+        else:
+            regions.append((int(start), int(end)))
+
+    return {
+        "regions": regions,
+        "speech_seconds": sum(end - start for start, end in regions) / sample_rate,
+        "total_seconds": total_seconds
+    }
+
+
+def compact(audio: np.ndarray, regions: list, gap_samples: int = 0) -> np.ndarray:
+    """Concatenate the speech regions, separated by `gap_samples` of silence"""
+    if not regions:
+        return audio[:0]
+    gap = np.zeros(gap_samples, dtype=audio.dtype)
+    parts = []
+    for start, end in regions:
+        if parts and gap_samples:
+            parts.append(gap)
+        parts.append(audio[start:end])
+    return np.concatenate(parts)
+
+
+def noise_sample(audio: np.ndarray, regions: list, max_samples: int) -> np.ndarray:
+    """Up to `max_samples` of audio from outside the speech regions"""
+    mask = np.ones(len(audio), dtype=bool)
+    for start, end in regions:
+        mask[start:end] = False
+    return audio[mask][:max_samples]